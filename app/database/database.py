@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from typing import List
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,4 +27,34 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def add_missing_columns(engine, metadata) -> List[str]:
+    """Bring existing tables up to date with the models
+    
+    create_all() only creates missing tables, so databases created by an older
+    version would miss columns and indexes added since. New columns are always
+    nullable, so adding them in place is safe on both SQLite and MySQL.
+    Returns the added columns as "table.column", so callers can backfill them.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    added.append(f"{table.name}.{column.name}")
+            
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+    
+    return added
@@ -0,0 +1,29 @@
+import logging
+from typing import Callable
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal, add_missing_columns, engine as default_engine
+from app.database.models import Base
+from app.database.repository import InsightsRepository
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_database(engine: Engine = default_engine, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Create missing tables and columns, and fill in what new columns need
+
+    Shared by the app and the batch CLI, so whichever of them first opens a database
+    written by an older version also does the backfill. Products that an earlier
+    run left without price_amount are picked up too, since the price filters would
+    otherwise silently skip them.
+    """
+    Base.metadata.create_all(bind=engine)
+    added = add_missing_columns(engine, Base.metadata)
+
+    with session_factory() as db:
+        repository = InsightsRepository(db)
+        if "products.price_amount" in added or repository.needs_backfill():
+            count = repository.backfill_products()
+            logger.info(f"Backfilled prices and tags of {count} products")
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, Table, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, Table, JSON, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+from app.utils.timestamps import utcnow
+
 Base = declarative_base()
 
 
@@ -14,6 +16,11 @@ class Store(Base):
     about = Column(Text, nullable=True)
     privacy_policy = Column(Text, nullable=True)
     return_refund_policy = Column(Text, nullable=True)
+    # Newest products.json updated_at we have stored, used for incremental refreshes
+    products_updated_at = Column(DateTime, nullable=True)
+    # When the store was first saved and when its insights were last scraped (UTC)
+    created_at = Column(DateTime, nullable=True, default=utcnow)
+    scraped_at = Column(DateTime, nullable=True)
     
     # Relationships
     products = relationship("Product", back_populates="store")
@@ -34,15 +41,43 @@ class Product(Base):
     handle = Column(String(255))
     description = Column(Text, nullable=True)
     price = Column(String(50), nullable=True)
+    # price parsed as a number, so price ranges can use an index
+    price_amount = Column(Float, nullable=True)
     compare_at_price = Column(String(50), nullable=True)
     available = Column(Boolean, default=True)
     tags = Column(JSON, nullable=True)
     images = Column(JSON, nullable=True)
     variants = Column(JSON, nullable=True)
     url = Column(String(255), nullable=True)
+    # Hash of the scraped product, used to only rewrite products that changed
+    content_hash = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, nullable=True)
     
     # Relationships
     store = relationship("Store", back_populates="products")
+    
+    __table_args__ = (
+        # Cursor pagination walks a store's products in id order
+        Index("ix_products_store_id_id", "store_id", "id"),
+        Index("ix_products_store_id_product_id", "store_id", "product_id"),
+        Index("ix_products_store_id_handle", "store_id", "handle"),
+        Index("ix_products_store_id_available_price", "store_id", "available", "price_amount"),
+    )
+
+
+class ProductTag(Base):
+    """One row per product tag, so products can be filtered by tag without reading the tags JSON"""
+    __tablename__ = "product_tags"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"))
+    product_id = Column(String(255))
+    tag = Column(String(255))
+    
+    __table_args__ = (
+        Index("ix_product_tags_store_id_tag", "store_id", "tag", "product_id"),
+        Index("ix_product_tags_store_id_product_id", "store_id", "product_id"),
+    )
 
 
 class HeroProduct(Base):
@@ -102,4 +137,24 @@ class ImportantLink(Base):
     url = Column(String(255))
     
     # Relationships
-    store = relationship("Store", back_populates="important_links")
\ No newline at end of file
+    store = relationship("Store", back_populates="important_links")
+
+
+class Job(Base):
+    """A background extraction job, persisted so its status survives the request that submitted it"""
+    __tablename__ = "jobs"
+    
+    id = Column(String(36), primary_key=True)
+    kind = Column(String(50))
+    status = Column(String(20), index=True)
+    website_url = Column(String(255))
+    params = Column(JSON, nullable=True)
+    # Where the results were saved (store URLs), not the results themselves
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    started_at = Column(DateTime, nullable=True)
+    # Touched regularly by the process running the job, so other processes can tell
+    # a running job from one whose process died
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,22 +1,226 @@
+from sqlalchemy import insert, update, delete, select, func
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Dict, Any, Tuple
+from collections import Counter
+import hashlib
+import uuid
 import json
+import logging
+import os
 
 from app.database.models import (
-    Store, Product, HeroProduct, FAQ, SocialHandle, ContactInfo, ImportantLink
+    Store, Product, ProductTag, HeroProduct, FAQ, SocialHandle, ContactInfo, ImportantLink, Job
 )
-from app.models.insights import ShopifyInsights
+from app.models.insights import (
+    ShopifyInsights, Product as ProductData, FAQ as FAQData, SocialHandle as SocialHandleData,
+    ContactInfo as ContactInfoData, ImportantLink as ImportantLinkData
+)
+from app.utils.timestamps import parse_timestamp, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Number of rows sent per executemany batch when bulk inserting
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))
+
+
+def parse_price(price: Optional[str]) -> Optional[float]:
+    """Numeric value of a scraped price string, or None if it isn't a number"""
+    if price is None:
+        return None
+    try:
+        return float(price.replace(",", ""))
+    except ValueError:
+        return None
+
+
+@dataclass
+class ChangeCounts:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
 
 
 class InsightsRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, batch_size: int = DB_BATCH_SIZE):
         self.db = db
+        self.batch_size = batch_size
+        # What the last update_store call changed, keyed by entity
+        self.last_sync_stats: Dict[str, ChangeCounts] = {}
     
     def get_store_by_url(self, url: str) -> Optional[Store]:
         """Get store by URL"""
         return self.db.query(Store).filter(Store.url == url).first()
     
-    def create_store(self, insights: ShopifyInsights) -> Store:
+    def get_or_create_store(self, url: str) -> Store:
+        """Get store by URL, creating an empty record if it doesn't exist yet"""
+        store = self.get_store_by_url(url)
+        if store:
+            return store
+        
+        store = Store(url=url)
+        self.db.add(store)
+        self.db.commit()
+        self.db.refresh(store)
+        return store
+    
+    @staticmethod
+    def is_fresh(store: Store, max_age: int) -> bool:
+        """Whether the store's insights were scraped less than max_age seconds ago"""
+        return store.scraped_at is not None and utcnow() - store.scraped_at < timedelta(seconds=max_age)
+    
+    @staticmethod
+    def _product_row(store_id: int, product_data: ProductData) -> Dict[str, Any]:
+        """Column values for a parsed product"""
+        return {
+            "store_id": store_id,
+            "product_id": product_data.id,
+            "title": product_data.title,
+            "handle": product_data.handle,
+            "description": product_data.description,
+            "price": product_data.price,
+            "price_amount": parse_price(product_data.price),
+            "compare_at_price": product_data.compare_at_price,
+            "available": product_data.available,
+            "tags": product_data.tags,
+            "images": product_data.images,
+            "variants": product_data.variants,
+            "url": product_data.url,
+            "updated_at": parse_timestamp(product_data.updated_at),
+            "content_hash": hashlib.sha256(product_data.model_dump_json().encode()).hexdigest()
+        }
+    
+    @staticmethod
+    def _tag_rows(store_id: int, products: Iterable[ProductData]) -> Iterable[Dict[str, Any]]:
+        for product_data in products:
+            for tag in set(product_data.tags or ()):
+                yield {"store_id": store_id, "product_id": product_data.id, "tag": tag}
+    
+    def _delete_tags(self, store: Store, product_ids: List[str]) -> None:
+        for batch in self._batches(product_ids):
+            self.db.execute(delete(ProductTag).where(
+                ProductTag.store_id == store.id, ProductTag.product_id.in_(batch)
+            ))
+    
+    def _batches(self, items: List[Any]) -> Iterable[List[Any]]:
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+    
+    def _bulk_delete(self, model, ids: List[int]) -> None:
+        for batch in self._batches(ids):
+            self.db.execute(delete(model).where(model.id.in_(batch)))
+    
+    def _bulk_insert(self, model, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert rows with Core executemany batches instead of one ORM object at a time
+        
+        Adding tens of thousands of ORM objects means tens of thousands of unit-of-work
+        operations. A Core insert() with a list of parameter sets goes through
+        SQLAlchemy's insertmanyvalues path on both SQLite and MySQL, so each batch is
+        one (or a handful of) multi-row INSERT statements.
+        """
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.db.execute(insert(model), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.db.execute(insert(model), batch)
+            count += len(batch)
+        return count
+    
+    @staticmethod
+    def newest_update(products: Iterable[ProductData]) -> Optional[datetime]:
+        stamps = [parse_timestamp(product_data.updated_at) for product_data in products]
+        return max((stamp for stamp in stamps if stamp is not None), default=None)
+    
+    def _advance_watermark(self, store: Store, products: Iterable[ProductData]) -> None:
+        """Move store.products_updated_at forward to the newest product we have stored"""
+        self.advance_watermark(store, self.newest_update(products), commit=False)
+    
+    def advance_watermark(self, store: Store, newest: Optional[datetime], commit: bool = True) -> None:
+        """Move store.products_updated_at forward to `newest` (never backwards)"""
+        if newest is not None and (store.products_updated_at is None or newest > store.products_updated_at):
+            store.products_updated_at = newest
+        if commit:
+            self.db.commit()
+    
+    def remove_products_except(self, store: Store, keep_ids: Iterable[str], newest: Optional[datetime]) -> int:
+        """Finish a catalog that was upserted page by page: drop the products it didn't list
+        
+        Only call this once every page has been written, so a stream that fails or is
+        abandoned halfway never costs the store any of its stored catalog. The
+        watermark becomes the newest product of the new catalog, as after a full scrape.
+        """
+        keep_ids = set(keep_ids)
+        removed = {
+            product_id: row_id
+            for row_id, product_id in self.db.query(Product.id, Product.product_id).filter(Product.store_id == store.id)
+            if product_id not in keep_ids
+        }
+        self._bulk_delete(Product, list(removed.values()))
+        self._delete_tags(store, list(removed))
+        store.products_updated_at = newest
+        self.db.commit()
+        return len(removed)
+    
+    def upsert_products(self, store: Store, products: List[ProductData], advance_watermark: bool = True) -> ChangeCounts:
+        """Insert new products and update changed ones, without removing anything
+        
+        Used by incremental refreshes, which only see the products updated since the
+        store's watermark, so a product missing from the batch says nothing about
+        whether it still exists. Pass advance_watermark=False when the batch is part of
+        a refresh that might still fail, and advance it once the refresh is done.
+        """
+        counts = self._sync_products(store, products, remove_missing=False)
+        if advance_watermark:
+            self._advance_watermark(store, products)
+        self.db.commit()
+        return counts
+    
+    def _insert_related(self, store: Store, insights: ShopifyInsights) -> None:
+        """Insert products, hero products, FAQs, social handles, contact info and links"""
+        # Products
+        self._bulk_insert(Product, (self._product_row(store.id, product_data) for product_data in insights.products))
+        self._bulk_insert(ProductTag, self._tag_rows(store.id, insights.products))
+        
+        # Hero products
+        self._bulk_insert(HeroProduct, (
+            {"store_id": store.id, "product_id": hero_product.id}
+            for hero_product in insights.hero_products
+        ))
+        
+        # FAQs
+        self._bulk_insert(FAQ, (
+            {"store_id": store.id, "question": faq_data.question, "answer": faq_data.answer}
+            for faq_data in insights.faqs
+        ))
+        
+        # Social handles
+        self._bulk_insert(SocialHandle, (
+            {"store_id": store.id, "platform": social_data.platform, "url": social_data.url}
+            for social_data in insights.social_handles
+        ))
+        
+        # Contact info
+        if insights.contact_info:
+            self._bulk_insert(ContactInfo, [{
+                "store_id": store.id,
+                "emails": insights.contact_info.emails,
+                "phone_numbers": insights.contact_info.phone_numbers,
+                "address": insights.contact_info.address
+            }])
+        
+        # Important links
+        self._bulk_insert(ImportantLink, (
+            {"store_id": store.id, "name": link_data.name, "url": link_data.url}
+            for link_data in insights.important_links
+        ))
+    
+    def create_store(self, insights: ShopifyInsights, commit: bool = True) -> Store:
         """Create a new store with insights"""
         # Create store
         store = Store(
@@ -24,171 +228,445 @@ class InsightsRepository:
             name=insights.store_name,
             about=insights.about_brand,
             privacy_policy=insights.privacy_policy,
-            return_refund_policy=insights.return_refund_policy
+            return_refund_policy=insights.return_refund_policy,
+            products_updated_at=self.newest_update(insights.products),
+            # Incomplete insights are saved, but count as stale so they get scraped again
+            scraped_at=None if insights.incomplete else utcnow()
         )
         self.db.add(store)
         self.db.flush()  # Flush to get the store ID
         
-        # Create products
-        for product_data in insights.products:
-            product = Product(
-                store_id=store.id,
-                product_id=product_data.id,
-                title=product_data.title,
-                handle=product_data.handle,
-                description=product_data.description,
-                price=product_data.price,
-                compare_at_price=product_data.compare_at_price,
-                available=product_data.available,
-                tags=product_data.tags,
-                images=product_data.images,
-                variants=product_data.variants,
-                url=product_data.url
-            )
-            self.db.add(product)
+        self._insert_related(store, insights)
         
-        # Create hero products
-        for hero_product in insights.hero_products:
-            hero = HeroProduct(
-                store_id=store.id,
-                product_id=hero_product.id
-            )
-            self.db.add(hero)
-        
-        # Create FAQs
-        for faq_data in insights.faqs:
-            faq = FAQ(
-                store_id=store.id,
-                question=faq_data.question,
-                answer=faq_data.answer
-            )
-            self.db.add(faq)
-        
-        # Create social handles
-        for social_data in insights.social_handles:
-            social = SocialHandle(
-                store_id=store.id,
-                platform=social_data.platform,
-                url=social_data.url
-            )
-            self.db.add(social)
+        # Commit changes
+        if commit:
+            self.db.commit()
+            self.db.refresh(store)
         
-        # Create contact info
-        if insights.contact_info:
-            contact = ContactInfo(
-                store_id=store.id,
-                emails=insights.contact_info.emails,
-                phone_numbers=insights.contact_info.phone_numbers,
-                address=insights.contact_info.address
-            )
-            self.db.add(contact)
-        
-        # Create important links
-        for link_data in insights.important_links:
-            link = ImportantLink(
-                store_id=store.id,
-                name=link_data.name,
-                url=link_data.url
-            )
-            self.db.add(link)
+        return store
+    
+    def update_store(self, store: Store, insights: ShopifyInsights, commit: bool = True) -> Store:
+        """Update an existing store with new insights
+        
+        Instead of deleting and re-inserting everything, only rows that actually changed
+        are written, so refreshing an unchanged store costs a few reads and no writes.
+        The counts of added, changed and removed rows end up in last_sync_stats.
+        
+        Sections listed in insights.incomplete (failed or out of time) are left as
+        they are, so a partial scrape never replaces good data with an empty list.
+        """
+        skip = set(insights.incomplete)
+        
+        # Update store
+        for field, column in (
+            ("store_name", "name"),
+            ("about_brand", "about"),
+            ("privacy_policy", "privacy_policy"),
+            ("return_refund_policy", "return_refund_policy"),
+        ):
+            if field not in skip:
+                setattr(store, column, getattr(insights, field))
+        if not skip:
+            store.scraped_at = utcnow()
+        
+        stats = {}
+        if "products" not in skip:
+            # A full scrape replaces the catalog, so the watermark is whatever it now contains
+            store.products_updated_at = self.newest_update(insights.products)
+            stats["products"] = self._sync_products(store, insights.products)
+        if "hero_products" not in skip:
+            stats["hero_products"] = self._sync_rows(HeroProduct, store, ("product_id",), [
+                (hero_product.id,) for hero_product in insights.hero_products
+            ])
+        if "faqs" not in skip:
+            stats["faqs"] = self._sync_rows(FAQ, store, ("question", "answer"), [
+                (faq_data.question, faq_data.answer) for faq_data in insights.faqs
+            ])
+        if "social_handles" not in skip:
+            stats["social_handles"] = self._sync_rows(SocialHandle, store, ("platform", "url"), [
+                (social_data.platform, social_data.url) for social_data in insights.social_handles
+            ])
+        if "important_links" not in skip:
+            stats["important_links"] = self._sync_rows(ImportantLink, store, ("name", "url"), [
+                (link_data.name, link_data.url) for link_data in insights.important_links
+            ])
+        if "contact_info" not in skip:
+            stats["contact_info"] = self._sync_contact_info(store, insights)
         
         # Commit changes
-        self.db.commit()
-        self.db.refresh(store)
+        if commit:
+            self.db.commit()
+            self.db.refresh(store)
+        else:
+            self.db.flush()
+        
+        self.last_sync_stats = stats
+        logger.info(f"Updated {store.url}: " + ", ".join(
+            f"{name} +{counts.added} ~{counts.changed} -{counts.removed}" for name, counts in stats.items()
+        ))
         
         return store
     
-    def update_store(self, store: Store, insights: ShopifyInsights) -> Store:
-        """Update an existing store with new insights"""
-        # Update store
-        store.name = insights.store_name
-        store.about = insights.about_brand
-        store.privacy_policy = insights.privacy_policy
-        store.return_refund_policy = insights.return_refund_policy
-        
-        # Delete existing related data
-        self.db.query(Product).filter(Product.store_id == store.id).delete()
-        self.db.query(HeroProduct).filter(HeroProduct.store_id == store.id).delete()
-        self.db.query(FAQ).filter(FAQ.store_id == store.id).delete()
-        self.db.query(SocialHandle).filter(SocialHandle.store_id == store.id).delete()
-        self.db.query(ContactInfo).filter(ContactInfo.store_id == store.id).delete()
-        self.db.query(ImportantLink).filter(ImportantLink.store_id == store.id).delete()
-        
-        # Create new related data
-        # Products
-        for product_data in insights.products:
-            product = Product(
-                store_id=store.id,
-                product_id=product_data.id,
-                title=product_data.title,
-                handle=product_data.handle,
-                description=product_data.description,
-                price=product_data.price,
-                compare_at_price=product_data.compare_at_price,
-                available=product_data.available,
-                tags=product_data.tags,
-                images=product_data.images,
-                variants=product_data.variants,
-                url=product_data.url
-            )
-            self.db.add(product)
+    def _sync_products(self, store: Store, products: List[ProductData], remove_missing: bool = True) -> ChangeCounts:
+        """Diff the stored catalog against the scraped one by product_id and content hash
         
-        # Hero products
-        for hero_product in insights.hero_products:
-            hero = HeroProduct(
-                store_id=store.id,
-                product_id=hero_product.id
-            )
-            self.db.add(hero)
+        With remove_missing=False stored products that aren't in `products` are kept.
+        """
+        counts = ChangeCounts()
+        existing: Dict[str, Tuple[int, Optional[str]]] = {}
+        duplicate_ids = []
+        for row_id, product_id, content_hash in self.db.query(
+            Product.id, Product.product_id, Product.content_hash
+        ).filter(Product.store_id == store.id):
+            if product_id in existing:
+                duplicate_ids.append(row_id)
+            else:
+                existing[product_id] = (row_id, content_hash)
         
-        # FAQs
-        for faq_data in insights.faqs:
-            faq = FAQ(
-                store_id=store.id,
-                question=faq_data.question,
-                answer=faq_data.answer
-            )
-            self.db.add(faq)
+        incoming = {product_data.id: product_data for product_data in products}
         
-        # Social handles
-        for social_data in insights.social_handles:
-            social = SocialHandle(
-                store_id=store.id,
-                platform=social_data.platform,
-                url=social_data.url
-            )
-            self.db.add(social)
+        new_rows = []
+        changed_rows = []
+        written = []
+        for product_id, product_data in incoming.items():
+            row = self._product_row(store.id, product_data)
+            if product_id not in existing:
+                new_rows.append(row)
+                written.append(product_data)
+            else:
+                row_id, content_hash = existing[product_id]
+                if content_hash != row["content_hash"]:
+                    changed_rows.append({"id": row_id, **row})
+                    written.append(product_data)
         
-        # Contact info
-        if insights.contact_info:
-            contact = ContactInfo(
-                store_id=store.id,
-                emails=insights.contact_info.emails,
-                phone_numbers=insights.contact_info.phone_numbers,
-                address=insights.contact_info.address
-            )
-            self.db.add(contact)
+        removed = {}
+        if remove_missing:
+            removed = {product_id: row_id for product_id, (row_id, _) in existing.items() if product_id not in incoming}
+        self._bulk_delete(Product, list(removed.values()) + duplicate_ids)
+        counts.removed = len(removed)
         
-        # Important links
-        for link_data in insights.important_links:
-            link = ImportantLink(
-                store_id=store.id,
-                name=link_data.name,
-                url=link_data.url
-            )
-            self.db.add(link)
+        for batch in self._batches(changed_rows):
+            # ORM bulk UPDATE by primary key, executed as executemany
+            self.db.execute(update(Product), batch)
+        counts.changed = len(changed_rows)
         
-        # Commit changes
-        self.db.commit()
-        self.db.refresh(store)
+        counts.added = self._bulk_insert(Product, new_rows)
         
-        return store
+        # Tags of changed products are simply rewritten
+        self._delete_tags(store, list(removed) + [row["product_id"] for row in changed_rows])
+        self._bulk_insert(ProductTag, self._tag_rows(store.id, written))
+        return counts
+    
+    def _sync_rows(self, model, store: Store, columns: Tuple[str, ...], incoming: List[Tuple]) -> ChangeCounts:
+        """Diff simple child rows (FAQs, links, ...) by their values
+        
+        These rows have no identity of their own, so a row whose values changed shows
+        up as one removal and one addition.
+        """
+        wanted = Counter(incoming)
+        removed_ids = []
+        for row in self.db.query(model.id, *(getattr(model, column) for column in columns)).filter(
+            model.store_id == store.id
+        ):
+            key = tuple(row[1:])
+            if wanted[key] > 0:
+                wanted[key] -= 1
+            else:
+                removed_ids.append(row[0])
+        
+        self._bulk_delete(model, removed_ids)
+        added = self._bulk_insert(model, (
+            {"store_id": store.id, **dict(zip(columns, key))}
+            for key in wanted.elements()
+        ))
+        return ChangeCounts(added=added, removed=len(removed_ids))
     
-    def save_insights(self, insights: ShopifyInsights) -> Store:
+    def _sync_contact_info(self, store: Store, insights: ShopifyInsights) -> ChangeCounts:
+        contact = self.db.query(ContactInfo).filter(ContactInfo.store_id == store.id).first()
+        if not insights.contact_info:
+            if contact:
+                self.db.delete(contact)
+                return ChangeCounts(removed=1)
+            return ChangeCounts()
+        
+        values = {
+            "emails": insights.contact_info.emails,
+            "phone_numbers": insights.contact_info.phone_numbers,
+            "address": insights.contact_info.address
+        }
+        if contact is None:
+            self.db.add(ContactInfo(store_id=store.id, **values))
+            return ChangeCounts(added=1)
+        if any(getattr(contact, key) != value for key, value in values.items()):
+            for key, value in values.items():
+                setattr(contact, key, value)
+            return ChangeCounts(changed=1)
+        return ChangeCounts()
+    
+    def save_insights(self, insights: ShopifyInsights, commit: bool = True) -> Store:
         """Save insights to database (create or update)"""
         store = self.get_store_by_url(insights.store_url)
         
         if store:
-            return self.update_store(store, insights)
+            return self.update_store(store, insights, commit=commit)
         else:
-            return self.create_store(insights)
\ No newline at end of file
+            return self.create_store(insights, commit=commit)
+    
+    def save_insights_batch(self, insights_list: List[ShopifyInsights]) -> List[Store]:
+        """Save the insights of several stores in a single transaction"""
+        stores = [self.save_insights(insights, commit=False) for insights in insights_list]
+        self.db.commit()
+        return stores
+    
+    @staticmethod
+    def to_product(row: Product) -> ProductData:
+        """Rebuild a parsed product from its stored row"""
+        return ProductData(
+            id=row.product_id,
+            title=row.title,
+            handle=row.handle,
+            description=row.description,
+            price=row.price,
+            compare_at_price=row.compare_at_price,
+            available=row.available,
+            tags=row.tags,
+            images=row.images,
+            variants=row.variants,
+            url=row.url,
+            updated_at=row.updated_at.isoformat() + "Z" if row.updated_at else None
+        )
+    
+    def get_faqs(self, store: Store) -> List[FAQData]:
+        return [FAQData(question=row.question, answer=row.answer) for row in store.faqs]
+    
+    def get_social_handles(self, store: Store) -> List[SocialHandleData]:
+        return [SocialHandleData(platform=row.platform, url=row.url) for row in store.social_handles]
+    
+    def get_contact_info(self, store: Store) -> ContactInfoData:
+        row = store.contact_info
+        if row is None:
+            return ContactInfoData()
+        return ContactInfoData(emails=row.emails or [], phone_numbers=row.phone_numbers or [], address=row.address)
+    
+    def get_important_links(self, store: Store) -> List[ImportantLinkData]:
+        return [ImportantLinkData(name=row.name, url=row.url) for row in store.important_links]
+    
+    def get_insights(self, store: Store) -> ShopifyInsights:
+        """Rebuild the insights of a store from what is stored, without scraping anything"""
+        products = [
+            self.to_product(row)
+            for row in self.db.query(Product).filter(Product.store_id == store.id).order_by(Product.id)
+        ]
+        by_id = {product.id: product for product in products}
+        hero_products = [
+            by_id[row.product_id] for row in store.hero_products if row.product_id in by_id
+        ]
+        
+        return ShopifyInsights(
+            store_url=store.url,
+            store_name=store.name or "",
+            products=products,
+            hero_products=hero_products,
+            privacy_policy=store.privacy_policy,
+            return_refund_policy=store.return_refund_policy,
+            faqs=self.get_faqs(store),
+            social_handles=self.get_social_handles(store),
+            contact_info=self.get_contact_info(store),
+            about_brand=store.about,
+            important_links=self.get_important_links(store),
+            scraped_at=store.scraped_at
+        )
+    
+    def list_products(
+        self,
+        store: Store,
+        limit: int,
+        after_id: Optional[int] = None,
+        available: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        tag: Optional[str] = None,
+        title: Optional[str] = None,
+    ) -> Tuple[List[Product], Optional[int]]:
+        """One page of a store's products in id order, plus the id to continue after
+        
+        Keyset pagination (id > cursor) costs the same on the last page as on the first,
+        unlike OFFSET. Every filter is scoped to the store, so the composite indexes on
+        (store_id, ...) keep even the title search to that store's rows.
+        """
+        query = self.db.query(Product).filter(Product.store_id == store.id)
+        if after_id is not None:
+            query = query.filter(Product.id > after_id)
+        if available is not None:
+            query = query.filter(Product.available == available)
+        if min_price is not None:
+            query = query.filter(Product.price_amount >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price_amount <= max_price)
+        if tag is not None:
+            query = query.filter(Product.product_id.in_(
+                select(ProductTag.product_id).where(ProductTag.store_id == store.id, ProductTag.tag == tag)
+            ))
+        if title:
+            query = query.filter(Product.title.icontains(title, autoescape=True))
+        
+        rows = query.order_by(Product.id).limit(limit + 1).all()
+        next_id = rows[limit - 1].id if len(rows) > limit else None
+        return rows[:limit], next_id
+    
+    def iter_catalog_features(self, store_id: Optional[int] = None) -> Iterable[Tuple[int, str, Optional[List[str]], Optional[float]]]:
+        """(store_id, title, tags, price_amount) of every stored product, or one store's, read in keyset batches"""
+        last_id = 0
+        while True:
+            query = self.db.query(Product.id, Product.store_id, Product.title, Product.tags, Product.price_amount)
+            if store_id is not None:
+                query = query.filter(Product.store_id == store_id)
+            rows = query.filter(Product.id > last_id).order_by(Product.id).limit(self.batch_size).all()
+            if not rows:
+                return
+            for row in rows:
+                yield row.store_id, row.title or "", row.tags, row.price_amount
+            last_id = rows[-1].id
+    
+    def get_stores(self, store_ids: Iterable[int]) -> Dict[int, Store]:
+        """Stores by id"""
+        store_ids = list(store_ids)
+        if not store_ids:
+            return {}
+        return {store.id: store for store in self.db.query(Store).filter(Store.id.in_(store_ids))}
+    
+    def needs_backfill(self) -> bool:
+        """Whether some products have a price but no price_amount yet"""
+        return self.db.query(
+            self.db.query(Product.id).filter(
+                Product.price_amount.is_(None), Product.price.isnot(None), Product.price != ""
+            ).exists()
+        ).scalar()
+    
+    def backfill_products(self) -> int:
+        """Fill price_amount and product_tags for products saved before they existed
+        
+        Diff-based updates only rewrite products that changed, so rows from an older
+        database would otherwise never get them. Only products without a price_amount
+        are touched, and their tag rows are replaced rather than added to, so running
+        it again is harmless.
+        """
+        count = 0
+        last_id = 0
+        while True:
+            rows = self.db.query(Product.id, Product.store_id, Product.product_id, Product.price, Product.tags).filter(
+                Product.id > last_id, Product.price_amount.is_(None)
+            ).order_by(Product.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            
+            self.db.execute(update(Product), [
+                {"id": row.id, "price_amount": parse_price(row.price)} for row in rows
+            ])
+            for store_id in {row.store_id for row in rows}:
+                self.db.execute(delete(ProductTag).where(
+                    ProductTag.store_id == store_id,
+                    ProductTag.product_id.in_([row.product_id for row in rows if row.store_id == store_id])
+                ))
+            self._bulk_insert(ProductTag, (
+                {"store_id": row.store_id, "product_id": row.product_id, "tag": tag}
+                for row in rows for tag in set(row.tags or ())
+            ))
+            count += len(rows)
+            last_id = rows[-1].id
+        
+        self.db.commit()
+        return count
+
+
+class JobRepository:
+    """Persistence for background jobs"""
+    
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self.db.query(Job).filter(Job.id == job_id).first()
+    
+    def create_job(self, kind: str, website_url: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        job = Job(id=str(uuid.uuid4()), kind=kind, status=self.QUEUED, website_url=website_url, params=params or {})
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+    
+    def claim(self, job: Job) -> bool:
+        """Mark a queued job as running, unless another worker got to it first
+        
+        Several processes may have the same job id in their queues (e.g. after they
+        all resumed it on start), so the status is only changed if it is still queued.
+        """
+        now = utcnow()
+        claimed = self.db.execute(
+            update(Job).where(Job.id == job.id, Job.status == self.QUEUED).values(
+                status=self.RUNNING, started_at=now, heartbeat_at=now
+            )
+        ).rowcount == 1
+        self.db.commit()
+        self.db.refresh(job)
+        return claimed
+    
+    def heartbeat(self, job_ids: List[str]) -> None:
+        """Tell other processes these jobs are still being worked on"""
+        if job_ids:
+            self.db.execute(
+                update(Job).where(Job.id.in_(job_ids), Job.status == self.RUNNING).values(heartbeat_at=utcnow())
+            )
+            self.db.commit()
+    
+    def mark_succeeded(self, job: Job, result: Dict[str, Any]) -> None:
+        job.status = self.SUCCEEDED
+        job.result = result
+        job.finished_at = utcnow()
+        self.db.commit()
+    
+    def mark_failed(self, job: Job, error: str) -> None:
+        job.status = self.FAILED
+        job.error = error
+        job.finished_at = utcnow()
+        self.db.commit()
+    
+    def release(self, job_ids: List[str]) -> None:
+        """Put running jobs this process is giving up (on shutdown) back in the queue"""
+        self.db.execute(
+            update(Job).where(Job.id.in_(job_ids), Job.status == self.RUNNING).values(
+                status=self.QUEUED, started_at=None, heartbeat_at=None
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.commit()
+    
+    def requeue_stale(self, stale_after: float) -> List[str]:
+        """Put running jobs whose process died back in the queue, returning their ids
+        
+        A running job is only considered abandoned when nobody has sent a heartbeat for
+        it in `stale_after` seconds, so jobs other live workers are running are left alone.
+        """
+        stale = (
+            Job.status == self.RUNNING,
+            func.coalesce(Job.heartbeat_at, Job.started_at, Job.created_at) < utcnow() - timedelta(seconds=stale_after)
+        )
+        job_ids = [job_id for (job_id,) in self.db.query(Job.id).filter(*stale).order_by(Job.created_at)]
+        if job_ids:
+            # Conditional on the job still being stale, in case its worker just came back
+            self.db.execute(
+                update(Job).where(Job.id.in_(job_ids), *stale).values(status=self.QUEUED, started_at=None, heartbeat_at=None),
+                execution_options={"synchronize_session": False}
+            )
+            self.db.commit()
+        return job_ids
+    
+    def requeue_unfinished(self, stale_after: float) -> List[str]:
+        """Ids of every queued job, after requeueing abandoned running ones (see requeue_stale)"""
+        self.requeue_stale(stale_after)
+        return [job_id for (job_id,) in self.db.query(Job.id).filter(Job.status == self.QUEUED).order_by(Job.created_at)]
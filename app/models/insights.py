@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel, HttpUrl, Field
 
@@ -14,6 +15,7 @@ class Product(BaseModel):
     images: Optional[List[str]] = None
     variants: Optional[List[Dict[str, Any]]] = None
     url: Optional[str] = None
+    updated_at: Optional[str] = None
 
 
 class SocialHandle(BaseModel):
@@ -49,11 +51,61 @@ class ShopifyInsights(BaseModel):
     contact_info: ContactInfo = Field(default_factory=ContactInfo)
     about_brand: Optional[str] = None
     important_links: List[ImportantLink] = Field(default_factory=list)
+    scraped_at: Optional[datetime] = None
+    # Sections that couldn't be extracted (failed or ran out of time)
+    incomplete: List[str] = Field(default_factory=list)
+
+
+class ProductPage(BaseModel):
+    products: List[Product] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class ProductRefreshResult(BaseModel):
+    store_url: str
+    added: int = 0
+    changed: int = 0
+    products_updated_at: Optional[datetime] = None
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    website_url: str
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class JobResult(BaseModel):
+    job_id: str
+    kind: str
+    insights: List[ShopifyInsights] = Field(default_factory=list)
 
 
 class InsightRequest(BaseModel):
     website_url: HttpUrl
 
 
+class BatchRequest(BaseModel):
+    website_urls: List[str] = Field(..., min_length=1)
+
+
+class BatchItem(BaseModel):
+    website_url: str
+    status: str
+    insights: Optional[ShopifyInsights] = None
+    error: Optional[str] = None
+
+
+class SimilarStore(BaseModel):
+    store_url: str
+    store_name: Optional[str] = None
+    # 0-1, how alike the two catalogs are
+    score: float
+
+
 class ErrorResponse(BaseModel):
     detail: str
\ No newline at end of file
@@ -1,14 +1,35 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Dict, Any, List
-import requests
-from urllib.parse import urlparse
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+import base64
+import binascii
+import logging
+import os
+import re
+import httpx
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.models.insights import InsightRequest, ShopifyInsights
-from app.services.shopify_service import ShopifyService
-from app.services.competitor_service import CompetitorService
-from app.database.database import get_db
-from app.database.repository import InsightsRepository
+from app.models.insights import (
+    InsightRequest, Product, ProductPage, ProductRefreshResult, ShopifyInsights, FAQ, SocialHandle, ContactInfo, ImportantLink,
+    JobStatus, JobResult, BatchRequest, SimilarStore
+)
+from app.services.shopify_service import AsyncShopifyService
+from app.services.competitor_service import AsyncCompetitorService
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.store_resolver import StoreIdentity
+from app.services.similarity import similarity_index
+from app.database.database import get_db, SessionLocal
+from app.utils.error_handlers import SHOPIFY_SPECIFIC_ERRORS
+from app.database.repository import ChangeCounts, InsightsRepository, JobRepository
+from app.database.models import Job, Store
+from app.services.jobs import job_queue
+from app.services.batch import BatchAnalyzer, batch_item, resolve_shopify_store, save_in_batches, store_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Stored insights younger than this (in seconds) are served without scraping again
+INSIGHTS_MAX_AGE = int(os.getenv("INSIGHTS_MAX_AGE", "86400"))
 
 router = APIRouter(
     prefix="/api/v1",
@@ -16,45 +37,104 @@ router = APIRouter(
 )
 
 
-def validate_shopify_url(website_url: str) -> str:
-    """Validate that the URL is a Shopify store"""
-    # Normalize URL
-    if not website_url.startswith(("http://", "https://")):
-        website_url = "https://" + website_url
+def normalize_store_url(store_url: str) -> str:
+    """Turn a store URL or bare domain from a path parameter into the form stores are saved under"""
+    # Proxies and clients often collapse the double slash of a URL embedded in a path
+    store_url = re.sub(r"^(https?):/+", r"\1://", store_url.strip())
+    if not store_url.startswith(("http://", "https://")):
+        store_url = "https://" + store_url
+    return store_url.rstrip("/") + "/"
+
+
+async def scrape_store(website_url: str, db: Session, identity: Optional[StoreIdentity] = None) -> Tuple[ShopifyInsights, Store]:
+    """Scrape a store live and save the insights"""
+    # Validate the URL, unless the caller just did
+    if identity is None:
+        identity = await resolve_shopify_store(website_url)
     
+    # Create service and get insights
+    service = AsyncShopifyService(identity.website_url, first_page=identity.first_page)
     try:
-        # Check if the URL is valid
-        response = requests.head(website_url, timeout=10)
-        response.raise_for_status()
-        
-        # Check if it's a Shopify store
-        is_shopify = False
-        
-        # Method 1: Check for Shopify in server headers
-        server = response.headers.get("server", "").lower()
-        if "shopify" in server:
-            is_shopify = True
-            
-        # Method 2: Try to access products.json
-        if not is_shopify:
-            parsed_url = urlparse(website_url)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            products_url = f"{base_url}/products.json"
-            
-            try:
-                products_response = requests.get(products_url, timeout=10)
-                if products_response.status_code == 200 and "products" in products_response.json():
-                    is_shopify = True
-            except:
-                pass
-        
-        if not is_shopify:
-            raise HTTPException(status_code=400, detail="The provided URL is not a Shopify store")
-            
-        return website_url
-        
-    except requests.RequestException:
-        raise HTTPException(status_code=404, detail="Website not found or not accessible")
+        insights = await service.get_all_insights()
+    except httpx.HTTPStatusError as e:
+        # Still throttled after backing off and retrying
+        if e.response.status_code == 429:
+            raise HTTPException(status_code=429, detail=SHOPIFY_SPECIFIC_ERRORS["rate_limited"])
+        raise
+    except CircuitOpenError as e:
+        raise store_unavailable(e)
+    
+    # Save insights to database; a big catalog is a lot of rows, so keep it off the event loop
+    store = await run_in_threadpool(InsightsRepository(db).save_insights, insights)
+    insights.scraped_at = store.scraped_at
+    
+    return insights, store
+
+
+async def get_fresh_store(store_url: str, max_age: int, db: Session) -> Store:
+    """Get a stored store, scraping it first if it is missing or older than max_age seconds
+    
+    If the store is stale and the scrape fails, we would rather serve the old data
+    than nothing, so the stored copy is returned instead of the error.
+    """
+    website_url = normalize_store_url(store_url)
+    repository = InsightsRepository(db)
+    store = repository.get_store_by_url(website_url)
+    identity = None
+    if store is None:
+        # Stores are saved under their canonical URL, which may be a redirect away.
+        # Only the resolver knows, and after a restart it has to ask the store again.
+        identity = await resolve_shopify_store(website_url)
+        website_url = identity.website_url
+        store = repository.get_store_by_url(website_url)
+    if store is not None and repository.is_fresh(store, max_age):
+        return store
+    
+    try:
+        _, store = await scrape_store(website_url, db, identity)
+    except Exception as e:
+        if store is None or store.scraped_at is None:
+            raise
+        logger.warning(f"Refreshing {website_url} failed, serving stored insights: {str(e)}")
+        db.rollback()
+    return store
+
+
+async def scrape_competitors(website_url: str, limit: int, db: Session) -> List[ShopifyInsights]:
+    """Find a store's competitors, scrape them live and save their insights"""
+    # Validate the URL
+    website_url = (await resolve_shopify_store(website_url)).website_url
+    
+    # Get competitor insights
+    competitor_service = AsyncCompetitorService(website_url)
+    competitor_insights = await competitor_service.get_competitors_insights(limit=limit)
+    
+    # Save competitor insights to database
+    repository = InsightsRepository(db)
+    for insights in competitor_insights:
+        await run_in_threadpool(repository.save_insights, insights)
+    
+    return competitor_insights
+
+
+async def run_insights_job(params: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    insights, store = await scrape_store(params["website_url"], db)
+    return {"store_urls": [store.url]}
+
+
+async def run_competitors_job(params: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    competitor_insights = await scrape_competitors(params["website_url"], params.get("limit", 3), db)
+    return {"store_urls": [insights.store_url for insights in competitor_insights]}
+
+
+job_queue.register("insights", run_insights_job)
+job_queue.register("competitors", run_competitors_job)
+
+
+def max_age_query(
+    max_age: int = Query(INSIGHTS_MAX_AGE, ge=0, description="Scrape again if the stored insights are older than this many seconds")
+) -> int:
+    return max_age
 
 
 @router.post("/insights", response_model=ShopifyInsights)
@@ -63,17 +143,7 @@ async def get_insights(request: InsightRequest, db: Session = Depends(get_db)):
     Get insights from a Shopify store
     """
     try:
-        # Validate the URL
-        website_url = validate_shopify_url(str(request.website_url))
-        
-        # Create service and get insights
-        service = ShopifyService(website_url)
-        insights = service.get_all_insights()
-        
-        # Save insights to database
-        repository = InsightsRepository(db)
-        repository.save_insights(insights)
-        
+        insights, _ = await scrape_store(str(request.website_url), db)
         return insights
         
     except HTTPException:
@@ -91,22 +161,384 @@ async def get_competitor_insights(
     """
     Get insights from a Shopify store and its competitors
     """
+    try:
+        return await scrape_competitors(str(request.website_url), limit, db)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+async def next_page(pages: AsyncIterator[List[Product]]) -> Optional[List[Product]]:
+    try:
+        return await pages.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+@router.post("/insights/products/stream")
+async def stream_products(request: InsightRequest):
+    """
+    Stream a store's product catalog as NDJSON, one product per line
+
+    Products are saved to the database page by page as they arrive, so memory use
+    stays flat no matter how large the catalog is. Pages are upserted, and products
+    that are gone from the store are only deleted once the last page has arrived, so
+    a stream that fails or is abandoned halfway leaves the stored catalog intact.
+    """
+    # Validate the URL
+    identity = await resolve_shopify_store(str(request.website_url))
+    service = AsyncShopifyService(identity.website_url, first_page=identity.first_page)
+    pages = service.iter_product_pages()
+
+    # Get the first page before the response starts, so a store we can't read at all
+    # still gets a proper error status instead of an empty 200
+    try:
+        first = await next_page(pages)
+    except CircuitOpenError as e:
+        raise store_unavailable(e)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            raise HTTPException(status_code=429, detail=SHOPIFY_SPECIFIC_ERRORS["rate_limited"])
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    async def generate():
+        # The response outlives the request scope, so the stream gets its own session
+        db = SessionLocal()
+        try:
+            repository = InsightsRepository(db)
+            store = await run_in_threadpool(repository.get_or_create_store, service.website_url)
+            seen = set()
+            newest = None
+
+            page = first
+            while page is not None:
+                await run_in_threadpool(repository.upsert_products, store, page, False)
+                seen.update(product.id for product in page)
+                page_newest = repository.newest_update(page)
+                if page_newest is not None and (newest is None or page_newest > newest):
+                    newest = page_newest
+                for product in page:
+                    yield product.model_dump_json() + "\n"
+                page = await next_page(pages)
+
+            # Every page made it, so whatever we didn't see is gone from the store
+            await run_in_threadpool(repository.remove_products_except, store, seen, newest)
+        except Exception as e:
+            # Too late to change the status; the stored catalog keeps what it had
+            logger.error(f"Streaming products of {service.website_url} failed: {str(e)}")
+            raise
+        finally:
+            await pages.aclose()
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/insights/products/refresh", response_model=ProductRefreshResult)
+async def refresh_products(request: InsightRequest, db: Session = Depends(get_db)):
+    """
+    Incrementally refresh a store's stored catalog
+
+    Only products updated since the last sync are fetched and written. Nothing is
+    removed; run a full /insights scrape to drop products that were deleted.
+    """
     try:
         # Validate the URL
-        website_url = validate_shopify_url(str(request.website_url))
+        identity = await resolve_shopify_store(str(request.website_url))
+        # Without the response cache, or a refresh within its products TTL would be
+        # answered with the same newest-first pages as the last one and miss updates
+        service = AsyncShopifyService(identity.website_url, use_cache=False)
+
+        # The diffs and bulk writes run in the threadpool, like stream_products'
+        repository = InsightsRepository(db)
+        store = await run_in_threadpool(repository.get_or_create_store, service.website_url)
+
+        counts = ChangeCounts()
+        newest = None
+        async for page in service.iter_updated_product_pages(store.products_updated_at):
+            page_counts = await run_in_threadpool(repository.upsert_products, store, page, False)
+            counts.added += page_counts.added
+            counts.changed += page_counts.changed
+            page_newest = repository.newest_update(page)
+            if page_newest is not None and (newest is None or page_newest > newest):
+                newest = page_newest
         
-        # Get competitor insights
-        competitor_service = CompetitorService(website_url)
-        competitor_insights = competitor_service.get_competitors_insights(limit=limit)
+        # Only once every page made it, otherwise the next refresh would skip the ones that didn't
+        await run_in_threadpool(repository.advance_watermark, store, newest)
+
+        return ProductRefreshResult(
+            store_url=store.url,
+            added=counts.added,
+            changed=counts.changed,
+            products_updated_at=store.products_updated_at
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/insights", response_model=ShopifyInsights)
+async def get_stored_insights(store_url: str, max_age: int = Depends(max_age_query), db: Session = Depends(get_db)):
+    """
+    Get a store's insights from the database, scraping only if they are missing or stale
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        return InsightsRepository(db).get_insights(store)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def encode_cursor(product_id: int) -> str:
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/stores/{store_url:path}/products", response_model=ProductPage)
+async def list_stored_products(
+    store_url: str,
+    limit: int = Query(50, ge=1, le=250, description="Products per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    available: Optional[bool] = Query(None, description="Only available (or unavailable) products"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    tag: Optional[str] = Query(None, description="Only products with this exact tag"),
+    q: Optional[str] = Query(None, description="Case-insensitive title substring"),
+    max_age: int = Depends(max_age_query),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through a store's stored products, with optional filters
+    
+    Pass the returned next_cursor to get the following page; it is null on the last page.
+    """
+    try:
+        after_id = decode_cursor(cursor) if cursor else None
+        store = await get_fresh_store(store_url, max_age, db)
         
-        # Save competitor insights to database
         repository = InsightsRepository(db)
-        for insights in competitor_insights:
-            repository.save_insights(insights)
+        rows, next_id = repository.list_products(
+            store, limit, after_id=after_id, available=available,
+            min_price=min_price, max_price=max_price, tag=tag, title=q
+        )
+        
+        return ProductPage(
+            products=[repository.to_product(row) for row in rows],
+            next_cursor=encode_cursor(next_id) if next_id is not None else None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/faqs", response_model=List[FAQ])
+async def get_stored_faqs(store_url: str, max_age: int = Depends(max_age_query), db: Session = Depends(get_db)):
+    """
+    Get a store's FAQs from the database
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        return InsightsRepository(db).get_faqs(store)
         
-        return competitor_insights
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/social-handles", response_model=List[SocialHandle])
+async def get_stored_social_handles(store_url: str, max_age: int = Depends(max_age_query), db: Session = Depends(get_db)):
+    """
+    Get a store's social handles from the database
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        return InsightsRepository(db).get_social_handles(store)
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/contact-info", response_model=ContactInfo)
+async def get_stored_contact_info(store_url: str, max_age: int = Depends(max_age_query), db: Session = Depends(get_db)):
+    """
+    Get a store's contact information from the database
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        return InsightsRepository(db).get_contact_info(store)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/important-links", response_model=List[ImportantLink])
+async def get_stored_important_links(store_url: str, max_age: int = Depends(max_age_query), db: Session = Depends(get_db)):
+    """
+    Get a store's important links from the database
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        return InsightsRepository(db).get_important_links(store)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stores/{store_url:path}/similar", response_model=List[SimilarStore])
+async def get_similar_stores(
+    store_url: str,
+    limit: int = Query(5, description="Maximum number of stores to return", ge=1, le=50),
+    max_age: int = Depends(max_age_query),
+    db: Session = Depends(get_db)
+):
+    """
+    Find the stored stores whose catalogs are most like this store's
+    
+    Stores are compared by the words in their product titles and tags and by their
+    price distributions, using the local similarity index, so no search engine is
+    involved. Only stores already in the database can be found.
+    """
+    try:
+        store = await get_fresh_store(store_url, max_age, db)
+        # The first build reads the whole catalog table and refreshing this store's row
+        # reads its products, so keep it off the event loop
+        index = await run_in_threadpool(similarity_index.get, store.id, store.scraped_at)
+        
+        nearest = index.nearest(store.id, limit)
+        stores = InsightsRepository(db).get_stores(store_id for store_id, _ in nearest)
+        return [
+            SimilarStore(store_url=stores[store_id].url, store_name=stores[store_id].name, score=score)
+            for store_id, score in nearest if store_id in stores
+        ]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+# Shared by every batch request, so the concurrency limits are global
+batch_analyzer = BatchAnalyzer(resolve=resolve_shopify_store)
+
+
+@router.post("/insights/batch")
+async def analyze_batch(request: BatchRequest):
+    """
+    Analyze many stores in one request, streaming one NDJSON line per store as each finishes
+
+    Stores are analyzed with a global (BATCH_CONCURRENCY) and a per-host
+    (BATCH_PER_HOST_CONCURRENCY) limit shared by all batch requests, and saved to the
+    database BATCH_SAVE_SIZE stores at a time.
+    """
+    async def generate():
+        # The response outlives the request scope, so the stream gets its own session
+        db = SessionLocal()
+        results = save_in_batches(batch_analyzer.run(request.website_urls), InsightsRepository(db))
+        try:
+            async for result in results:
+                yield batch_item(result).model_dump_json() + "\n"
+        finally:
+            # Save whatever finished, even if the client went away
+            await results.aclose()
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def job_status(job: Job) -> JobStatus:
+    return JobStatus(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        website_url=job.website_url,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+def get_job_or_404(job_id: str, db: Session) -> Job:
+    job = JobRepository(db).get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/insights", response_model=JobStatus, status_code=202)
+async def submit_insights_job(request: InsightRequest, db: Session = Depends(get_db)):
+    """
+    Queue a store scrape and return straight away; poll /jobs/{job_id} for its status
+    """
+    job = job_queue.submit(db, "insights", str(request.website_url))
+    return job_status(job)
+
+
+@router.post("/jobs/competitors", response_model=JobStatus, status_code=202)
+async def submit_competitors_job(
+    request: InsightRequest,
+    limit: int = Query(3, description="Maximum number of competitors to analyze", ge=1, le=5),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a competitor analysis and return straight away; poll /jobs/{job_id} for its status
+    """
+    job = job_queue.submit(db, "competitors", str(request.website_url), {"limit": limit})
+    return job_status(job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str, db: Session = Depends(get_db)):
+    """
+    Get the status of a background job
+    """
+    return job_status(get_job_or_404(job_id, db))
+
+
+@router.get("/jobs/{job_id}/result", response_model=JobResult)
+async def get_job_result(job_id: str, db: Session = Depends(get_db)):
+    """
+    Get the insights a finished job saved
+    
+    Results are read from the database, so they reflect the latest stored insights
+    of the stores the job analyzed.
+    """
+    job = get_job_or_404(job_id, db)
+    if job.status != JobRepository.SUCCEEDED:
+        detail = f"Job is {job.status}"
+        if job.error:
+            detail += f": {job.error}"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    repository = InsightsRepository(db)
+    insights = []
+    for store_url in (job.result or {}).get("store_urls", []):
+        store = repository.get_store_by_url(store_url)
+        if store is not None:
+            insights.append(repository.get_insights(store))
+    
+    return JobResult(job_id=job.id, kind=job.kind, insights=insights)
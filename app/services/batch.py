@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException
+
+from app.database.repository import InsightsRepository
+from app.models.insights import BatchItem, ShopifyInsights
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.rate_limiter import RateLimiter
+from app.services.shopify_service import AsyncShopifyService, _cancel_pending
+from app.services.store_resolver import StoreIdentity, store_resolver
+from app.utils.error_handlers import SHOPIFY_SPECIFIC_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Stores analyzed at the same time across every batch in the process
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+# Stores on the same host analyzed at the same time, so a batch full of one
+# domain doesn't hammer it
+BATCH_PER_HOST_CONCURRENCY = int(os.getenv("BATCH_PER_HOST_CONCURRENCY", "2"))
+# Number of stores saved per database transaction
+BATCH_SAVE_SIZE = int(os.getenv("BATCH_SAVE_SIZE", "20"))
+
+
+@dataclass
+class BatchResult:
+    website_url: str
+    insights: Optional[ShopifyInsights] = None
+    error: Optional[str] = None
+
+
+def batch_item(result: BatchResult) -> BatchItem:
+    """The NDJSON line for a result, shared by the API and the CLI"""
+    return BatchItem(
+        website_url=result.website_url,
+        status="ok" if result.insights is not None else "error",
+        insights=result.insights,
+        error=result.error
+    )
+
+
+async def resolve_shopify_store(website_url: str) -> StoreIdentity:
+    """Check that the URL is a Shopify store and find its canonical URL
+    
+    Hosts are cached by the store resolver, so this is usually free. When it isn't,
+    the first products.json page it downloads comes along in the identity, ready to be
+    handed to AsyncShopifyService.
+    """
+    try:
+        identity = await store_resolver.resolve(website_url)
+    except CircuitOpenError as e:
+        raise store_unavailable(e)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=404, detail="Website not found or not accessible")
+        
+    if not identity.is_shopify:
+        raise HTTPException(status_code=400, detail="The provided URL is not a Shopify store")
+        
+    return identity
+
+
+def store_unavailable(error: CircuitOpenError) -> HTTPException:
+    # The store kept failing or blocking us recently, so we didn't even try
+    return HTTPException(
+        status_code=503,
+        detail=SHOPIFY_SPECIFIC_ERRORS["unavailable"],
+        headers={"Retry-After": str(max(1, round(error.retry_in)))}
+    )
+
+
+class HostLimiter:
+    """Per-host semaphores that are dropped again once nobody is using them"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, host: str) -> AsyncIterator[None]:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.limit)
+        self._users[host] = self._users.get(host, 0) + 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._users[host] -= 1
+            if not self._users[host]:
+                del self._users[host]
+                del self._semaphores[host]
+
+
+def normalize_url(website_url: str) -> str:
+    website_url = website_url.strip()
+    if not website_url.startswith(("http://", "https://")):
+        website_url = "https://" + website_url
+    return website_url.rstrip("/")
+
+
+class BatchAnalyzer:
+    """Analyze many stores with a global and a per-host concurrency limit.
+
+    Every store goes through the same pooled HTTP client, and the limits are shared
+    by all batches run through one analyzer, so the number of stores in flight is
+    set by the server rather than by how many requests clients send in parallel.
+    Results are yielded as soon as each store finishes, not in input order.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = BATCH_CONCURRENCY,
+        per_host: int = BATCH_PER_HOST_CONCURRENCY,
+        resolve: Optional[Callable[[str], Awaitable[StoreIdentity]]] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        use_cache: bool = True,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.concurrency = concurrency
+        self.resolve = resolve
+        self.client = client
+        # Passed on to every AsyncShopifyService (response cache and path memory)
+        self.use_cache = use_cache
+        # The shared per-host limiter unless one is given (see app.services.rate_limiter)
+        self.rate_limiter = rate_limiter
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._hosts = HostLimiter(per_host)
+
+    async def run(self, website_urls: Iterable[str]) -> AsyncIterator[BatchResult]:
+        """Analyze every store and yield the results as they complete"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        # The same store twice in one batch would only be scraped twice
+        urls = list(dict.fromkeys(normalize_url(url) for url in website_urls if url.strip()))
+        tasks = [asyncio.ensure_future(self._analyze(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Nothing left to do if the consumer went away early
+            _cancel_pending(tasks)
+
+    async def _analyze(self, website_url: str) -> BatchResult:
+        # Wait for the host first, so a queue of same-host stores doesn't hold global slots
+        async with self._hosts.hold(urlparse(website_url).netloc):
+            async with self._semaphore:
+                try:
+                    first_page = None
+                    if self.resolve is not None:
+                        identity = await self.resolve(website_url)
+                        website_url, first_page = identity.website_url, identity.first_page
+                    service = AsyncShopifyService(
+                        website_url,
+                        client=self.client,
+                        use_cache=self.use_cache,
+                        rate_limiter=self.rate_limiter,
+                        first_page=first_page
+                    )
+                    return BatchResult(website_url=website_url, insights=await service.get_all_insights())
+                except HTTPException as e:
+                    return BatchResult(website_url=website_url, error=str(e.detail))
+                except Exception as e:
+                    logger.error(f"Error analyzing {website_url}: {str(e)}")
+                    return BatchResult(website_url=website_url, error=str(e))
+
+
+def save_results(repository: InsightsRepository, results: List[BatchResult]) -> List[BatchResult]:
+    """Save successful results in one transaction, falling back to one store at a time
+
+    One store that can't be saved (bad data, a constraint) must not cost the others
+    theirs, so if the batch fails each store is saved on its own, and the ones that
+    still fail come back as errors.
+    """
+    try:
+        repository.save_insights_batch([result.insights for result in results])
+        return results
+    except Exception as e:
+        repository.db.rollback()
+        logger.warning(f"Saving {len(results)} stores together failed, saving them one by one: {str(e)}")
+
+    saved = []
+    for result in results:
+        try:
+            repository.save_insights(result.insights)
+            saved.append(result)
+        except Exception as e:
+            repository.db.rollback()
+            logger.error(f"Error saving {result.website_url}: {str(e)}")
+            saved.append(BatchResult(website_url=result.website_url, error=f"Could not save insights: {str(e)}"))
+    return saved
+
+
+async def save_in_batches(
+    results: AsyncGenerator[BatchResult, None],
+    repository: InsightsRepository,
+    batch_size: int = BATCH_SAVE_SIZE,
+) -> AsyncIterator[BatchResult]:
+    """Save the successful results batch_size stores per transaction, passing every result on
+
+    Successful results are passed on once their batch is saved, so an "ok" result
+    means the store is in the database; failed ones are passed on straight away.
+    Saving blocks on the database, so it runs in a worker thread.
+    """
+    pending: List[BatchResult] = []
+    try:
+        async for result in results:
+            if result.insights is None:
+                yield result
+                continue
+            pending.append(result)
+            if len(pending) >= batch_size:
+                batch, pending = pending, []
+                for saved in await asyncio.to_thread(save_results, repository, batch):
+                    yield saved
+
+        batch, pending = pending, []
+        if batch:
+            for saved in await asyncio.to_thread(save_results, repository, batch):
+                yield saved
+    finally:
+        # Stop the analysis if we were closed early, but keep what already finished
+        await results.aclose()
+        if pending:
+            await asyncio.to_thread(save_results, repository, pending)
@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed requests to a host before we stop sending it anything
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds an open breaker waits before letting a single probe request through
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Responses that mean the host is down or blocking us. 429 and 503 aren't in here:
+# the rate limiter slows down for those instead. Shopify answers bots it has
+# blocked with 403 or its own 430.
+BLOCKED_STATUSES = {403, 430}
+FAILURE_STATUSES = BLOCKED_STATUSES | {500, 502, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose breaker is open"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} is failing or blocking us, not retrying for another {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+@dataclass
+class HostCircuit:
+    failures: int = 0
+    opened_at: Optional[float] = None
+    # Half-open: one request is checking whether the host has recovered
+    probing: bool = False
+
+
+class CircuitBreaker:
+    """Circuit breaker per host, shared by every service in the process.
+
+    A store that is down or has blocked us used to cost every extractor, every
+    candidate path and every retry its full timeout. After `failure_threshold`
+    consecutive failures the breaker opens and requests to that host fail straight
+    away with CircuitOpenError. Once `reset_timeout` has passed, one request is let
+    through (half-open): if it succeeds the breaker closes, otherwise it opens again.
+
+    Only hosts with failures are tracked, so the state stays small no matter how
+    many stores are analyzed.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits: Dict[str, HostCircuit] = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str) -> None:
+        """Raise CircuitOpenError unless a request to `host` may be sent now"""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.opened_at is None:
+                return
+            remaining = circuit.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or circuit.probing:
+                raise CircuitOpenError(host, max(remaining, 0))
+            circuit.probing = True
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.pop(host, None)
+        if circuit is not None and circuit.opened_at is not None:
+            logger.info(f"Circuit for {host} closed again")
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(host, HostCircuit())
+            circuit.failures += 1
+            if circuit.probing or (circuit.opened_at is None and circuit.failures >= self.failure_threshold):
+                circuit.opened_at = time.monotonic()
+                circuit.probing = False
+                logger.warning(f"Circuit for {host} opened after {circuit.failures} consecutive failures")
+
+    def record_response(self, host: str, status_code: int) -> None:
+        if status_code in FAILURE_STATUSES:
+            self.record_failure(host)
+        else:
+            self.record_success(host)
+
+    def release(self, host: str) -> None:
+        """Give up a half-open probe that never got an answer (e.g. it was cancelled)"""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.probing = False
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            return self._state(self._circuits.get(host), time.monotonic())
+
+    def _state(self, circuit: Optional[HostCircuit], now: float) -> str:
+        if circuit is None or circuit.opened_at is None:
+            return "closed"
+        if circuit.probing or now - circuit.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """State of every host that isn't simply healthy, for the health endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                host: {
+                    "state": self._state(circuit, now),
+                    "failures": circuit.failures,
+                    "retry_in": round(max(0.0, circuit.opened_at + self.reset_timeout - now), 1)
+                    if circuit.opened_at is not None else None,
+                }
+                for host, circuit in self._circuits.items()
+            }
+
+
+# Shared by every service in the process
+circuit_breaker = CircuitBreaker()
@@ -1,12 +1,18 @@
+import asyncio
+import os
 import re
 import logging
-from typing import List, Dict, Any
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Optional, Set
+import httpx
 from urllib.parse import urlparse
 
-from app.services.shopify_service import ShopifyService
+from app.services.rate_limiter import RateLimiter
+from app.services.rate_limiter import rate_limiter as shared_rate_limiter
+from app.services.search import SearchProvider, SearchResult, get_search_provider
+from app.services.shopify_service import AsyncShopifyService, _cancel_pending
+from app.services.store_resolver import StoreIdentity, StoreResolver, store_origin, store_resolver
 from app.models.insights import ShopifyInsights
+from app.utils.async_bridge import run_sync
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +25,57 @@ logger = logging.getLogger(__name__)
 # TODO: Add option to manually specify known competitors
 # TODO: Implement a more sophisticated ranking algorithm for competitors
 
+# Competitor names being checked for a Shopify store at the same time
+COMPETITOR_VERIFY_CONCURRENCY = int(os.getenv("COMPETITOR_VERIFY_CONCURRENCY", "4"))
+# Competitor names waiting between the search and verification stages
+COMPETITOR_QUEUE_SIZE = int(os.getenv("COMPETITOR_QUEUE_SIZE", "8"))
+# Competitor names taken from the search results at most
+COMPETITOR_MAX_CANDIDATES = int(os.getenv("COMPETITOR_MAX_CANDIDATES", "15"))
+# Result URLs checked per competitor name
+COMPETITOR_CANDIDATE_URLS = int(os.getenv("COMPETITOR_CANDIDATE_URLS", "3"))
 
-class CompetitorService:
-    def __init__(self, website_url: str):
+# Look for competitor indicators in result titles
+COMPETITOR_INDICATORS = ["vs", "versus", "alternative", "competitor", "similar", "like", "compare"]
+
+
+class AsyncCompetitorService:
+    """Find a store's competitors and analyze them, as a concurrent pipeline.
+
+    Finding competitors used to be strictly one thing after another: three searches,
+    then a search and a couple of requests per competitor name, then a full scrape
+    per competitor, which took minutes for three competitors. Now the stages run at
+    the same time, connected by bounded queues:
+
+    1. search: all queries go to the search provider at once, and names go into the
+       queue as soon as their results are in
+    2. verification: COMPETITOR_VERIFY_CONCURRENCY workers look up each name's
+       website and check the candidate URLs in parallel through the store resolver
+    3. extraction: a competitor is scraped as soon as its store is confirmed
+
+    Only `limit` stores are scraped at a time. As soon as `limit` of them have been
+    analyzed, everything still searching or verifying is cancelled. Results come
+    back in the order they finish.
+    """
+
+    def __init__(
+        self,
+        website_url: str,
+        client: Optional[httpx.AsyncClient] = None,
+        resolver: Optional[StoreResolver] = None,
+        verify_concurrency: int = COMPETITOR_VERIFY_CONCURRENCY,
+        rate_limiter: Optional[RateLimiter] = None,
+        use_cache: bool = True,
+        search: Optional[SearchProvider] = None
+    ):
         self.website_url = website_url
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        })
-    
+        self._client = client
+        # Where competitor names and websites are looked up (see app.services.search)
+        self.search = search or get_search_provider()
+        self.resolver = resolver or store_resolver
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.use_cache = use_cache
+        self.verify_concurrency = verify_concurrency
+
     def _get_domain_name(self, url: str) -> str:
         """Extract domain name from URL without TLD"""
         parsed_url = urlparse(url)
@@ -36,132 +84,195 @@ class CompetitorService:
         domain = domain.replace("www.", "")
         domain = re.sub(r'\.[a-z]{2,}$', '', domain)
         return domain
-    
-    def _search_competitors(self, brand_name: str, limit: int = 5) -> List[str]:
-        """Search for competitors using a search engine"""
+
+    def _parse_competitor_names(self, results: List[SearchResult], brand_name: str) -> List[str]:
+        """Extract potential competitor names from the titles of search results"""
+        competitors = []
+        for result in results:
+            title = result.title
+            if not title:
+                continue
+
+            # Skip if it's the original brand
+            if brand_name.lower() in title.lower():
+                continue
+
+            if any(indicator in title.lower() for indicator in COMPETITOR_INDICATORS):
+                # Extract potential competitor names
+                potential_competitors = re.split(r'\s+(?:vs|versus|alternative|competitor|similar|like|compare)\s+', title.lower())
+                for comp in potential_competitors:
+                    if comp and comp != brand_name.lower():
+                        competitors.append(comp.strip())
+        return competitors
+
+    async def _search_competitors(self, brand_name: str, names: asyncio.Queue) -> None:
+        """Search stage: run every query at once and queue new competitor names as they turn up"""
         search_queries = [
             f"{brand_name} competitors",
             f"brands like {brand_name}",
             f"alternatives to {brand_name}"
         ]
-        
-        competitors = []
-        
-        for query in search_queries:
+        seen: Set[str] = set()
+
+        async def run_query(query: str) -> None:
             try:
-                # Use DuckDuckGo as it's more API-friendly
-                search_url = f"https://html.duckduckgo.com/html/?q={query}"
-                response = self.session.get(search_url, timeout=10)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, "html.parser")
-                
-                # Extract search results
-                results = soup.select(".result__title")
-                for result in results:
-                    link = result.find("a")
-                    if not link:
-                        continue
-                        
-                    title = link.get_text(strip=True)
-                    href = link.get("href", "")
-                    
-                    # Skip if it's the original brand
-                    if brand_name.lower() in title.lower():
-                        continue
-                    
-                    # Look for competitor indicators in title
-                    competitor_indicators = [
-                        "vs", "versus", "alternative", "competitor", "similar", "like", "compare"
-                    ]
-                    
-                    if any(indicator in title.lower() for indicator in competitor_indicators):
-                        # Extract potential competitor names
-                        potential_competitors = re.split(r'\s+(?:vs|versus|alternative|competitor|similar|like|compare)\s+', title.lower())
-                        for comp in potential_competitors:
-                            if comp and comp != brand_name.lower():
-                                competitors.append(comp.strip())
-                
-                if len(competitors) >= limit:
-                    break
-                    
+                results = await self.search.search(query)
             except Exception as e:
                 logger.error(f"Error searching for competitors: {str(e)}")
+                return
+            for name in self._parse_competitor_names(results, brand_name):
+                if name in seen or len(seen) >= COMPETITOR_MAX_CANDIDATES:
+                    continue
+                seen.add(name)
+                await names.put(name)
+
+        tasks = [asyncio.ensure_future(run_query(query)) for query in search_queries]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            _cancel_pending(tasks)
+
+    async def _find_shopify_store_url(self, competitor_name: str) -> Optional[StoreIdentity]:
+        """Find the Shopify store of a competitor
+
+        The candidate URLs from the search are checked in parallel, but the best ranked
+        one that is a Shopify store wins. The rest are cancelled once it is known.
+        """
+        try:
+            results = await self.search.search(f"{competitor_name} official website")
+        except Exception as e:
+            logger.error(f"Error finding Shopify store for {competitor_name}: {str(e)}")
+            return None
+
+        candidates = []
+        for result in results:
+            url = result.url
+            if not url:
                 continue
-        
-        # Remove duplicates and limit results
-        unique_competitors = list(set(competitors))
-        return unique_competitors[:limit]
-    
-    def _find_shopify_store_url(self, competitor_name: str) -> str:
-        """Find the Shopify store URL for a competitor"""
+            # Normalize URL
+            if not url.startswith(("http://", "https://")):
+                url = "https://" + url
+            url = store_origin(url)
+            if url not in candidates:
+                candidates.append(url)
+
+        tasks = [asyncio.ensure_future(self.resolver.resolve(url)) for url in candidates[:COMPETITOR_CANDIDATE_URLS]]
         try:
-            # Search for the competitor's website
-            search_url = f"https://html.duckduckgo.com/html/?q={competitor_name} official website"
-            response = self.session.get(search_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Extract search results
-            results = soup.select(".result__url")
-            for result in results:
-                url = result.get_text(strip=True)
-                if not url:
-                    continue
-                
-                # Normalize URL
-                if not url.startswith(("http://", "https://")):
-                    url = "https://" + url
-                
+            for task in tasks:
                 try:
-                    # Check if it's a Shopify store
-                    check_response = requests.head(url, timeout=5)
-                    server = check_response.headers.get("server", "").lower()
-                    
-                    if "shopify" in server:
-                        return url
-                        
-                    # Try to access products.json
-                    parsed_url = urlparse(url)
-                    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                    products_url = f"{base_url}/products.json"
-                    
-                    products_response = requests.get(products_url, timeout=5)
-                    if products_response.status_code == 200 and "products" in products_response.json():
-                        return base_url
-                        
-                except:
+                    identity = await task
+                except Exception:
                     continue
-            
-            return ""
-            
-        except Exception as e:
-            logger.error(f"Error finding Shopify store for {competitor_name}: {str(e)}")
-            return ""
-    
-    def get_competitors_insights(self, limit: int = 3) -> List[ShopifyInsights]:
-        """Get insights for competitors"""
-        brand_name = self._get_domain_name(self.website_url)
-        competitor_names = self._search_competitors(brand_name, limit=limit)
-        
-        competitor_insights = []
-        
-        for name in competitor_names:
+                if identity.is_shopify:
+                    return identity
+            return None
+        finally:
+            _cancel_pending(tasks)
+
+    async def _verify_competitors(
+        self, names: asyncio.Queue, stores: asyncio.Queue, slots: asyncio.Semaphore, seen: Set[str]
+    ) -> None:
+        """Verification stage: turn competitor names into confirmed Shopify stores"""
+        own_store = store_origin(self.website_url)
+        while True:
+            name = await names.get()
+            if name is None:
+                return
+            identity = await self._find_shopify_store_url(name)
+            if identity is None:
+                continue
+            origin = store_origin(identity.website_url)
+            if origin == own_store or origin in seen:
+                continue
+            seen.add(origin)
+            # Wait until fewer than `limit` stores are being or have been analyzed
+            await slots.acquire()
+            await stores.put(identity)
+
+    async def _analyze_competitors(
+        self,
+        stores: asyncio.Queue,
+        slots: asyncio.Semaphore,
+        results: List[ShopifyInsights],
+        limit: int,
+        enough: asyncio.Event
+    ) -> None:
+        """Extraction stage: analyze confirmed stores as soon as they arrive"""
+        while True:
+            identity = await stores.get()
+            if identity is None:
+                return
             try:
-                store_url = self._find_shopify_store_url(name)
-                if not store_url:
-                    continue
-                    
-                service = ShopifyService(store_url)
-                insights = service.get_all_insights()
-                competitor_insights.append(insights)
-                
-                if len(competitor_insights) >= limit:
-                    break
-                    
+                service = AsyncShopifyService(
+                    identity.website_url,
+                    client=self._client,
+                    rate_limiter=self.rate_limiter,
+                    use_cache=self.use_cache,
+                    first_page=identity.first_page
+                )
+                results.append(await service.get_all_insights())
             except Exception as e:
-                logger.error(f"Error getting insights for competitor {name}: {str(e)}")
+                logger.error(f"Error getting insights for competitor {identity.website_url}: {str(e)}")
+                # Give the slot to the next confirmed store instead
+                slots.release()
                 continue
-        
-        return competitor_insights
\ No newline at end of file
+            if len(results) >= limit:
+                enough.set()
+
+    async def get_competitors_insights(self, limit: int = 3) -> List[ShopifyInsights]:
+        """Get insights for competitors"""
+        brand_name = self._get_domain_name(self.website_url)
+
+        names: asyncio.Queue = asyncio.Queue(maxsize=COMPETITOR_QUEUE_SIZE)
+        stores: asyncio.Queue = asyncio.Queue(maxsize=limit)
+        slots = asyncio.Semaphore(limit)
+        results: List[ShopifyInsights] = []
+        enough = asyncio.Event()
+        # Stores already confirmed, shared by the verification workers
+        seen: Set[str] = set()
+
+        search = asyncio.ensure_future(self._search_competitors(brand_name, names))
+        verifiers = [
+            asyncio.ensure_future(self._verify_competitors(names, stores, slots, seen))
+            for _ in range(self.verify_concurrency)
+        ]
+        analyzers = [
+            asyncio.ensure_future(self._analyze_competitors(stores, slots, results, limit, enough))
+            for _ in range(limit)
+        ]
+
+        async def drain() -> None:
+            # Tell each stage to stop once the one before it has finished
+            await search
+            for _ in verifiers:
+                await names.put(None)
+            await asyncio.gather(*verifiers)
+            for _ in analyzers:
+                await stores.put(None)
+            await asyncio.gather(*analyzers)
+
+        pipeline = asyncio.ensure_future(drain())
+        waiter = asyncio.ensure_future(enough.wait())
+        tasks = [search, *verifiers, *analyzers, pipeline, waiter]
+        try:
+            await asyncio.wait([pipeline, waiter], return_when=asyncio.FIRST_COMPLETED)
+            if pipeline.done() and not waiter.done():
+                pipeline.result()
+        finally:
+            _cancel_pending(tasks)
+
+        return results[:limit]
+
+
+class CompetitorService:
+    """Synchronous facade over AsyncCompetitorService, run on the shared background loop"""
+
+    def __init__(self, website_url: str, client: Optional[httpx.AsyncClient] = None):
+        self._service = AsyncCompetitorService(website_url, client=client)
+
+    @property
+    def website_url(self) -> str:
+        return self._service.website_url
+
+    def get_competitors_insights(self, limit: int = 3) -> List[ShopifyInsights]:
+        return run_sync(self._service.get_competitors_insights(limit=limit))
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+import httpx
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.rate_limiter import RATE_LIMIT_RETRIES, THROTTLE_STATUSES, RateLimiter
+from app.services.retry_policy import RETRYABLE_STATUSES, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+async def guarded_get(
+    client: httpx.AsyncClient,
+    url: str,
+    rate_limiter: RateLimiter,
+    circuit_breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    **kwargs,
+) -> httpx.Response:
+    """Send a single GET through the host's circuit breaker and rate limiter
+
+    Fails with CircuitOpenError straight away if the host is known to be down, which
+    isn't a TransportError, so get_with_retries doesn't retry it either. Whatever
+    comes back is reported to both, so they can slow down or open for the host.
+    Extra keyword arguments go to client.get.
+    """
+    host = urlparse(url).netloc
+    circuit_breaker.before_request(host)
+    try:
+        await rate_limiter.wait(host)
+        response = await client.get(url, timeout=policy.timeout(), **kwargs)
+    except httpx.TransportError:
+        circuit_breaker.record_failure(host)
+        raise
+    except BaseException:
+        # Cancelled (e.g. the losing half of a hedged request), so we learned nothing
+        circuit_breaker.release(host)
+        raise
+    rate_limiter.record(host, response.status_code, response.headers.get("retry-after"))
+    circuit_breaker.record_response(host, response.status_code)
+    return response
+
+
+async def get_with_retries(
+    send: Callable[[], Awaitable[httpx.Response]], url: str, policy: RetryPolicy
+) -> httpx.Response:
+    """Call `send` until it gets a response worth keeping, according to the retry policy
+
+    Throttled (429/503) responses are retried once the rate limiter lets us, since
+    a throttled page is worth waiting for rather than losing it. Connection errors,
+    timeouts and other 5xx responses are retried with capped exponential backoff.
+    `url` is only used for logging.
+    """
+    throttled = 0
+    failures = 0
+    while True:
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            if failures >= policy.attempts:
+                raise
+            failures += 1
+            logger.info(f"Retrying {url} after {type(e).__name__} (retry {failures})")
+            await asyncio.sleep(policy.backoff(failures - 1))
+            continue
+
+        if response.status_code in THROTTLE_STATUSES and throttled < RATE_LIMIT_RETRIES:
+            throttled += 1
+            logger.info(f"Throttled on {url}, retrying (attempt {throttled})")
+            continue
+        if response.status_code in RETRYABLE_STATUSES and failures < policy.attempts:
+            failures += 1
+            logger.info(f"Retrying {url} after HTTP {response.status_code} (retry {failures})")
+            await asyncio.sleep(policy.backoff(failures - 1))
+            continue
+        return response
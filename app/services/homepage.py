@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Pattern, Tuple
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from app.models.insights import ImportantLink, SocialHandle
+
+# Common social media platforms and their patterns, in priority order
+SOCIAL_PATTERNS: List[Tuple[str, Pattern]] = [
+    ("instagram", re.compile(r"(?:instagram\.com|instagr\.am)/(?:[^/?]+)")),
+    ("facebook", re.compile(r"(?:facebook\.com|fb\.com)/(?:[^/?]+)")),
+    ("twitter", re.compile(r"(?:twitter\.com|x\.com)/(?:[^/?]+)")),
+    ("youtube", re.compile(r"youtube\.com/(?:@?[^/?]+)")),
+    ("tiktok", re.compile(r"tiktok\.com/(?:@?[^/?]+)")),
+    ("pinterest", re.compile(r"pinterest\.com/(?:[^/?]+)")),
+    ("linkedin", re.compile(r"linkedin\.com/company/(?:[^/?]+)")),
+]
+
+# Common important link patterns, in priority order
+IMPORTANT_PATTERNS: List[Tuple[str, Pattern]] = [
+    ("Order Tracking", re.compile(r"(track|tracking|order-status)", re.I)),
+    ("Contact Us", re.compile(r"(contact|contact-us)", re.I)),
+    ("Blog", re.compile(r"(blog|articles|news)", re.I)),
+    ("Shipping", re.compile(r"(shipping|delivery)", re.I)),
+    ("FAQ", re.compile(r"(faq|help|support)", re.I)),
+    ("Terms", re.compile(r"(terms|terms-of-service|terms-conditions)", re.I)),
+    ("Careers", re.compile(r"(careers|jobs)", re.I)),
+    ("Stores", re.compile(r"(stores|locations|find-us)", re.I)),
+]
+
+
+def _combine(patterns: List[Tuple[str, Pattern]], flags: int = 0) -> Pattern:
+    return re.compile("|".join(f"(?:{pattern.pattern})" for _, pattern in patterns), flags)
+
+
+# One combined pattern per group rejects the vast majority of anchors with a single
+# search. Only anchors that hit it are checked against the individual patterns, which
+# keeps the original "first pattern in the list wins" priority.
+SOCIAL_MATCHER = _combine(SOCIAL_PATTERNS)
+IMPORTANT_MATCHER = _combine(IMPORTANT_PATTERNS, re.I)
+
+PRODUCT_HANDLE_PATTERN = re.compile(r"/products/([a-zA-Z0-9-]+)")
+ADDRESS_CLASSES = {"address", "contact-address", "store-address"}
+
+
+@dataclass
+class HomepageAnalysis:
+    """Everything the homepage extractors need, collected in one pass over the DOM"""
+    site_name: Optional[str] = None
+    title: Optional[str] = None
+    product_handles: List[str] = field(default_factory=list)
+    social_handles: List[SocialHandle] = field(default_factory=list)
+    important_links: List[ImportantLink] = field(default_factory=list)
+    text: str = ""
+    address: Optional[str] = None
+
+
+def analyze_homepage(soup: BeautifulSoup, base_url: str) -> HomepageAnalysis:
+    """Walk the homepage once and fill in every homepage result
+
+    Previously the store name, hero product, social, important link and contact
+    extractors each walked the whole document (and the link extractors ran several
+    regexes per anchor, plus a quadratic duplicate check). This visits each node a
+    single time and dispatches anchors to precompiled matchers, so the cost grows
+    linearly with the size of the page.
+    """
+    analysis = HomepageAnalysis()
+    base_netloc = urlparse(base_url).netloc
+    text_types = getattr(soup, "interesting_string_types", (NavigableString, CData))
+    texts = []
+    og_meta_seen = False
+
+    product_handles = set()
+    social_urls = set()
+    link_urls = set()
+
+    for element in soup.descendants:
+        if not isinstance(element, Tag):
+            # Same strings soup.get_text() would return (no comments, scripts or styles)
+            if type(element) in text_types:
+                texts.append(element)
+            continue
+
+        name = element.name
+
+        if name == "a":
+            href = element.get("href")
+            if href is not None:
+                _visit_anchor(element, href, base_url, base_netloc, analysis, product_handles, social_urls, link_urls)
+        elif name == "meta":
+            if not og_meta_seen and element.get("property") == "og:site_name":
+                og_meta_seen = True
+                analysis.site_name = element.get("content") or None
+        elif name == "title":
+            if analysis.title is None:
+                analysis.title = element.text
+
+        if analysis.address is None and ADDRESS_CLASSES.intersection(element.get("class") or ()):
+            address = element.get_text(strip=True)
+            if address and len(address) > 10:  # Simple validation
+                analysis.address = address
+
+    analysis.text = "".join(texts)
+    return analysis
+
+
+def _visit_anchor(
+    element: Tag,
+    href: str,
+    base_url: str,
+    base_netloc: str,
+    analysis: HomepageAnalysis,
+    product_handles: set,
+    social_urls: set,
+    link_urls: set,
+) -> None:
+    # Hero products: links to /products/<handle>
+    match = PRODUCT_HANDLE_PATTERN.search(href)
+    if match and match.group(1) not in product_handles:
+        product_handles.add(match.group(1))
+        analysis.product_handles.append(match.group(1))
+
+    # Social handles
+    lowered = href.lower()
+    if SOCIAL_MATCHER.search(lowered):
+        for platform, pattern in SOCIAL_PATTERNS:
+            if pattern.search(lowered):
+                if lowered not in social_urls:
+                    social_urls.add(lowered)
+                    analysis.social_handles.append(SocialHandle(platform=platform, url=lowered))
+                break
+
+    # Important links
+    text = element.get_text(strip=True)
+    if not text or not href or href == "#" or href.startswith("javascript:"):
+        return
+
+    # Make URL absolute
+    if not href.startswith(("http://", "https://")):
+        href = urljoin(base_url, href)
+
+    if IMPORTANT_MATCHER.search(href) or IMPORTANT_MATCHER.search(text):
+        for link_name, pattern in IMPORTANT_PATTERNS:
+            if pattern.search(href) or pattern.search(text):
+                if href not in link_urls:
+                    link_urls.add(href)
+                    analysis.important_links.append(ImportantLink(name=link_name, url=href))
+                break
+
+    # If it has text but didn't match patterns, use the text as name
+    # Only include links that seem to be within the same domain
+    if href not in link_urls and urlparse(href).netloc == base_netloc:
+        link_urls.add(href)
+        analysis.important_links.append(ImportantLink(name=text, url=href))
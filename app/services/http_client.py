@@ -0,0 +1,215 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Callable, Dict
+
+import httpx
+
+from app.services.retry_policy import DEFAULT_POLICY
+
+logger = logging.getLogger(__name__)
+
+# Using a realistic user agent to avoid being blocked
+# I found that some Shopify stores block requests with default Python user agents
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+DEFAULT_TIMEOUT = DEFAULT_POLICY.timeout()
+
+# Pool sizes can be tuned through the environment without touching the code
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+# Connections to a single host at most (0 for no limit besides the total)
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+# How long an idle keep-alive connection is kept for the next request, in seconds
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# Negotiate HTTP/2 where stores support it (needs the h2 package)
+HTTP2_ENABLED = bool(int(os.getenv("HTTP2_ENABLED", "0")))
+
+
+def _installed(*modules: str) -> bool:
+    return any(importlib.util.find_spec(module) is not None for module in modules)
+
+
+def accept_encoding() -> str:
+    """Compressions we can decode; httpx decodes brotli whenever a brotli package is installed"""
+    encodings = ["gzip", "deflate"]
+    if _installed("brotli", "brotlicffi"):
+        encodings.append("br")
+    return ", ".join(encodings)
+
+
+def http2_available(requested: bool = HTTP2_ENABLED) -> bool:
+    if requested and not _installed("h2"):
+        logger.warning("HTTP2_ENABLED is set but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return requested
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Caps the connections to each host on top of the pool's total limit
+
+    httpx only limits the pool as a whole, so a batch full of one big store could
+    take every connection. A request holds its host's slot until its response body
+    has been read or closed, which is as long as it holds the connection.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int):
+        self._transport = transport
+        self.per_host = per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.per_host <= 0:
+            return await self._transport.handle_async_request(request)
+
+        host = request.url.netloc.decode("ascii")
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        self._users[host] = self._users.get(host, 0) + 1
+        release = self._releaser(host, semaphore)
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            self._forget(host)
+            raise
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            # Already fully read (e.g. a mocked response), so there's nothing left to hold
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def _releaser(self, host: str, semaphore: asyncio.Semaphore) -> Callable[[], None]:
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+                self._forget(host)
+        return release
+
+    def _forget(self, host: str) -> None:
+        # Drop the semaphore once nobody is using it, so the dict doesn't grow forever
+        self._users[host] -= 1
+        if not self._users[host]:
+            del self._users[host]
+            del self._semaphores[host]
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class HttpClientManager:
+    """Owns the pooled async HTTP clients shared by every service.
+
+    Connection setup (DNS, TCP and TLS handshakes) dominates the small fetches we
+    make, so every service goes through the same keep-alive pool instead of opening
+    its own. The app opens its client at startup and closes it at shutdown, so the
+    pool lives exactly as long as the app.
+
+    An httpx.AsyncClient keeps its connections bound to the event loop that opened
+    them, so there is really one client per running loop (uvicorn's loop plus the
+    background loop used by the sync wrappers). Clients for loops that weren't
+    opened explicitly, e.g. in the CLI or tests, are created on first use.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2_available(http2)
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def build_client(self) -> httpx.AsyncClient:
+        """Create a pooled async client with the defaults every service expects"""
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, http2=self.http2)
+        return httpx.AsyncClient(
+            headers={**DEFAULT_HEADERS, "Accept-Encoding": accept_encoding()},
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+            transport=HostLimitedTransport(transport, self.max_connections_per_host),
+        )
+
+    def get(self) -> httpx.AsyncClient:
+        """Get the client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._clients[loop] = self.build_client()
+            return client
+
+    async def open(self) -> httpx.AsyncClient:
+        """Create the running loop's client up front (at app startup)"""
+        client = self.get()
+        logger.info(
+            f"HTTP pool ready: {self.max_connections} connections, {self.max_connections_per_host or 'unlimited'} per host, "
+            f"HTTP/2 {'on' if self.http2 else 'off'}, Accept-Encoding: {accept_encoding()}"
+        )
+        return client
+
+    async def close(self) -> None:
+        """Close the running loop's client (at app shutdown)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+# Shared by every service in the process
+http_clients = HttpClientManager()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the shared async HTTP client for the running event loop"""
+    return http_clients.get()
+
+
+async def close_async_client() -> None:
+    """Close the shared client that belongs to the running event loop"""
+    await http_clients.close()
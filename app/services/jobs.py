@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import Job
+from app.database.repository import JobRepository
+
+logger = logging.getLogger(__name__)
+
+# Number of jobs that run at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# How often a process tells the others that its running jobs are still alive (seconds)
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+# A running job without a heartbeat for this long is taken over by another process
+JOB_LEASE_TIMEOUT = float(os.getenv("JOB_LEASE_TIMEOUT", "120"))
+
+# A handler gets the job's parameters and a database session, does the work and
+# returns a JSON-serialisable description of where the results were saved
+JobHandler = Callable[[Dict[str, Any], Session], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """In-process queue that runs extraction jobs in the background.
+
+    Scrapes (especially competitor scrapes) take far longer than a load balancer is
+    willing to keep a request open, so the API only records a job and returns its id.
+    A pool of worker tasks on the application's event loop picks jobs up in order.
+
+    Job state lives in the database, so the queue itself only carries job ids. Every
+    uvicorn worker runs its own queue on the same table, so jobs are claimed with a
+    conditional update, and running jobs get a heartbeat. Jobs that are still queued,
+    or running without a heartbeat for `lease_timeout` seconds because their process
+    died, are picked up on start and checked for periodically after that.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = JOB_WORKERS,
+        heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+        lease_timeout: float = JOB_LEASE_TIMEOUT
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs this process is running, to send heartbeats for
+        self._running: Set[str] = set()
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Register the handler that runs jobs of a given kind"""
+        if kind in self._handlers:
+            raise ValueError(f"Job kind '{kind}' is already registered")
+        self._handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Start the workers on the running event loop and resume unfinished jobs"""
+        if self.running:
+            return
+
+        self._queue = asyncio.Queue()
+        db = self.session_factory()
+        try:
+            for job_id in JobRepository(db).requeue_unfinished(self.lease_timeout):
+                self._queue.put_nowait(job_id)
+        finally:
+            db.close()
+
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._monitor()))
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back in the queue for the next start"""
+        tasks, self._tasks = self._tasks, []
+        running = list(self._running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if running:
+            db = self.session_factory()
+            try:
+                JobRepository(db).release(running)
+            finally:
+                db.close()
+
+    async def join(self) -> None:
+        """Wait until every queued job has been processed (mostly useful for tests)"""
+        await self._queue.join()
+
+    def submit(self, db: Session, kind: str, website_url: str, params: Optional[Dict[str, Any]] = None):
+        """Record a new job and queue it; returns the stored job"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if not self.running:
+            raise RuntimeError("The job queue has not been started")
+
+        job = JobRepository(db).create_job(kind, website_url, params)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _monitor(self) -> None:
+        """Send heartbeats for our running jobs and take over jobs abandoned by dead processes"""
+        since_requeue = 0.0
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            since_requeue += self.heartbeat_interval
+            db = self.session_factory()
+            try:
+                repository = JobRepository(db)
+                await asyncio.to_thread(repository.heartbeat, list(self._running))
+                if since_requeue >= self.lease_timeout:
+                    since_requeue = 0.0
+                    for job_id in await asyncio.to_thread(repository.requeue_stale, self.lease_timeout):
+                        logger.warning(f"Job {job_id} was abandoned by its worker, running it again")
+                        self._queue.put_nowait(job_id)
+            except Exception:
+                logger.exception("Job heartbeat failed")
+            finally:
+                db.close()
+
+    async def _run(self, job_id: str) -> None:
+        # The workers share the application's event loop, so the job's own database
+        # work runs in a thread, like the handlers' saves
+        db = self.session_factory()
+        try:
+            repository = JobRepository(db)
+            job = await asyncio.to_thread(repository.get_job, job_id)
+            if job is None or job.status != JobRepository.QUEUED or not await asyncio.to_thread(repository.claim, job):
+                return
+
+            self._running.add(job_id)
+            params = dict(job.params or {}, website_url=job.website_url)
+            try:
+                result = await self._handlers[job.kind](params, db)
+            except asyncio.CancelledError:
+                raise
+            except HTTPException as e:
+                await asyncio.to_thread(self._fail, db, repository, job, str(e.detail))
+            except Exception as e:
+                logger.exception(f"Job {job_id} ({job.kind}) failed")
+                await asyncio.to_thread(self._fail, db, repository, job, str(e))
+            else:
+                await asyncio.to_thread(repository.mark_succeeded, job, result)
+        finally:
+            self._running.discard(job_id)
+            db.close()
+
+    @staticmethod
+    def _fail(db: Session, repository: JobRepository, job: Job, error: str) -> None:
+        db.rollback()
+        repository.mark_failed(job, error)
+
+
+# The application's queue; handlers are registered by the router and the workers
+# are started and stopped with the app
+job_queue = JobQueue(SessionLocal)
@@ -0,0 +1,40 @@
+import logging
+import os
+from typing import List, Optional
+
+from bs4.builder import builder_registry
+
+logger = logging.getLogger(__name__)
+
+# Parsing is the biggest CPU cost per store (theme homepages are often 300KB-1MB), and
+# the pure-Python "html.parser" is several times slower than lxml. Every extractor is
+# written against the BeautifulSoup API, so the pluggable part is the tree builder
+# BeautifulSoup runs on: we prefer the native backends and fall back to html.parser,
+# which ships with Python and is always available.
+PREFERRED_PARSERS = ["lxml", "html.parser"]
+
+# Force a specific backend, e.g. HTML_PARSER=html.parser
+HTML_PARSER = os.getenv("HTML_PARSER", "")
+
+
+def available_parsers() -> List[str]:
+    """Parser backends BeautifulSoup can use in this environment, fastest first"""
+    return [name for name in PREFERRED_PARSERS if builder_registry.lookup(name) is not None]
+
+
+def resolve_parser(name: Optional[str] = None) -> str:
+    """Pick the parser backend to use
+
+    An explicitly requested backend (argument or HTML_PARSER) is used if it is
+    installed; otherwise we fall back to the fastest one that is.
+    """
+    requested = name or HTML_PARSER
+    if requested:
+        if builder_registry.lookup(requested) is not None:
+            return requested
+        logger.warning(f"HTML parser '{requested}' is not installed, falling back")
+
+    return available_parsers()[0]
+
+
+DEFAULT_PARSER = resolve_parser()
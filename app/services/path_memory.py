@@ -0,0 +1,118 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Set
+
+from app.services.response_cache import RESPONSE_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# How long we trust that a candidate path doesn't exist, and that the path which
+# worked last time is still the right one (seconds)
+MISSING_PATH_TTL = int(os.getenv("MISSING_PATH_TTL", str(24 * 60 * 60)))
+WINNING_PATH_TTL = int(os.getenv("WINNING_PATH_TTL", str(7 * 24 * 60 * 60)))
+
+
+class PathMemory:
+    """Per-domain memory of which candidate paths exist.
+
+    The policy, FAQ, about and contact extractors guess a couple dozen paths, and on
+    any given store most of them are 404s. We remember those misses (the negative
+    cache) and, for every extractor, the path that produced a result (the winning
+    path), so the next analysis of the same store goes straight to the right page.
+    Both expire, so a store that reorganises its pages is picked up again.
+
+    It lives in the same SQLite file as the response cache, and like the cache its
+    methods block, so async code calls them through asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, missing_ttl: int = MISSING_PATH_TTL, winning_ttl: int = WINNING_PATH_TTL):
+        self.missing_ttl = missing_ttl
+        self.winning_ttl = winning_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS missing_paths (
+                domain TEXT NOT NULL,
+                path TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (domain, path)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS winning_paths (
+                domain TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                path TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (domain, extractor)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def missing_paths(self, domain: str) -> Set[str]:
+        """Paths known not to exist on a domain"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM missing_paths WHERE domain = ? AND expires_at > ?",
+                (domain, time.time()),
+            ).fetchall()
+        return {path for (path,) in rows}
+
+    def mark_missing(self, domain: str, path: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO missing_paths (domain, path, expires_at) VALUES (?, ?, ?)",
+                (domain, path, time.time() + self.missing_ttl),
+            )
+            # A path that is now missing can't be anyone's winning path any more
+            self._conn.execute("DELETE FROM winning_paths WHERE domain = ? AND path = ?", (domain, path))
+            self._conn.commit()
+
+    def winning_path(self, domain: str, extractor: str) -> Optional[str]:
+        """The path that worked for an extractor last time, if we still trust it"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM winning_paths WHERE domain = ? AND extractor = ? AND expires_at > ?",
+                (domain, extractor, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember_winner(self, domain: str, extractor: str, path: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO winning_paths (domain, extractor, path, expires_at) VALUES (?, ?, ?, ?)",
+                (domain, extractor, path, time.time() + self.winning_ttl),
+            )
+            self._conn.commit()
+
+    def forget_winner(self, domain: str, extractor: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM winning_paths WHERE domain = ? AND extractor = ?", (domain, extractor))
+            self._conn.commit()
+
+
+_shared_memory: Optional[PathMemory] = None
+_shared_memory_lock = threading.Lock()
+
+
+def get_path_memory() -> Optional[PathMemory]:
+    """Get the process-wide path memory, or None if the response cache is disabled"""
+    global _shared_memory
+    if not RESPONSE_CACHE_PATH:
+        return None
+
+    with _shared_memory_lock:
+        if _shared_memory is None:
+            try:
+                _shared_memory = PathMemory(RESPONSE_CACHE_PATH)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open path memory at {RESPONSE_CACHE_PATH}: {str(e)}")
+                return None
+        return _shared_memory
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Requests per second we start each host at, and the burst it may use up front
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "5"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+# Bounds for the adaptive rate
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.5"))
+RATE_LIMIT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "25"))
+# AIMD: every successful response adds this much to the rate, every throttled one multiplies it
+RATE_LIMIT_INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", "0.1"))
+RATE_LIMIT_DECREASE = float(os.getenv("RATE_LIMIT_DECREASE", "0.5"))
+# Longest Retry-After we are willing to honour, in seconds
+RETRY_AFTER_MAX = float(os.getenv("RETRY_AFTER_MAX", "60"))
+# How many times a throttled (429/503) request is retried after waiting
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class HostBucket:
+    rate: float
+    tokens: float
+    updated: float
+
+
+class RateLimiter:
+    """Token bucket per host with AIMD adaptive rates.
+
+    Shopify throttles aggressive crawlers with 429s (and sometimes 503s), and a
+    throttled product page used to simply be lost. Every host gets a bucket that
+    refills at `rate` requests per second. Successful responses nudge the rate up
+    additively; throttled ones cut it multiplicatively, and a Retry-After header
+    blocks the host for that long. The result is a steady pace just under what each
+    store tolerates.
+
+    Buckets are plain numbers behind a threading lock and callers do the waiting
+    themselves, so one limiter can be shared by services on any event loop (the
+    server's and the background loop of the sync wrappers).
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        burst: float = RATE_LIMIT_BURST,
+        min_rate: float = RATE_LIMIT_MIN_RPS,
+        max_rate: float = RATE_LIMIT_MAX_RPS,
+        increase: float = RATE_LIMIT_INCREASE,
+        decrease: float = RATE_LIMIT_DECREASE,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._buckets: Dict[str, HostBucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _bucket(self, host: str, now: float) -> HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = HostBucket(rate=self.rate, tokens=self.burst, updated=now)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """Take a token for one request to `host` and return how long to wait before sending it
+
+        Tokens may go negative: every caller reserves its own slot in the queue, so
+        concurrent callers are spread out instead of all waking up at the same time.
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+            return 0.0 if bucket.tokens >= 0 else -bucket.tokens / bucket.rate
+
+    def record(self, host: str, status_code: int, retry_after: Optional[str] = None) -> None:
+        """Adapt the host's rate to the status of a response"""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            if status_code in THROTTLE_STATUSES:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                # Owing tokens is how the bucket blocks the host: nobody gets a
+                # request through until the debt has been refilled
+                wait = parse_retry_after(retry_after)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                if wait:
+                    bucket.tokens = min(bucket.tokens, -min(wait, RETRY_AFTER_MAX) * bucket.rate)
+                logger.warning(f"{host} throttled us ({status_code}), slowing down to {bucket.rate:.2f} req/s")
+            elif status_code < 400:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    async def wait(self, host: str) -> None:
+        """Wait for a request slot from async code"""
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current rate per host, for monitoring"""
+        with self._lock:
+            return {host: round(bucket.rate, 2) for host, bucket in self._buckets.items()}
+
+
+# Shared by every service in the process
+rate_limiter = RateLimiter()
@@ -0,0 +1,246 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Where the cache lives. Set RESPONSE_CACHE_PATH to an empty string to disable it.
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./response_cache.db")
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256"))
+
+# How long each kind of resource is served without asking the store again (seconds).
+# Policies and about pages barely ever change, the catalog and homepage do.
+DEFAULT_TTLS = {
+    "homepage": 5 * 60,
+    "products": 10 * 60,
+    "page": 6 * 60 * 60,
+    "policy": 24 * 60 * 60,
+    "sitemap": 6 * 60 * 60,
+    "default": 30 * 60,
+}
+
+
+def resource_type_for(url: str) -> str:
+    """Classify a URL so it gets the right TTL"""
+    path = urlparse(url).path.strip("/")
+    if not path:
+        return "homepage"
+    if path.startswith("products"):
+        return "products"
+    if path.startswith("policies/"):
+        return "policy"
+    if path.startswith("pages/"):
+        return "page"
+    if path.startswith("sitemap"):
+        return "sitemap"
+    return "default"
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Headers for a conditional request revalidating this entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=self.body,
+            headers={"content-type": self.content_type},
+            request=httpx.Request("GET", self.url),
+        )
+
+
+class ResponseCache:
+    """Persistent HTTP response cache shared by every request in the process.
+
+    Successful GET responses are stored in SQLite keyed by URL, so repeated analyses of
+    the same store within a few minutes hardly touch the network. Expired entries are
+    kept around and revalidated with If-None-Match / If-Modified-Since, which turns a
+    full download into a 304 when the store supports it. The total size is bounded and
+    the least recently used entries are evicted first.
+
+    The methods block on SQLite, so async code should call them through
+    asyncio.to_thread. Lookups only note the access time in memory; the notes are
+    written with the next put (or once TOUCH_FLUSH_SIZE of them pile up), so a cache
+    hit costs one indexed SELECT and no commit.
+    """
+
+    # Access times noted in memory before they are written out on their own
+    TOUCH_FLUSH_SIZE = 500
+    # Puts between recounting the total size, which other workers sharing the file
+    # change behind our back
+    RECOUNT_EVERY = 1000
+
+    def __init__(self, path: str, max_bytes: int = RESPONSE_CACHE_MAX_MB * 1024 * 1024, ttls: Optional[Dict[str, int]] = None):
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            # Several uvicorn workers may share the same file
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                resource_type TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        # Access times not written yet, by URL
+        self._touched: Dict[str, float] = {}
+        # Running total of the stored body sizes, instead of a SUM over the table per put
+        self._total = self._count_total()
+        self._puts = 0
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Get a cached response, fresh or stale, or None if we have never seen the URL"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, content_type, etag, last_modified, expires_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[url] = time.time()
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._flush_touches()
+                self._conn.commit()
+
+        body, content_type, etag, last_modified, expires_at = row
+        return CachedResponse(url, body, content_type or "", etag, last_modified, expires_at)
+
+    def put(self, url: str, response: httpx.Response) -> None:
+        """Store a successful response"""
+        resource_type = resource_type_for(url)
+        now = time.time()
+        body = response.content
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (url, body, content_type, etag, last_modified, resource_type, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    body,
+                    response.headers.get("content-type", ""),
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                    resource_type,
+                    now + self.ttls.get(resource_type, self.ttls["default"]),
+                    now,
+                    len(body),
+                ),
+            )
+            self._touched.pop(url, None)
+            self._total += len(body) - (previous[0] if previous else 0)
+            self._puts += 1
+            if self._puts % self.RECOUNT_EVERY == 0:
+                self._total = self._count_total()
+            self._flush_touches()
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, url: str) -> None:
+        """Extend the lifetime of an entry after the store answered 304 Not Modified"""
+        now = time.time()
+        ttl = self.ttls.get(resource_type_for(url), self.ttls["default"])
+        with self._lock:
+            self._touched.pop(url, None)
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ? WHERE url = ?",
+                (now + ttl, now, url),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._total = 0
+
+    def _count_total(self) -> int:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return total
+
+    def _flush_touches(self) -> None:
+        """Write the access times noted by get (the caller commits)"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE url = ?",
+                [(accessed, url) for url, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until we are back under the size limit"""
+        if self._total <= self.max_bytes:
+            return
+        # Other workers may have evicted entries too, so make sure we really are over
+        self._total = self._count_total()
+        if self._total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY last_access").fetchall()
+        for url, size in rows:
+            if self._total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._total -= size
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None if caching is disabled"""
+    global _shared_cache
+    if not RESPONSE_CACHE_PATH:
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ResponseCache(RESPONSE_CACHE_PATH)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open response cache at {RESPONSE_CACHE_PATH}: {str(e)}")
+                return None
+        return _shared_cache
@@ -0,0 +1,50 @@
+import os
+import random
+from dataclasses import dataclass
+
+import httpx
+
+# Connecting should be quick; a slow read is more often a big page than a dead host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# Retries after the first attempt for connection errors, timeouts and 5xx responses
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "4"))
+# Send a second copy of a products.json request that hasn't answered after this
+# many seconds and use whichever answers first (0 disables hedging)
+HEDGE_AFTER = float(os.getenv("HEDGE_AFTER", "3"))
+# Wall-clock budget for analyzing one store; extractors still running when it runs
+# out are cancelled and reported as incomplete (0 disables the budget)
+STORE_TIME_BUDGET = float(os.getenv("STORE_TIME_BUDGET", "60"))
+
+# 503 is handled by the rate limiter, since Shopify uses it for throttling too
+RETRYABLE_STATUSES = {500, 502, 504}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How long to wait for a store, and how hard to try, in one place
+
+    Every fetch used to have a fixed 10s timeout and no retry, so a single reset
+    connection silently emptied a whole section. All GETs we send are idempotent,
+    so they are retried with capped exponential backoff (with full jitter, so
+    retries against the same store don't line up).
+    """
+    connect_timeout: float = HTTP_CONNECT_TIMEOUT
+    read_timeout: float = HTTP_READ_TIMEOUT
+    attempts: int = RETRY_ATTEMPTS
+    backoff_base: float = RETRY_BACKOFF_BASE
+    backoff_max: float = RETRY_BACKOFF_MAX
+    hedge_after: float = HEDGE_AFTER
+    time_budget: float = STORE_TIME_BUDGET
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to sleep before the given retry (0 for the first one)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+
+DEFAULT_POLICY = RetryPolicy()
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# Stands in for the result of an extractor that was skipped, so its dependents skip too
+_SKIPPED = object()
+
+
+class ExtractionScheduler:
+    """Run extractors concurrently while respecting the dependencies between them.
+
+    Each extractor is registered with the names of the extractors whose results it
+    needs. Results of those dependencies are passed to it as keyword arguments, so
+    `hero_products` can simply declare that it depends on `products`. Everything that
+    doesn't depend on anything starts straight away, which brings the wall-clock time
+    of a run down to the longest dependency chain instead of the sum of all of them.
+
+    Dependencies have to be registered before the extractors that use them, which
+    also makes cycles impossible.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Tuple[Callable[..., Awaitable[Any]], Tuple[str, ...]]] = {}
+        # Errors of the extractors skipped by the last run, by name
+        self.skipped: Dict[str, BaseException] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], depends_on: Iterable[str] = ()) -> None:
+        """Register an extractor under `name`"""
+        if name in self._nodes:
+            raise ValueError(f"Extractor '{name}' is already registered")
+
+        depends_on = tuple(depends_on)
+        missing = [dep for dep in depends_on if dep not in self._nodes]
+        if missing:
+            raise ValueError(f"Extractor '{name}' depends on unknown extractors: {', '.join(missing)}")
+
+        self._nodes[name] = (func, depends_on)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._nodes)
+
+    async def run(
+        self, timeout: Optional[float] = None, skip_on: Tuple[Type[BaseException], ...] = ()
+    ) -> Dict[str, Any]:
+        """Run every registered extractor and return their results keyed by name
+
+        If any extractor fails, the ones still running are cancelled and the error is
+        raised, which matches what the old sequential implementation did.
+        With a timeout, extractors that haven't finished in time are cancelled and
+        left out of the results.
+        Extractors failing with one of the `skip_on` errors are left out as well, along
+        with everything depending on them, and the rest carry on; the errors end up in
+        `skipped`.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        self.skipped = {}
+
+        async def run_node(name: str) -> Any:
+            func, depends_on = self._nodes[name]
+            kwargs = {dep: await tasks[dep] for dep in depends_on}
+            skipped_deps = [dep for dep, result in kwargs.items() if result is _SKIPPED]
+            if skipped_deps:
+                self.skipped[name] = self.skipped[skipped_deps[0]]
+                return _SKIPPED
+            try:
+                return await func(**kwargs)
+            except skip_on as e:
+                logger.info(f"Skipping extractor '{name}': {str(e)}")
+                self.skipped[name] = e
+                return _SKIPPED
+
+        for name in self._nodes:
+            tasks[name] = asyncio.ensure_future(run_node(name))
+
+        try:
+            done, pending = await asyncio.wait(
+                tasks.values(), timeout=timeout, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for task in tasks.values():
+                if task in done and task.exception() is not None:
+                    raise task.exception()
+            if pending:
+                logger.warning(f"Extractors out of time: {', '.join(n for n, t in tasks.items() if t in pending)}")
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        return {
+            name: task.result()
+            for name, task in tasks.items()
+            if task.done() and not task.cancelled() and task.result() is not _SKIPPED
+        }
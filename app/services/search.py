@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import circuit_breaker as shared_circuit_breaker
+from app.services.fetching import get_with_retries, guarded_get
+from app.services.http_client import get_async_client
+from app.services.rate_limiter import RateLimiter
+from app.services.rate_limiter import rate_limiter as shared_rate_limiter
+from app.services.retry_policy import DEFAULT_POLICY, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Which search backend competitor discovery uses: "duckduckgo" or "fixture"
+SEARCH_PROVIDER = os.getenv("SEARCH_PROVIDER", "duckduckgo")
+# JSON file the fixture provider answers from: {"query": [{"title": ..., "url": ...}, ...]}
+SEARCH_FIXTURE_PATH = os.getenv("SEARCH_FIXTURE_PATH", "./search_fixtures.json")
+# How long search results are reused for the same query, in seconds (0 disables the cache)
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+
+DUCKDUCKGO_URL = "https://html.duckduckgo.com/html/"
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    title: str
+    # As shown by the search engine, so possibly without a scheme
+    url: str
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+class SearchProvider(ABC):
+    """A web search backend for competitor discovery"""
+
+    @abstractmethod
+    async def search(self, query: str) -> List[SearchResult]:
+        """Results for `query`, best ranked first"""
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Scrapes DuckDuckGo's HTML results page, which doesn't need an API key"""
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        policy: RetryPolicy = DEFAULT_POLICY,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._client = client
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.policy = policy
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    async def search(self, query: str) -> List[SearchResult]:
+        response = await get_with_retries(
+            lambda: guarded_get(
+                self.client, DUCKDUCKGO_URL, self.rate_limiter, self.circuit_breaker, self.policy, params={"q": query}
+            ),
+            DUCKDUCKGO_URL,
+            self.policy,
+        )
+        response.raise_for_status()
+        return self.parse(response.text)
+
+    @staticmethod
+    def parse(html: str) -> List[SearchResult]:
+        soup = BeautifulSoup(html, "html.parser")
+        results = []
+        for result in soup.select(".result"):
+            link = result.select_one(".result__title a")
+            url = result.select_one(".result__url")
+            if link is None and url is None:
+                continue
+            results.append(SearchResult(
+                title=link.get_text(strip=True) if link else "",
+                url=url.get_text(strip=True) if url else ""
+            ))
+        return results
+
+
+class FixtureProvider(SearchProvider):
+    """Answers from canned results instead of the web
+
+    Makes competitor discovery deterministic and offline, for benchmarking the
+    pipeline and for tests. Queries match case and whitespace insensitively;
+    anything else has no results.
+    """
+
+    def __init__(self, results: Dict[str, List[Dict[str, str]]]):
+        self.results = {
+            normalize_query(query): [SearchResult(title=r.get("title", ""), url=r.get("url", "")) for r in entries]
+            for query, entries in results.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "FixtureProvider":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    async def search(self, query: str) -> List[SearchResult]:
+        return list(self.results.get(normalize_query(query), []))
+
+
+class CachedSearchProvider(SearchProvider):
+    """Reuses another provider's results for the same query for `ttl` seconds
+
+    Competitor searches for popular brands repeat the same handful of queries across
+    requests, and the search engine is the slowest and most throttled host we talk
+    to. Failed searches aren't cached.
+    """
+
+    def __init__(self, provider: SearchProvider, ttl: float = SEARCH_CACHE_TTL, max_size: int = SEARCH_CACHE_SIZE):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_size = max_size
+        self._results: Dict[str, Tuple[List[SearchResult], float]] = {}
+        # Shared by the server's loop and the background loop of the sync wrappers
+        self._lock = threading.Lock()
+
+    async def search(self, query: str) -> List[SearchResult]:
+        key = normalize_query(query)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() < cached[1]:
+                return list(cached[0])
+
+        results = await self.provider.search(query)
+        with self._lock:
+            self._results.pop(key, None)
+            self._results[key] = (results, time.monotonic() + self.ttl)
+            while len(self._results) > self.max_size:
+                del self._results[next(iter(self._results))]
+        return list(results)
+
+
+def build_search_provider(name: str = SEARCH_PROVIDER) -> SearchProvider:
+    """Create the configured search provider, wrapped in the result cache"""
+    if name == "fixture":
+        provider: SearchProvider = FixtureProvider.from_file(SEARCH_FIXTURE_PATH)
+    elif name == "duckduckgo":
+        provider = DuckDuckGoProvider()
+    else:
+        raise ValueError(f"Unknown search provider '{name}'")
+
+    if SEARCH_CACHE_TTL > 0:
+        provider = CachedSearchProvider(provider)
+    return provider
+
+
+_shared_provider: Optional[SearchProvider] = None
+_shared_provider_lock = threading.Lock()
+
+
+def get_search_provider() -> SearchProvider:
+    """Get the process-wide search provider"""
+    global _shared_provider
+    with _shared_provider_lock:
+        if _shared_provider is None:
+            _shared_provider = build_search_provider()
+        return _shared_provider
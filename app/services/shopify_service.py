@@ -1,26 +1,91 @@
+import asyncio
 import json
+from datetime import datetime
+import os
 import re
-from typing import Dict, List, Optional, Any, Tuple
-import requests
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Any, Set, Tuple
+import httpx
 from bs4 import BeautifulSoup
 import logging
 from urllib.parse import urljoin, urlparse
 
 from app.models.insights import Product, ShopifyInsights, SocialHandle, ContactInfo, ImportantLink, FAQ
+from app.services.homepage import HomepageAnalysis, analyze_homepage
+from app.services.http_client import get_async_client
+from app.services.parsers import DEFAULT_PARSER, resolve_parser
+from app.services.path_memory import PathMemory, get_path_memory
+from app.services.rate_limiter import RateLimiter
+from app.services.rate_limiter import rate_limiter as shared_rate_limiter
+from app.services.response_cache import ResponseCache, get_response_cache
+from app.services.retry_policy import DEFAULT_POLICY, RetryPolicy
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.circuit_breaker import circuit_breaker as shared_circuit_breaker
+from app.services.fetching import get_with_retries, guarded_get
+from app.services.scheduler import ExtractionScheduler
+from app.services.sitemap import SitemapIndex, pages_sitemaps, parse_sitemap
+from app.utils.async_bridge import run_sync
+from app.utils.timestamps import parse_timestamp
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# TODO: Add caching mechanism to avoid repeated requests to the same store
-# TODO: Implement rate limiting to avoid being blocked by Shopify
 # TODO: Add support for more languages beyond English
 
 # NOTE: This service extracts data from Shopify stores without using their official API.
 # I've found that most Shopify stores follow similar patterns, but there are always exceptions.
 # The code tries to handle various layouts and structures, but may need adjustments for specific stores.
 
+# Maximum number of requests in flight against a single store at any time.
+# Extractors and their candidate paths all run concurrently, so this is what keeps
+# us from hammering a store with dozens of simultaneous requests.
+STORE_MAX_CONCURRENCY = int(os.getenv("STORE_MAX_CONCURRENCY", "8"))
 
-class ShopifyService:
+# Shopify limits products.json to 250 products per page
+PRODUCTS_PAGE_SIZE = 250
+
+# Largest number of products.json pages requested speculatively at once
+PRODUCTS_PAGE_WINDOW = int(os.getenv("PRODUCTS_PAGE_WINDOW", "4"))
+
+# Selectors for the main content area of policy and about pages
+POLICY_CONTENT_SELECTORS = [
+    "main",
+    ".main-content",
+    ".page-content",
+    "#MainContent",
+    ".shopify-policy__body",
+    ".policy-content"
+]
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+# Phone numbers in various formats
+PHONE_PATTERNS = [
+    re.compile(r'\+\d{1,3}\s?[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}'),  # International
+    re.compile(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'),  # US/Canada
+    re.compile(r'\d{10,12}')  # Simple digits
+]
+
+ABOUT_CONTENT_SELECTORS = [
+    "main",
+    ".main-content",
+    ".page-content",
+    "#MainContent",
+    ".about-content",
+    ".about-section"
+]
+
+
+def _cancel_pending(tasks: List[asyncio.Future]) -> None:
+    """Cancel tasks we no longer need, swallowing errors from ones that already failed"""
+    for task in tasks:
+        if task.done():
+            if not task.cancelled():
+                task.exception()
+        else:
+            task.cancel()
+
+
+class AsyncShopifyService:
     """Service for extracting insights from Shopify stores without using the official API.
     
     This was challenging to build because each Shopify store can have a different theme and structure.
@@ -29,64 +94,351 @@ class ShopifyService:
     
     One interesting discovery was that all Shopify stores expose their product catalog via the
     /products.json endpoint, which made that part much easier than I initially expected.
+    
+    All network I/O is async and goes through a pooled httpx client shared by the whole
+    process, so a slow store no longer blocks the event loop for everyone else.
+    Use ShopifyService if you need the same API from synchronous code.
     """
     
-    def __init__(self, website_url: str):
+    def __init__(
+        self,
+        website_url: str,
+        client: Optional[httpx.AsyncClient] = None,
+        max_concurrency: int = STORE_MAX_CONCURRENCY,
+        use_cache: bool = True,
+        parser: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        policy: RetryPolicy = DEFAULT_POLICY,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        first_page: Optional[Dict] = None
+    ):
         # Normalize URL to ensure it has a trailing slash
         self.website_url = website_url.rstrip("/") + "/"
-        self.session = requests.Session()
+        self.domain = urlparse(self.website_url).netloc
+        
+        # An explicit client is mostly useful for tests; otherwise we use the shared pool
+        self._client = client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # Paces requests per host across every service in the process (see app.services.rate_limiter)
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        
+        # Timeouts, retries, hedging and the time budget (see app.services.retry_policy)
+        self.policy = policy
         
-        # Using a realistic user agent to avoid being blocked
-        # I found that some Shopify stores block requests with default Python user agents
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        })
+        # Stops us hammering stores that are down or blocking us (see app.services.circuit_breaker)
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker
+        
+        # BeautifulSoup backend, lxml when it's installed (see app.services.parsers)
+        self.parser = resolve_parser(parser) if parser else DEFAULT_PARSER
+        
+        # Responses are cached across requests (and restarts) in a shared on-disk cache
+        self.cache: Optional[ResponseCache] = get_response_cache() if use_cache else None
+        
+        # Remembers which guessed paths 404 on this store and which ones worked last time.
+        # It is SQLite too, so it is only used through asyncio.to_thread, and the
+        # store's missing paths are read once per service.
+        self.path_memory: Optional[PathMemory] = get_path_memory() if use_cache else None
+        self._missing_paths: Optional[Set[str]] = None
         
         # Cache to avoid repeated requests to the same URL
         # This significantly improves performance when analyzing large stores
         self.soup_cache = {}
         
-    def _get_soup(self, url: str) -> BeautifulSoup:
+        # Soups that are currently being downloaded, so concurrent extractors asking
+        # for the same page (usually the homepage) share a single request
+        self._pending_soups: Dict[str, asyncio.Future] = {}
+        
+        # The catalog is fetched at most once per run and indexed by handle, so
+        # get_products, get_hero_products and anything else that needs products share it
+        self._catalog: Optional[asyncio.Future] = None
+        # The first products.json page, if the store resolver already downloaded it
+        # (see app.services.store_resolver). Used once, by the first catalog walk.
+        self._first_page = first_page
+        self._product_index: Optional[Dict[str, Product]] = None
+        # Set when the last catalog download failed, so callers can tell an empty
+        # catalog from one we couldn't get
+        self.catalog_failed = False
+        
+        # Pages listed in the store's sitemap, also fetched at most once per run
+        self._sitemap: Optional[asyncio.Future] = None
+        
+        # Shared by every extractor that reads the homepage
+        self._homepage_analysis: Optional[HomepageAnalysis] = None
+        
+        # Downloads shared between extractors (pages, the catalog, the sitemap). Waiters
+        # only shield them, so they are tracked here to be stopped with the run.
+        self._shared_tasks: Set[asyncio.Future] = set()
+        
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+        
+    async def _fetch(self, url: str, hedge: bool = False) -> httpx.Response:
+        """GET a URL through the response cache, respecting the per-store concurrency cap
+        
+        Fresh cache entries are returned without touching the network. Stale ones are
+        revalidated with a conditional request, so an unchanged page only costs a 304.
+        """
+        # The cache is SQLite, so its reads and writes run in a worker thread
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        if cached and cached.is_fresh():
+            return cached.to_response()
+            
+        headers = cached.validators() if cached else {}
+        async with self._semaphore:
+            response = await self._send(url, headers, hedge)
+            
+        if response.status_code == 304 and cached:
+            await asyncio.to_thread(self.cache.refresh, url)
+            return cached.to_response()
+            
+        response.raise_for_status()
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, url, response)
+        return response
+        
+    async def _send(self, url: str, headers: Dict[str, str], hedge: bool = False) -> httpx.Response:
+        """Send a GET, retrying it according to the rate limiter and the retry policy"""
+        if hedge and self.policy.hedge_after > 0:
+            return await get_with_retries(lambda: self._send_hedged(url, headers), url, self.policy)
+        return await get_with_retries(lambda: self._send_once(url, headers), url, self.policy)
+            
+    async def _send_once(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        return await guarded_get(
+            self.client, url, self.rate_limiter, self.circuit_breaker, self.policy, headers=headers
+        )
+        
+    async def _send_hedged(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        """Send a second copy of a request that is slow to answer and use whichever answers first
+        
+        A few products.json pages of a big catalog are always much slower than the rest
+        and hold up the whole catalog. Hedging only costs an extra request for those
+        slow ones, and the loser is cancelled.
+        """
+        tasks = [asyncio.ensure_future(self._send_once(url, headers))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.policy.hedge_after)
+            if not done:
+                logger.debug(f"Hedging slow request to {url}")
+                tasks.append(asyncio.ensure_future(self._send_once(url, headers)))
+                
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed, report the original request's error
+            return tasks[0].result()
+        finally:
+            _cancel_pending(tasks)
+        
+    def _start_shared(self, coro: Awaitable[Any]) -> asyncio.Future:
+        """Start a download shared between extractors"""
+        task = asyncio.ensure_future(coro)
+        self._shared_tasks.add(task)
+        task.add_done_callback(self._shared_tasks.discard)
+        return task
+        
+    async def cancel_shared(self) -> None:
+        """Stop the shared downloads that are still running, and wait until they have
+        
+        Extractors that give up (e.g. when the time budget runs out) only cancel their
+        own wait, so without this a big catalog would keep paging after the run is over.
+        Unfinished downloads are forgotten, so a later call starts them again.
+        """
+        if self._catalog is not None and not self._catalog.done():
+            self._catalog = None
+        if self._sitemap is not None and not self._sitemap.done():
+            self._sitemap = None
+        tasks = list(self._shared_tasks)
+        _cancel_pending(tasks)
+        # The catalog walk cancels its page requests on the way out
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+    async def _get_soup(self, url: str) -> BeautifulSoup:
         """Get BeautifulSoup object for a URL with caching"""
         if url in self.soup_cache:
             return self.soup_cache[url]
         
+        pending = self._pending_soups.get(url)
+        if pending is None:
+            pending = self._start_shared(self._load_soup(url))
+            self._pending_soups[url] = pending
+            pending.add_done_callback(lambda task: self._forget_pending_soup(url, task))
+            
+        # Shield the shared download so one caller giving up doesn't cancel it for the others
+        return await asyncio.shield(pending)
+        
+    def _forget_pending_soup(self, url: str, task: asyncio.Future) -> None:
+        self._pending_soups.pop(url, None)
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+        
+    async def _load_soup(self, url: str) -> BeautifulSoup:
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
+            response = await self._fetch(url)
+            soup = BeautifulSoup(response.text, self.parser)
             self.soup_cache[url] = soup
             return soup
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching {url}: {str(e)}")
             raise
 
-    def _get_json(self, url: str) -> Dict:
+    async def _get_json(self, url: str, hedge: bool = False) -> Dict:
         """Get JSON data from a URL"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            response = await self._fetch(url, hedge=hedge)
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching JSON from {url}: {str(e)}")
             raise
         except json.JSONDecodeError:
             logger.error(f"Invalid JSON from {url}")
             return {}
 
-    def get_store_name(self) -> str:
+    async def _probe(self, path: str, extract: Callable[[BeautifulSoup], Any]) -> Any:
+        """Fetch a candidate path and run an extractor on it, returning None on failure"""
+        try:
+            soup = await self._get_soup(urljoin(self.website_url, path))
+            return extract(soup)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                await self._mark_missing(path)
+            logger.debug(f"Nothing usable at {path}: {str(e)}")
+            return None
+        except CircuitOpenError:
+            # We don't know whether the page is there, so this isn't the same as "no page"
+            raise
+        except Exception as e:
+            logger.debug(f"Nothing usable at {path}: {str(e)}")
+            return None
+            
+    async def _known_paths(self, paths: List[str]) -> List[str]:
+        """Drop candidate paths that we already know 404 on this store"""
+        if not self.path_memory:
+            return paths
+        if self._missing_paths is None:
+            self._missing_paths = await asyncio.to_thread(self.path_memory.missing_paths, self.domain)
+        return [path for path in paths if path not in self._missing_paths]
+        
+    async def _mark_missing(self, path: str) -> None:
+        if not self.path_memory:
+            return
+        if self._missing_paths is not None:
+            self._missing_paths.add(path)
+        await asyncio.to_thread(self.path_memory.mark_missing, self.domain, path)
+            
+    async def get_sitemap_index(self) -> Optional[SitemapIndex]:
+        """Get the pages listed in the store's sitemap, or None if it has no usable sitemap"""
+        if self._sitemap is None:
+            self._sitemap = self._start_shared(self._load_sitemap())
+        return await asyncio.shield(self._sitemap)
+
+    async def _load_sitemap(self) -> Optional[SitemapIndex]:
+        if "sitemap.xml" not in await self._known_paths(["sitemap.xml"]):
+            return None
+            
+        try:
+            response = await self._fetch(urljoin(self.website_url, "sitemap.xml"))
+            child_sitemaps, urls = parse_sitemap(response.content)
+            
+            if child_sitemaps:
+                # Every Shopify store has a sitemap index; if it doesn't point at a pages
+                # sitemap it isn't one we understand, so fall back to guessing paths
+                child_sitemaps = pages_sitemaps(child_sitemaps)
+                if not child_sitemaps:
+                    return None
+                    
+                responses = await asyncio.gather(*(self._fetch(url) for url in child_sitemaps))
+                for child in responses:
+                    urls.extend(parse_sitemap(child.content)[1])
+            
+            if not urls:
+                # An empty sitemap would rule out every guessed page, which is far more
+                # likely to be a broken sitemap than a store without pages
+                logger.info(f"Sitemap for {self.website_url} lists no pages, guessing paths instead")
+                return None
+            return SitemapIndex(urls)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                await self._mark_missing("sitemap.xml")
+            logger.info(f"No sitemap for {self.website_url}: {str(e)}")
+        except Exception as e:
+            logger.info(f"Could not read sitemap for {self.website_url}: {str(e)}")
+        return None
+
+    async def _candidate_paths(self, guessed_paths: List[str], keywords: List[str]) -> List[str]:
+        """Narrow guessed paths down to the pages the sitemap says exist"""
+        sitemap = await self.get_sitemap_index()
+        if sitemap is None:
+            return guessed_paths
+        return sitemap.resolve(guessed_paths, keywords)
+
+    async def _first_match(self, name: str, paths: List[str], extract: Callable[[BeautifulSoup], Any]) -> Any:
+        """Probe all candidate paths concurrently and return the first match in priority order
+        
+        Every path is requested at once, but results are consumed in the order the paths are
+        listed, so a later path only wins if every earlier one came back empty - exactly the
+        behaviour of the old sequential loop, just without waiting on each 404 in turn.
+        
+        Paths known to 404 are skipped, and if we remember which path worked for this
+        extractor (`name`) last time, that one is tried on its own first.
+        """
+        paths = await self._known_paths(paths)
+        
+        if self.path_memory:
+            winner = await asyncio.to_thread(self.path_memory.winning_path, self.domain, name)
+            if winner in paths:
+                result = await self._probe(winner, extract)
+                if result is not None:
+                    return result
+                await asyncio.to_thread(self.path_memory.forget_winner, self.domain, name)
+                paths = [path for path in paths if path != winner]
+        
+        tasks = [asyncio.ensure_future(self._probe(path, extract)) for path in paths]
+        try:
+            for path, task in zip(paths, tasks):
+                result = await task
+                if result is not None:
+                    if self.path_memory:
+                        await asyncio.to_thread(self.path_memory.remember_winner, self.domain, name, path)
+                    return result
+            return None
+        finally:
+            # Lower-priority probes are no longer needed once we have a winner
+            _cancel_pending(tasks)
+
+    @staticmethod
+    def _extract_main_content(soup: BeautifulSoup, selectors: List[str]) -> Optional[str]:
+        """Return the text of the first matching content container"""
+        for selector in selectors:
+            content = soup.select_one(selector)
+            if content:
+                return content.get_text(strip=True, separator=" ")
+        return None
+
+    async def get_homepage_analysis(self) -> HomepageAnalysis:
+        """Walk the homepage once and share the result between the homepage extractors"""
+        if self._homepage_analysis is None:
+            soup = await self._get_soup(self.website_url)
+            if self._homepage_analysis is None:
+                self._homepage_analysis = analyze_homepage(soup, self.website_url)
+        return self._homepage_analysis
+
+    async def get_store_name(self) -> str:
         """Extract store name from the homepage"""
-        soup = self._get_soup(self.website_url)
+        homepage = await self.get_homepage_analysis()
         
         # Try to get from meta tags first
-        meta_title = soup.find("meta", property="og:site_name")
-        if meta_title and meta_title.get("content"):
-            return meta_title["content"]
+        if homepage.site_name:
+            return homepage.site_name
         
         # Try to get from title tag
-        title_tag = soup.find("title")
-        if title_tag and title_tag.text:
-            title = title_tag.text.strip()
+        if homepage.title:
+            title = homepage.title.strip()
             # Remove common suffixes like "| Official Site"
             title = re.sub(r'\s*[|]\s*.*$', '', title)
             return title.strip()
@@ -96,7 +448,7 @@ class ShopifyService:
         domain = parsed_url.netloc
         return domain.replace("www.", "").split(".")[0].capitalize()
 
-    def get_products(self) -> List[Product]:
+    async def get_products(self) -> List[Product]:
         """Get all products from the store
         
         This was one of my favorite discoveries during this project. All Shopify stores
@@ -105,31 +457,129 @@ class ShopifyService:
         make multiple requests to get all products for larger stores.
         
         I initially tried scraping product pages, but this approach is much more reliable.
+        
+        The catalog is only downloaded once per service instance; concurrent and later
+        calls share the same result.
         """
-        products_url = urljoin(self.website_url, "products.json")
+        if self._catalog is None:
+            self._catalog = self._start_shared(self._load_catalog())
+        return list(await asyncio.shield(self._catalog))
+
+    async def _load_catalog(self) -> List[Product]:
         try:
-            products_data = []
-            page = 1
+            products = []
+            async for page in self.iter_product_pages():
+                products.extend(page)
+        except Exception as e:
+            logger.error(f"Error fetching products: {str(e)}")
+            # Don't remember the failure, so a later call can try again
+            self._catalog = None
+            self.catalog_failed = True
+            return []
             
-            # Shopify limits to 250 products per page, so we need to paginate
-            # I've seen stores with thousands of products, so pagination is essential
-            while True:
-                url = f"{products_url}?page={page}&limit=250"
-                data = self._get_json(url)
+        self.catalog_failed = False
+        self._product_index = {product.handle: product for product in products}
+        return products
+
+    async def get_product_index(self) -> Dict[str, Product]:
+        """Get all products keyed by handle, fetching the catalog if needed"""
+        await self.get_products()
+        return self._product_index or {}
+
+    async def iter_product_pages(self) -> AsyncIterator[List[Product]]:
+        """Yield the product catalog one parsed page at a time
+        
+        Unlike get_products, this never holds more than a page window of the catalog in
+        memory, so stores with tens of thousands of products can be streamed straight
+        into the database or out to a client.
+        """
+        async for page in self._iter_raw_product_pages():
+            yield [self._parse_product(product) for product in page]
+
+    async def iter_updated_product_pages(self, since: Optional[datetime]) -> AsyncIterator[List[Product]]:
+        """Yield only the products updated after `since`, one parsed page at a time
+        
+        The catalog is requested newest-first (order=updated_at-desc). If the store
+        honours that ordering, we stop at the first page that reaches the watermark, so
+        re-syncing an unchanged catalog costs a single request. If it doesn't, we still
+        walk every page, but only products that changed are parsed and yielded.
+        Without a watermark this is the same as iter_product_pages.
+        """
+        if since is None:
+            async for page in self.iter_product_pages():
+                yield page
+            return
+            
+        pages = self._iter_raw_product_pages(order="updated_at-desc")
+        try:
+            newest_first = True
+            previous = None
+            async for page in pages:
+                stamps = [parse_timestamp(product.get("updated_at")) for product in page]
                 
-                if not data.get("products"):
-                    break
-                    
-                products_data.extend(data["products"])
-                if len(data["products"]) < 250:  # Last page
-                    break
+                # Check that the store really sorted the results for us
+                sequence = ([previous] if previous else []) + stamps
+                if None in stamps or any(a < b for a, b in zip(sequence, sequence[1:])):
+                    newest_first = False
+                previous = stamps[-1] if stamps else previous
+                
+                changed = [product for product, stamp in zip(page, stamps) if stamp is None or stamp > since]
+                if changed:
+                    yield [self._parse_product(product) for product in changed]
                     
-                page += 1
+                if newest_first and len(changed) < len(page):
+                    # Everything after this point is older than the watermark
+                    return
+        finally:
+            await pages.aclose()
+
+    async def _iter_raw_product_pages(self, order: Optional[str] = None) -> AsyncIterator[List[Dict]]:
+        """Yield raw products.json pages in order
+        
+        Shopify doesn't tell us how many pages a catalog has, so we discover it as we go:
+        the first page is fetched alone (most stores fit on it), and while pages keep coming
+        back full we request the following ones speculatively in windows that double up to
+        PRODUCTS_PAGE_WINDOW. Pages are still consumed in order, and as soon as a short or
+        empty page shows up the rest of the window is cancelled and thrown away.
+        """
+        products_url = urljoin(self.website_url, "products.json")
+        order_param = f"&order={order}" if order else ""
+        page = 1
+        window = 1
+        
+        if self._first_page is not None and order is None:
+            products = self._first_page.get("products") or []
+            self._first_page = None
+            if products:
+                yield products
+            if len(products) < PRODUCTS_PAGE_SIZE:
+                return
+            page = 2
+            window = 2
+            
+        while True:
+            tasks = [
+                asyncio.ensure_future(self._get_json(
+                    f"{products_url}?page={number}&limit={PRODUCTS_PAGE_SIZE}{order_param}", hedge=True
+                ))
+                for number in range(page, page + window)
+            ]
+            try:
+                for number, task in enumerate(tasks, start=page):
+                    data = await task
+                    if number > 1 and "products" not in data:
+                        # A broken page in the middle must not pass for the end of the catalog
+                        raise ValueError(f"Invalid products.json page {number}")
+                    products = data.get("products") or []
+                    if products:
+                        yield products
+                    if len(products) < PRODUCTS_PAGE_SIZE:  # Last page
+                        return
+            finally:
+                _cancel_pending(tasks)
                 
-            return [self._parse_product(product) for product in products_data]
-        except Exception as e:
-            logger.error(f"Error fetching products: {str(e)}")
-            return []
+            page += window
+            window = min(window * 2, PRODUCTS_PAGE_WINDOW)
 
     def _parse_product(self, product_data: Dict) -> Product:
         """Parse product data into Product model"""
@@ -158,37 +608,46 @@ class ShopifyService:
             tags=product_data.get("tags", []),
             images=images,
             variants=variants,
-            url=urljoin(self.website_url, f"products/{product_data.get('handle')}")
+            url=urljoin(self.website_url, f"products/{product_data.get('handle')}"),
+            updated_at=product_data.get("updated_at")
         )
 
-    def get_hero_products(self) -> List[Product]:
-        """Get hero products from the homepage"""
-        soup = self._get_soup(self.website_url)
-        hero_products = []
-        all_products = {p.handle: p for p in self.get_products()}
+    async def get_hero_products(self, products: Optional[List[Product]] = None) -> List[Product]:
+        """Get hero products from the homepage
         
-        # Look for product links on the homepage
-        product_links = soup.find_all("a", href=re.compile(r"/products/"))
+        Products are resolved from `products` if given, otherwise from the product index
+        when the catalog has been (or is being) fetched. If it hasn't, we only look up the
+        handful of products linked from the homepage instead of walking the whole catalog.
+        """
+        handles = (await self.get_homepage_analysis()).product_handles
         
-        for link in product_links:
-            href = link.get("href", "")
-            if not href:
-                continue
-                
-            # Extract product handle from URL
-            match = re.search(r"/products/([a-zA-Z0-9-]+)", href)
-            if not match:
+        if products is not None:
+            all_products = {p.handle: p for p in products}
+        elif self._catalog is not None:
+            all_products = await self.get_product_index()
+        else:
+            return await self._lookup_products(handles)
+            
+        return [all_products[handle] for handle in handles if handle in all_products]
+
+    async def _lookup_products(self, handles: List[str]) -> List[Product]:
+        """Fetch individual products through products/<handle>.json"""
+        urls = [urljoin(self.website_url, f"products/{handle}.json") for handle in handles]
+        results = await asyncio.gather(*(self._get_json(url) for url in urls), return_exceptions=True)
+        
+        products = []
+        for url, data in zip(urls, results):
+            if isinstance(data, CircuitOpenError):
+                raise data
+            if isinstance(data, Exception):
+                logger.error(f"Error fetching product from {url}: {str(data)}")
                 continue
+            if data.get("product"):
+                products.append(self._parse_product(data["product"]))
                 
-            handle = match.group(1)
-            if handle in all_products:
-                hero_products.append(all_products[handle])
-                
-        # Remove duplicates while preserving order
-        seen = set()
-        return [p for p in hero_products if not (p.handle in seen or seen.add(p.handle))]
+        return products
 
-    def get_privacy_policy(self) -> Optional[str]:
+    async def get_privacy_policy(self) -> Optional[str]:
         """Get privacy policy content"""
         possible_paths = [
             "policies/privacy-policy",
@@ -196,33 +655,13 @@ class ShopifyService:
             "pages/privacy",
             "policies/privacy"
         ]
+        possible_paths = await self._candidate_paths(possible_paths, ["privacy"])
         
-        for path in possible_paths:
-            try:
-                url = urljoin(self.website_url, path)
-                soup = self._get_soup(url)
-                
-                # Look for main content
-                content_selectors = [
-                    "main", 
-                    ".main-content", 
-                    ".page-content", 
-                    "#MainContent",
-                    ".shopify-policy__body",
-                    ".policy-content"
-                ]
-                
-                for selector in content_selectors:
-                    content = soup.select_one(selector)
-                    if content:
-                        return content.get_text(strip=True, separator=" ")
-                        
-            except Exception:
-                continue
-                
-        return None
+        return await self._first_match(
+            "privacy_policy", possible_paths, lambda soup: self._extract_main_content(soup, POLICY_CONTENT_SELECTORS)
+        )
 
-    def get_return_refund_policy(self) -> Optional[str]:
+    async def get_return_refund_policy(self) -> Optional[str]:
         """Get return/refund policy content"""
         possible_paths = [
             "policies/refund-policy",
@@ -232,33 +671,13 @@ class ShopifyService:
             "pages/return-policy",
             "pages/shipping-returns"
         ]
+        possible_paths = await self._candidate_paths(possible_paths, ["refund", "return"])
         
-        for path in possible_paths:
-            try:
-                url = urljoin(self.website_url, path)
-                soup = self._get_soup(url)
-                
-                # Look for main content
-                content_selectors = [
-                    "main", 
-                    ".main-content", 
-                    ".page-content", 
-                    "#MainContent",
-                    ".shopify-policy__body",
-                    ".policy-content"
-                ]
-                
-                for selector in content_selectors:
-                    content = soup.select_one(selector)
-                    if content:
-                        return content.get_text(strip=True, separator=" ")
-                        
-            except Exception:
-                continue
-                
-        return None
+        return await self._first_match(
+            "return_refund_policy", possible_paths, lambda soup: self._extract_main_content(soup, POLICY_CONTENT_SELECTORS)
+        )
 
-    def get_faqs(self) -> List[FAQ]:
+    async def get_faqs(self) -> List[FAQ]:
         """Get FAQs from the store
         
         This was the most challenging part of the project because FAQ sections vary widely
@@ -281,145 +700,132 @@ class ShopifyService:
             "pages/customer-support",
             "pages/customer-service"
         ]
+        possible_paths = await self._candidate_paths(possible_paths, ["faq", "frequently-asked", "questions", "help"])
         
+        # If we couldn't find FAQs in any of the common paths, return an empty list
+        return await self._first_match("faqs", possible_paths, self._extract_faqs) or []
+
+    @staticmethod
+    def _extract_faqs(soup: BeautifulSoup) -> Optional[List[FAQ]]:
+        """Extract FAQs from a single page, or None if the page has none"""
         faqs = []
         
-        for path in possible_paths:
-            try:
-                url = urljoin(self.website_url, path)
-                soup = self._get_soup(url)
-                
-                # Pattern 1: Definition lists (dt/dd pairs)
-                # This is the most semantic and cleanest way to mark up FAQs
-                dt_elements = soup.find_all("dt")
-                for dt in dt_elements:
-                    question = dt.get_text(strip=True)
-                    dd = dt.find_next("dd")
-                    if dd:
-                        answer = dd.get_text(strip=True)
+        # Pattern 1: Definition lists (dt/dd pairs)
+        # This is the most semantic and cleanest way to mark up FAQs
+        dt_elements = soup.find_all("dt")
+        for dt in dt_elements:
+            question = dt.get_text(strip=True)
+            dd = dt.find_next("dd")
+            if dd:
+                answer = dd.get_text(strip=True)
+                faqs.append(FAQ(question=question, answer=answer))
+        
+        # Pattern 2: Header/paragraph pairs
+        # Many stores use this pattern with headers for questions and paragraphs for answers
+        for tag in ["h3", "h4", "h5"]:
+            headers = soup.find_all(tag)
+            for header in headers:
+                question = header.get_text(strip=True)
+                # Check if it looks like a question
+                if "?" in question or question.lower().startswith(("what", "how", "when", "where", "why", "do", "can", "is", "are")):
+                    p = header.find_next("p")
+                    if p:
+                        answer = p.get_text(strip=True)
                         faqs.append(FAQ(question=question, answer=answer))
-                
-                # Pattern 2: Header/paragraph pairs
-                # Many stores use this pattern with headers for questions and paragraphs for answers
-                for tag in ["h3", "h4", "h5"]:
-                    headers = soup.find_all(tag)
-                    for header in headers:
-                        question = header.get_text(strip=True)
-                        # Check if it looks like a question
-                        if "?" in question or question.lower().startswith(("what", "how", "when", "where", "why", "do", "can", "is", "are")):
-                            p = header.find_next("p")
-                            if p:
-                                answer = p.get_text(strip=True)
-                                faqs.append(FAQ(question=question, answer=answer))
-                
-                # Pattern 3: FAQ accordions
-                # This was tricky because different themes use different class names
-                # I had to analyze many stores to find common patterns
-                faq_buttons = soup.select(".accordion-button, .accordion-header, .faq-question, .faq-title, .collapsible-trigger")
-                for button in faq_buttons:
-                    question = button.get_text(strip=True)
-                    # Find the corresponding content using aria attributes or data attributes
-                    content_id = button.get("aria-controls") or button.get("data-target", "").lstrip("#")
-                    if content_id:
-                        content = soup.find(id=content_id)
-                        if content:
-                            answer = content.get_text(strip=True)
-                            faqs.append(FAQ(question=question, answer=answer))
-                    else:
-                        # Try to find the next sibling that might contain the answer
-                        answer_container = button.find_next(".accordion-body, .faq-answer, .accordion-content, .collapsible-content")
-                        if answer_container:
-                            answer = answer_container.get_text(strip=True)
-                            faqs.append(FAQ(question=question, answer=answer))
-                
-                # If we found FAQs, return them
-                # This prevents unnecessary requests to other possible paths
-                if faqs:
-                    return faqs
-                    
-            except Exception as e:
-                logger.error(f"Error fetching FAQs from {path}: {str(e)}")
-                continue
-                
-        # If we couldn't find FAQs in any of the common paths, return an empty list
-        return faqs
+        
+        # Pattern 3: FAQ accordions
+        # This was tricky because different themes use different class names
+        # I had to analyze many stores to find common patterns
+        faq_buttons = soup.select(".accordion-button, .accordion-header, .faq-question, .faq-title, .collapsible-trigger")
+        for button in faq_buttons:
+            question = button.get_text(strip=True)
+            # Find the corresponding content using aria attributes or data attributes
+            content_id = button.get("aria-controls") or button.get("data-target", "").lstrip("#")
+            if content_id:
+                content = soup.find(id=content_id)
+                if content:
+                    answer = content.get_text(strip=True)
+                    faqs.append(FAQ(question=question, answer=answer))
+            else:
+                # Try to find the next sibling that might contain the answer
+                answer_container = button.find_next(".accordion-body, .faq-answer, .accordion-content, .collapsible-content")
+                if answer_container:
+                    answer = answer_container.get_text(strip=True)
+                    faqs.append(FAQ(question=question, answer=answer))
+        
+        return faqs or None
 
-    def get_social_handles(self) -> List[SocialHandle]:
+    async def get_social_handles(self) -> List[SocialHandle]:
         """Get social media handles"""
-        soup = self._get_soup(self.website_url)
-        social_handles = []
-        
-        # Common social media platforms and their patterns
-        social_patterns = {
-            "instagram": r"(instagram\.com|instagr\.am)/([^/?]+)",
-            "facebook": r"(facebook\.com|fb\.com)/([^/?]+)",
-            "twitter": r"(twitter\.com|x\.com)/([^/?]+)",
-            "youtube": r"youtube\.com/(@?[^/?]+)",
-            "tiktok": r"tiktok\.com/(@?[^/?]+)",
-            "pinterest": r"pinterest\.com/([^/?]+)",
-            "linkedin": r"linkedin\.com/company/([^/?]+)"
-        }
-        
-        # Look for social links in the footer and header
-        for link in soup.find_all("a", href=True):
-            href = link.get("href", "").lower()
-            
-            for platform, pattern in social_patterns.items():
-                if re.search(pattern, href):
-                    social_handles.append(SocialHandle(platform=platform, url=href))
-                    break
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        return [s for s in social_handles if not (s.url in seen or seen.add(s.url))]
+        return list((await self.get_homepage_analysis()).social_handles)
 
-    def get_contact_info(self) -> ContactInfo:
+    async def get_contact_info(self) -> ContactInfo:
         """Get contact information"""
         contact_info = ContactInfo()
         
         # Try to find contact info on the homepage and contact page
-        pages_to_check = [self.website_url]
+        contact_paths = await self._candidate_paths(["pages/contact", "pages/contact-us", "contact", "contact-us"], ["contact"])
+        contact_paths = await self._known_paths(contact_paths)
+        contact_urls = [urljoin(self.website_url, path) for path in contact_paths]
         
-        # Add contact page if it exists
-        contact_paths = ["pages/contact", "pages/contact-us", "contact", "contact-us"]
-        for path in contact_paths:
-            pages_to_check.append(urljoin(self.website_url, path))
+        # Fetch every page at once, but merge the results in the original order
+        homepage, *soups = await asyncio.gather(
+            self.get_homepage_analysis(),
+            *(self._get_soup(url) for url in contact_urls),
+            return_exceptions=True
+        )
         
-        for url in pages_to_check:
-            try:
-                soup = self._get_soup(url)
-                
-                # Extract emails
-                email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-                page_text = soup.get_text()
-                emails = re.findall(email_pattern, page_text)
-                contact_info.emails.extend([email for email in emails if email not in contact_info.emails])
-                
-                # Extract phone numbers (various formats)
-                phone_patterns = [
-                    r'\+\d{1,3}\s?[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}',  # International
-                    r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',  # US/Canada
-                    r'\d{10,12}'  # Simple digits
-                ]
-                
-                for pattern in phone_patterns:
-                    phones = re.findall(pattern, page_text)
-                    contact_info.phone_numbers.extend([phone for phone in phones if phone not in contact_info.phone_numbers])
-                
-                # Try to find address
-                address_containers = soup.select(".address, .contact-address, .store-address")
-                for container in address_containers:
-                    address = container.get_text(strip=True)
-                    if address and len(address) > 10:  # Simple validation
-                        contact_info.address = address
-                        break
+        # Pages we couldn't even ask for would leave the contact info half empty, and it
+        # would overwrite what we have; let get_all_insights report it as incomplete
+        for result in (homepage, *soups):
+            if isinstance(result, CircuitOpenError):
+                raise result
+        
+        if isinstance(homepage, Exception):
+            logger.error(f"Error extracting contact info from {self.website_url}: {str(homepage)}")
+        else:
+            self._merge_contact_text(homepage.text, contact_info)
+            if homepage.address:
+                contact_info.address = homepage.address
+        
+        for path, url, soup in zip(contact_paths, contact_urls, soups):
+            if isinstance(soup, Exception):
+                if isinstance(soup, httpx.HTTPStatusError) and soup.response.status_code == 404:
+                    await self._mark_missing(path)
+                logger.error(f"Error extracting contact info from {url}: {str(soup)}")
+                continue
                 
+            try:
+                self._extract_contact_info(soup, contact_info)
             except Exception as e:
                 logger.error(f"Error extracting contact info from {url}: {str(e)}")
         
         return contact_info
 
-    def get_about_brand(self) -> Optional[str]:
+    @classmethod
+    def _extract_contact_info(cls, soup: BeautifulSoup, contact_info: ContactInfo) -> None:
+        """Merge emails, phone numbers and address found on a page into contact_info"""
+        cls._merge_contact_text(soup.get_text(), contact_info)
+        
+        # Try to find address
+        address_containers = soup.select(".address, .contact-address, .store-address")
+        for container in address_containers:
+            address = container.get_text(strip=True)
+            if address and len(address) > 10:  # Simple validation
+                contact_info.address = address
+                break
+
+    @staticmethod
+    def _merge_contact_text(page_text: str, contact_info: ContactInfo) -> None:
+        """Merge emails and phone numbers found in a page's text into contact_info"""
+        emails = EMAIL_PATTERN.findall(page_text)
+        contact_info.emails.extend([email for email in emails if email not in contact_info.emails])
+        
+        for pattern in PHONE_PATTERNS:
+            phones = pattern.findall(page_text)
+            contact_info.phone_numbers.extend([phone for phone in phones if phone not in contact_info.phone_numbers])
+
+    async def get_about_brand(self) -> Optional[str]:
         """Get information about the brand"""
         possible_paths = [
             "pages/about",
@@ -429,102 +835,116 @@ class ShopifyService:
             "pages/our-story",
             "pages/story"
         ]
+        possible_paths = await self._candidate_paths(possible_paths, ["about", "story"])
         
-        for path in possible_paths:
-            try:
-                url = urljoin(self.website_url, path)
-                soup = self._get_soup(url)
-                
-                # Look for main content
-                content_selectors = [
-                    "main", 
-                    ".main-content", 
-                    ".page-content", 
-                    "#MainContent",
-                    ".about-content",
-                    ".about-section"
-                ]
-                
-                for selector in content_selectors:
-                    content = soup.select_one(selector)
-                    if content:
-                        return content.get_text(strip=True, separator=" ")
-                        
-            except Exception:
-                continue
-                
-        return None
+        return await self._first_match(
+            "about_brand", possible_paths, lambda soup: self._extract_main_content(soup, ABOUT_CONTENT_SELECTORS)
+        )
 
-    def get_important_links(self) -> List[ImportantLink]:
+    async def get_important_links(self) -> List[ImportantLink]:
         """Get important links like order tracking, contact us, blogs"""
-        soup = self._get_soup(self.website_url)
-        important_links = []
-        
-        # Common important link patterns
-        important_patterns = {
-            "Order Tracking": r"(track|tracking|order-status)",
-            "Contact Us": r"(contact|contact-us)",
-            "Blog": r"(blog|articles|news)",
-            "Shipping": r"(shipping|delivery)",
-            "FAQ": r"(faq|help|support)",
-            "Terms": r"(terms|terms-of-service|terms-conditions)",
-            "Careers": r"(careers|jobs)",
-            "Stores": r"(stores|locations|find-us)"
-        }
-        
-        # Look for links in the header and footer
-        for link in soup.find_all("a", href=True):
-            href = link.get("href", "")
-            text = link.get_text(strip=True)
-            
-            if not text or not href or href == "#" or href.startswith("javascript:"):
-                continue
-                
-            # Make URL absolute
-            if not href.startswith(("http://", "https://")):
-                href = urljoin(self.website_url, href)
-            
-            # Check if it matches any important pattern
-            for name, pattern in important_patterns.items():
-                if re.search(pattern, href, re.I) or re.search(pattern, text, re.I):
-                    important_links.append(ImportantLink(name=name, url=href))
-                    break
-            
-            # If it has text but didn't match patterns, use the text as name
-            if text and not any(link.url == href for link in important_links):
-                # Only include links that seem to be within the same domain
-                parsed_url = urlparse(href)
-                parsed_base = urlparse(self.website_url)
-                if parsed_url.netloc == parsed_base.netloc:
-                    important_links.append(ImportantLink(name=text, url=href))
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        return [link for link in important_links if not (link.url in seen or seen.add(link.url))]
+        return list((await self.get_homepage_analysis()).important_links)
 
+    async def get_all_insights(self) -> ShopifyInsights:
+        """Get all insights from the Shopify store
+        
+        Extractors run concurrently; only hero products have to wait, since they are
+        matched against the product catalog. Results are keyed by the ShopifyInsights
+        field they fill in.
+        
+        Extractors still running when the store's time budget runs out are cancelled,
+        along with the downloads they shared, and those that ran into an open circuit
+        breaker are skipped. They, and a catalog that failed to download (with the hero
+        products matched against it), are listed in `incomplete`, so the repository
+        keeps the data it already has for them. If the breaker kept us from the homepage, the
+        CircuitOpenError is raised as before.
+        """
+        scheduler = ExtractionScheduler()
+        scheduler.add("store_name", self.get_store_name)
+        scheduler.add("products", self.get_products)
+        scheduler.add("hero_products", self.get_hero_products, depends_on=["products"])
+        scheduler.add("privacy_policy", self.get_privacy_policy)
+        scheduler.add("return_refund_policy", self.get_return_refund_policy)
+        scheduler.add("faqs", self.get_faqs)
+        scheduler.add("social_handles", self.get_social_handles)
+        scheduler.add("contact_info", self.get_contact_info)
+        scheduler.add("about_brand", self.get_about_brand)
+        scheduler.add("important_links", self.get_important_links)
+        
+        try:
+            results = await scheduler.run(timeout=self.policy.time_budget or None, skip_on=(CircuitOpenError,))
+        finally:
+            await self.cancel_shared()
+        if "store_name" in scheduler.skipped:
+            # Not even the homepage, so there is nothing worth saving
+            raise scheduler.skipped["store_name"]
+        
+        incomplete = [name for name in scheduler.names if name not in results]
+        if self.catalog_failed:
+            # Hero products are matched against the catalog, so without it they are
+            # just as unknown, not an empty list
+            incomplete.extend(name for name in ("products", "hero_products") if name not in incomplete)
+        if incomplete:
+            logger.warning(f"Incomplete insights for {self.website_url}: {', '.join(incomplete)}")
+            results.setdefault("store_name", self.domain)
+        
+        return ShopifyInsights(store_url=self.website_url, incomplete=incomplete, **results)
+
+class ShopifyService:
+    """Synchronous facade over AsyncShopifyService.
+    
+    Kept so existing scripts and callers that aren't async can keep using the same API.
+    Every call is delegated to the async service and run on the shared background loop,
+    so the soup cache and the pooled connections survive between calls.
+    """
+    
+    def __init__(self, website_url: str, client: Optional[httpx.AsyncClient] = None, use_cache: bool = True):
+        self._service = AsyncShopifyService(website_url, client=client, use_cache=use_cache)
+        
+    @property
+    def website_url(self) -> str:
+        return self._service.website_url
+        
+    def get_store_name(self) -> str:
+        return run_sync(self._service.get_store_name())
+        
+    def get_products(self) -> List[Product]:
+        return run_sync(self._service.get_products())
+        
+    def get_hero_products(self) -> List[Product]:
+        return run_sync(self._service.get_hero_products())
+        
+    def iter_product_pages(self) -> Iterator[List[Product]]:
+        pages = self._service.iter_product_pages()
+        try:
+            while True:
+                try:
+                    yield run_sync(pages.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            run_sync(pages.aclose())
+        
+    def get_privacy_policy(self) -> Optional[str]:
+        return run_sync(self._service.get_privacy_policy())
+        
+    def get_return_refund_policy(self) -> Optional[str]:
+        return run_sync(self._service.get_return_refund_policy())
+        
+    def get_faqs(self) -> List[FAQ]:
+        return run_sync(self._service.get_faqs())
+        
+    def get_social_handles(self) -> List[SocialHandle]:
+        return run_sync(self._service.get_social_handles())
+        
+    def get_contact_info(self) -> ContactInfo:
+        return run_sync(self._service.get_contact_info())
+        
+    def get_about_brand(self) -> Optional[str]:
+        return run_sync(self._service.get_about_brand())
+        
+    def get_important_links(self) -> List[ImportantLink]:
+        return run_sync(self._service.get_important_links())
+        
     def get_all_insights(self) -> ShopifyInsights:
-        """Get all insights from the Shopify store"""
-        store_name = self.get_store_name()
-        products = self.get_products()
-        hero_products = self.get_hero_products()
-        privacy_policy = self.get_privacy_policy()
-        return_refund_policy = self.get_return_refund_policy()
-        faqs = self.get_faqs()
-        social_handles = self.get_social_handles()
-        contact_info = self.get_contact_info()
-        about_brand = self.get_about_brand()
-        important_links = self.get_important_links()
-        
-        return ShopifyInsights(
-            store_url=self.website_url,
-            store_name=store_name,
-            products=products,
-            hero_products=hero_products,
-            privacy_policy=privacy_policy,
-            return_refund_policy=return_refund_policy,
-            faqs=faqs,
-            social_handles=social_handles,
-            contact_info=contact_info,
-            about_brand=about_brand,
-            important_links=important_links
-        )
\ No newline at end of file
+        return run_sync(self._service.get_all_insights())
@@ -0,0 +1,322 @@
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.repository import InsightsRepository
+from app.utils.timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Width of the hashed TF-IDF vectors. Memory is stores x dimensions x 4 bytes,
+# so 2048 keeps 10,000 stores under 100MB.
+SIMILARITY_DIMENSIONS = int(os.getenv("SIMILARITY_DIMENSIONS", "2048"))
+# MinHash permutations per store; the Jaccard estimate is good to about 1/sqrt(this)
+SIMILARITY_MINHASHES = int(os.getenv("SIMILARITY_MINHASHES", "64"))
+# Rebuild the index from the database when it is older than this (seconds). Stores
+# scraped in between only have their own fingerprints refreshed.
+SIMILARITY_INDEX_TTL = int(os.getenv("SIMILARITY_INDEX_TTL", "600"))
+
+# How much the vocabulary (TF-IDF cosine), the token sets (MinHash Jaccard) and the
+# price distributions count towards the score
+TEXT_WEIGHT = 0.6
+MINHASH_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+
+# Price histogram buckets, log-spaced from $1 to $10,000
+PRICE_EDGES = np.logspace(0, 4, 17)
+
+# Words that say nothing about what a store sells
+STOPWORDS = {
+    "and", "the", "for", "with", "of", "in", "on", "to", "by", "a", "an", "or", "x",
+    "new", "set", "pack", "size", "one", "free", "sale", "default", "title",
+}
+
+# MinHash permutations h(x) = (a * x + b) mod p over 32-bit token hashes, with the
+# Mersenne prime p = 2^31 - 1. a and b are below p, so a * x + b fits in 64 bits.
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+def _permutations(count: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Fixed seed, so signatures are comparable between builds and processes
+    rng = np.random.default_rng(1234)
+    a = rng.integers(1, int(_MERSENNE_PRIME), size=count, dtype=np.uint64)
+    b = rng.integers(0, int(_MERSENNE_PRIME), size=count, dtype=np.uint64)
+    return a, b
+
+
+def tokenize(title: str, tags: Optional[Iterable[str]]) -> List[str]:
+    """Words of a product title plus its tags (whole, and split into words)"""
+    tokens = [
+        word for word in re.findall(r"[a-z0-9]+", title.lower())
+        if len(word) > 1 and not word.isdigit() and word not in STOPWORDS
+    ]
+    for tag in tags or ():
+        if not isinstance(tag, str) or not tag.strip():
+            continue
+        tag = tag.strip().lower()
+        tokens.append("tag:" + tag)
+        tokens.extend(word for word in re.findall(r"[a-z0-9]+", tag) if len(word) > 1 and word not in STOPWORDS)
+    return tokens
+
+
+def token_hash(token: str) -> int:
+    # Python's hash() is salted per process; crc32 is stable and fast
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class StoreFeatures:
+    """What we accumulate about one store's catalog while reading the products table"""
+
+    def __init__(self):
+        self.terms: Counter = Counter()
+        self.prices: List[float] = []
+
+    def add(self, title: str, tags: Optional[Iterable[str]], price: Optional[float]) -> None:
+        self.terms.update(token_hash(token) for token in tokenize(title, tags))
+        if price is not None and price > 0:
+            self.prices.append(price)
+
+    def fingerprint(self, store_id: int, dimensions: int, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term vector before IDF weighting, MinHash signature, price histogram before normalizing)"""
+        vector = np.zeros(dimensions, dtype=np.float32)
+        prices = np.zeros(len(PRICE_EDGES) - 1, dtype=np.float32)
+        if self.terms:
+            hashes = np.fromiter(self.terms.keys(), dtype=np.uint64, count=len(self.terms))
+            counts = np.fromiter(self.terms.values(), dtype=np.float32, count=len(self.terms))
+            # Sublinear term frequency, so one huge product line doesn't drown out the rest
+            np.add.at(vector, (hashes % np.uint64(dimensions)).astype(np.intp), 1 + np.log(counts))
+            signature = ((np.outer(hashes, a) + b) % _MERSENNE_PRIME).min(axis=0)
+        else:
+            # Matches nothing, not even another empty store
+            signature = np.full(len(a), _MERSENNE_PRIME + np.uint64(store_id) + np.uint64(1), dtype=np.uint64)
+        if self.prices:
+            clipped = np.clip(self.prices, PRICE_EDGES[0], PRICE_EDGES[-1])
+            prices[:] = np.histogram(clipped, bins=PRICE_EDGES)[0]
+        return vector, signature, prices
+
+
+class SimilarityIndex:
+    """Catalog fingerprints of every stored store, for finding competitors locally.
+
+    Competitor search needs outbound searches and guesses from result titles. We
+    already have full catalogs in the database, and stores selling the same things
+    describe them with the same words and sell them at similar prices. Every store
+    gets three fingerprints, each held in one NumPy array for all stores:
+
+    - a hashed TF-IDF vector of the words in its product titles and tags
+    - a MinHash signature of the same token set, estimating Jaccard similarity
+    - a normalized histogram of its prices
+
+    Finding the stores nearest to one is then a few matrix-vector products over all
+    of them, which takes milliseconds for thousands of stores.
+
+    An index is never changed once built; with_store returns a copy with one store's
+    fingerprints refreshed, so requests still using the old one aren't disturbed.
+    """
+
+    def __init__(
+        self,
+        store_ids: np.ndarray,
+        vectors: np.ndarray,
+        signatures: np.ndarray,
+        prices: np.ndarray,
+        built_at: Optional[datetime] = None,
+        idf: Optional[np.ndarray] = None,
+        refreshed: Optional[Dict[int, datetime]] = None,
+    ):
+        self.store_ids = store_ids
+        self.vectors = vectors
+        self.signatures = signatures
+        self.prices = prices
+        self.built_at = built_at or utcnow()
+        # IDF weights of the full build, reused for stores refreshed on their own
+        self.idf = idf if idf is not None else np.ones(vectors.shape[1], dtype=np.float32)
+        # When stores were refreshed on their own since the build, by id
+        self.refreshed = refreshed or {}
+        self._rows = {int(store_id): row for row, store_id in enumerate(store_ids)}
+
+    def __len__(self) -> int:
+        return len(self.store_ids)
+
+    def __contains__(self, store_id: int) -> bool:
+        return store_id in self._rows
+
+    @classmethod
+    def build(
+        cls,
+        repository: InsightsRepository,
+        dimensions: int = SIMILARITY_DIMENSIONS,
+        minhashes: int = SIMILARITY_MINHASHES,
+    ) -> "SimilarityIndex":
+        """Fingerprint every store that has products in the database"""
+        started = time.perf_counter()
+        built_at = utcnow()
+        stores: Dict[int, StoreFeatures] = {}
+        for store_id, title, tags, price in repository.iter_catalog_features():
+            features = stores.get(store_id)
+            if features is None:
+                features = stores[store_id] = StoreFeatures()
+            features.add(title, tags, price)
+
+        store_ids = np.array(sorted(stores), dtype=np.int64)
+        count = len(store_ids)
+        vectors = np.zeros((count, dimensions), dtype=np.float32)
+        signatures = np.zeros((count, minhashes), dtype=np.uint64)
+        prices = np.zeros((count, len(PRICE_EDGES) - 1), dtype=np.float32)
+        a, b = _permutations(minhashes)
+
+        for row, store_id in enumerate(store_ids):
+            vectors[row], signatures[row], prices[row] = stores[int(store_id)].fingerprint(int(store_id), dimensions, a, b)
+
+        # Inverse document frequency over stores, then unit length for cosine similarity
+        document_frequency = np.count_nonzero(vectors, axis=0)
+        idf = (np.log((1 + count) / (1 + document_frequency)) + 1).astype(np.float32)
+        vectors *= idf
+        _normalize(vectors)
+        _normalize(prices)
+
+        logger.info(f"Built similarity index of {count} stores in {time.perf_counter() - started:.2f}s")
+        return cls(store_ids, vectors, signatures, prices, built_at, idf)
+
+    def covers(self, store_id: int, since: datetime) -> bool:
+        """Whether the store's fingerprints were taken at `since` or later"""
+        return since <= self.refreshed.get(store_id, self.built_at)
+
+    def with_store(self, repository: InsightsRepository, store_id: int) -> "SimilarityIndex":
+        """A copy of the index with one store's fingerprints taken again from the database
+
+        Only that store's products are read. The IDF weights of the last full build
+        are reused, which is close enough until the next one. A store that has no
+        products any more is dropped.
+        """
+        refreshed_at = utcnow()
+        features = None
+        for _, title, tags, price in repository.iter_catalog_features(store_id):
+            if features is None:
+                features = StoreFeatures()
+            features.add(title, tags, price)
+
+        store_ids, vectors, signatures, prices = self.store_ids, self.vectors, self.signatures, self.prices
+        row = self._rows.get(store_id)
+        if features is None:
+            if row is not None:
+                store_ids, vectors, signatures, prices = (
+                    np.delete(array, row, axis=0) for array in (store_ids, vectors, signatures, prices)
+                )
+        else:
+            vector, signature, price_histogram = features.fingerprint(
+                store_id, vectors.shape[1], *_permutations(signatures.shape[1])
+            )
+            vector *= self.idf
+            vector, price_histogram = vector[np.newaxis], price_histogram[np.newaxis]
+            _normalize(vector)
+            _normalize(price_histogram)
+            if row is None:
+                store_ids = np.append(store_ids, np.int64(store_id))
+                vectors = np.vstack([vectors, vector])
+                signatures = np.vstack([signatures, signature])
+                prices = np.vstack([prices, price_histogram])
+            else:
+                store_ids, vectors, signatures, prices = (
+                    array.copy() for array in (store_ids, vectors, signatures, prices)
+                )
+                vectors[row], signatures[row], prices[row] = vector[0], signature, price_histogram[0]
+
+        return SimilarityIndex(
+            store_ids, vectors, signatures, prices, self.built_at, self.idf, {**self.refreshed, store_id: refreshed_at}
+        )
+
+    def nearest(self, store_id: int, limit: int = 5) -> List[Tuple[int, float]]:
+        """The `limit` stores most similar to `store_id` as (store_id, score), best first"""
+        row = self._rows.get(store_id)
+        if row is None or len(self) < 2:
+            return []
+
+        scores = TEXT_WEIGHT * (self.vectors @ self.vectors[row])
+        scores += MINHASH_WEIGHT * (self.signatures == self.signatures[row]).mean(axis=1, dtype=np.float32)
+        scores += PRICE_WEIGHT * (self.prices @ self.prices[row])
+        scores[row] = -1
+
+        limit = min(limit, len(self) - 1)
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.store_ids[i]), round(float(scores[i]), 4)) for i in best if scores[i] > 0]
+
+
+def _normalize(matrix: np.ndarray) -> None:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+
+class SimilarityIndexCache:
+    """The process-wide similarity index, kept up to date with the database
+
+    Full builds read the whole products table, so only the very first one makes a
+    request wait. After that, a store scraped since the build only has its own
+    fingerprints refreshed, and once the index is older than `ttl` it is rebuilt in
+    a background thread while the current one keeps being served.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], ttl: float = SIMILARITY_INDEX_TTL):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._index: Optional[SimilarityIndex] = None
+        self._built: float = 0.0
+        self._rebuild: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get(self, store_id: Optional[int] = None, required_since: Optional[datetime] = None) -> SimilarityIndex:
+        """Get the index, with `store_id`'s fingerprints no older than `required_since`"""
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+                self._built = time.monotonic()
+            elif time.monotonic() - self._built >= self.ttl and self._rebuild is None:
+                self._rebuild = threading.Thread(target=self._rebuild_in_background, daemon=True)
+                self._rebuild.start()
+
+            if store_id is not None and required_since is not None and not self._index.covers(store_id, required_since):
+                db = self.session_factory()
+                try:
+                    self._index = self._index.with_store(InsightsRepository(db), store_id)
+                finally:
+                    db.close()
+            return self._index
+
+    def _build(self) -> SimilarityIndex:
+        db = self.session_factory()
+        try:
+            return SimilarityIndex.build(InsightsRepository(db))
+        finally:
+            db.close()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            index = self._build()
+        except Exception as e:
+            logger.error(f"Rebuilding the similarity index failed, keeping the old one: {str(e)}")
+            index = None
+        with self._lock:
+            # Stores scraped after this build started get refreshed on their own when asked for
+            if index is not None and self._index is not None:
+                self._index = index
+                self._built = time.monotonic()
+            self._rebuild = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+
+
+# Shared by every request
+similarity_index = SimilarityIndexCache(SessionLocal)
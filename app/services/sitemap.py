@@ -0,0 +1,97 @@
+import io
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterable, List, Tuple
+from urllib.parse import urlparse
+
+# Shopify's sitemap.xml is an index pointing at one child sitemap per resource type
+# (sitemap_products_1.xml, sitemap_pages_1.xml, ...). Only the pages ones matter for
+# discovery; the product sitemaps can be huge and we get products from products.json.
+PAGES_SITEMAP_PATTERN = re.compile(r"^/sitemap_pages_\d+\.xml$")
+
+SITEMAP_ROOTS = ("urlset", "sitemapindex")
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], List[str]]:
+    """Stream-parse a sitemap document
+
+    Returns the child sitemap URLs (for a sitemap index) and the page URLs (for a
+    regular sitemap). Elements are cleared as soon as they are read, so even large
+    sitemaps are parsed in constant memory.
+
+    Raises ValueError if the document isn't a sitemap at all, e.g. a theme's "not
+    found" page served with a 200, which is often well-formed enough to parse.
+    """
+    sitemaps = []
+    urls = []
+    root_checked = False
+
+    for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        # Strip the namespace, sitemaps use {http://www.sitemaps.org/schemas/sitemap/0.9}
+        tag = element.tag.rsplit("}", 1)[-1]
+        if not root_checked:
+            if tag not in SITEMAP_ROOTS:
+                raise ValueError(f"Not a sitemap: <{tag}> document")
+            root_checked = True
+        if event == "end" and tag in ("sitemap", "url"):
+            loc = next((child.text for child in element if child.tag.rsplit("}", 1)[-1] == "loc"), None)
+            if loc:
+                (sitemaps if tag == "sitemap" else urls).append(loc.strip())
+            element.clear()
+
+    return sitemaps, urls
+
+
+def pages_sitemaps(sitemap_urls: Iterable[str]) -> List[str]:
+    """Pick the child sitemaps that list the store's pages"""
+    return [url for url in sitemap_urls if PAGES_SITEMAP_PATTERN.match(urlparse(url).path)]
+
+
+class SitemapIndex:
+    """The pages a store actually has, as listed by its sitemap.
+
+    Paths are stored relative to the store root (e.g. "pages/faq"), in sitemap order.
+    """
+
+    def __init__(self, urls: Iterable[str]):
+        self.paths: List[str] = []
+        seen = set()
+        for url in urls:
+            path = urlparse(url).path.strip("/")
+            if path and path not in seen:
+                seen.add(path)
+                self.paths.append(path)
+        self._path_set = seen
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._path_set
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def find(self, keywords: Iterable[str]) -> List[str]:
+        """Paths whose handle contains any of the keywords, best matches first
+
+        Keywords are in priority order, so pages matching the first keyword come before
+        pages that only match a later one.
+        """
+        matches = []
+        for keyword in keywords:
+            for path in self.paths:
+                if keyword in path.rsplit("/", 1)[-1] and path not in matches:
+                    matches.append(path)
+        return matches
+
+    def resolve(self, guessed_paths: List[str], keywords: Iterable[str]) -> List[str]:
+        """Turn an extractor's guessed paths into the candidates worth requesting
+
+        Guessed `pages/...` paths are kept only if the sitemap lists them, since every
+        published page is in there. Guesses outside /pages (policies, theme routes like
+        /contact) aren't in the sitemap, so they are kept as they are. Pages found by
+        keyword come after the guesses, which picks up stores with unusual handles.
+        """
+        candidates = [path for path in guessed_paths if not path.startswith("pages/") or path in self]
+        for path in self.find(keywords):
+            if path not in candidates:
+                candidates.append(path)
+        return candidates
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import circuit_breaker as shared_circuit_breaker
+from app.services.fetching import get_with_retries, guarded_get
+from app.services.http_client import get_async_client
+from app.services.rate_limiter import RateLimiter
+from app.services.rate_limiter import rate_limiter as shared_rate_limiter
+from app.services.retry_policy import DEFAULT_POLICY, RetryPolicy
+from app.services.shopify_service import PRODUCTS_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# How long (in seconds) we trust what we found out about a host before checking again
+STORE_IDENTITY_TTL = int(os.getenv("STORE_IDENTITY_TTL", "3600"))
+# Hosts remembered at most; the ones cached longest ago are dropped first
+STORE_IDENTITY_CACHE_SIZE = int(os.getenv("STORE_IDENTITY_CACHE_SIZE", "10000"))
+
+# Headers Shopify's storefront servers send with every response
+SHOPIFY_HEADERS = ("x-shopid", "x-shopify-stage", "x-sorting-hat-shopid")
+
+
+@dataclass
+class StoreIdentity:
+    """What a store URL turned out to be"""
+    # Canonical store URL (after redirects, with a trailing slash)
+    website_url: str
+    is_shopify: bool
+    # The store's <name>.myshopify.com origin, if it told us
+    myshopify_domain: Optional[str] = None
+    # The first products.json page, downloaded while checking the store. Only handed
+    # out by the resolve() call that downloaded it, never cached.
+    first_page: Optional[Dict] = None
+    # Whether either probe got a 2xx; anything else may be a passing outage, so it
+    # isn't worth caching
+    conclusive: bool = True
+
+
+def store_origin(website_url: str) -> str:
+    """Scheme and host of a store URL, which is what identities are cached under"""
+    if not website_url.startswith(("http://", "https://")):
+        website_url = "https://" + website_url
+    parsed = urlparse(website_url.strip())
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+def is_shopify_response(response: httpx.Response) -> bool:
+    headers = response.headers
+    if any(name in headers for name in SHOPIFY_HEADERS):
+        return True
+    return "shopify" in headers.get("server", "").lower() or "shopify" in headers.get("powered-by", "").lower()
+
+
+def _json(response: Optional[httpx.Response]) -> Dict:
+    if response is None or response.status_code != 200:
+        return {}
+    try:
+        data = response.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class StoreResolver:
+    """Find out what a store URL really is, once per host.
+
+    Validating a URL used to cost a blocking HEAD request plus, on many stores, a
+    full download of the first products.json page that was then thrown away and
+    downloaded again by the scrape. Now we request that first page and the store's
+    tiny meta.json at the same time. Together they tell us whether the host is a
+    Shopify store, which domain it redirects to and its .myshopify.com origin, and
+    the page itself is handed to the product fetcher instead of being wasted.
+
+    Identities (minus the page) are cached per host for `ttl` seconds, so checking
+    a store we've seen recently costs no requests at all. Only identities backed by
+    a successful response are cached, so a store that happened to answer 502 or 429
+    isn't taken for "not Shopify" for the next hour.
+    """
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        ttl: float = STORE_IDENTITY_TTL,
+        max_size: int = STORE_IDENTITY_CACHE_SIZE,
+        rate_limiter: Optional[RateLimiter] = None,
+        policy: RetryPolicy = DEFAULT_POLICY,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._client = client
+        self.ttl = ttl
+        self.max_size = max_size
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.policy = policy
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker
+        self._identities: Dict[str, Tuple[StoreIdentity, float]] = {}
+        # Shared by the server's loop and the background loop of the sync wrappers
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    def peek(self, website_url: str) -> Optional[StoreIdentity]:
+        """The cached identity of a store, without touching the network"""
+        origin = store_origin(website_url)
+        with self._lock:
+            cached = self._identities.get(origin)
+            if cached is None:
+                return None
+            identity, expires_at = cached
+            if time.monotonic() >= expires_at:
+                del self._identities[origin]
+                return None
+            return identity
+
+    def canonical_url(self, website_url: str) -> str:
+        """The canonical URL of a store if we know it, otherwise the URL itself"""
+        identity = self.peek(website_url)
+        return identity.website_url if identity is not None else website_url
+
+    async def resolve(self, website_url: str) -> StoreIdentity:
+        """Identify a store, from the cache if possible
+
+        Raises httpx.HTTPError if the host can't be reached at all (which isn't cached).
+        """
+        identity = self.peek(website_url)
+        if identity is not None:
+            return identity
+
+        origin = store_origin(website_url)
+        identity = await self._identify(origin)
+        if not identity.conclusive:
+            logger.info(f"Not caching what {origin} turned out to be, neither probe succeeded")
+            return identity
+
+        # Remember it under the host we were given and the one it redirected to
+        cached = replace(identity, first_page=None)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._identities[origin] = (cached, expires_at)
+            self._identities[store_origin(identity.website_url)] = (cached, expires_at)
+            while len(self._identities) > self.max_size:
+                del self._identities[next(iter(self._identities))]
+        return identity
+
+    def forget(self, website_url: str) -> None:
+        with self._lock:
+            self._identities.pop(store_origin(website_url), None)
+
+    async def _identify(self, origin: str) -> StoreIdentity:
+        products_url = f"{origin}/products.json?page=1&limit={PRODUCTS_PAGE_SIZE}"
+        products, meta = await asyncio.gather(
+            self._get(products_url), self._get(f"{origin}/meta.json"), return_exceptions=True
+        )
+        if isinstance(products, BaseException) and isinstance(meta, BaseException):
+            raise products
+        responses = [r for r in (products, meta) if isinstance(r, httpx.Response)]
+        products = products if isinstance(products, httpx.Response) else None
+        meta_data = _json(meta if isinstance(meta, httpx.Response) else None)
+
+        # The products page is the one that counts for redirects, like it will for the scrape
+        final_url = (products if products is not None else responses[0]).url
+        netloc = final_url.host if final_url.port is None else f"{final_url.host}:{final_url.port}"
+        website_url = f"{final_url.scheme}://{netloc}/"
+
+        first_page = _json(products)
+        if not isinstance(first_page.get("products"), list):
+            first_page = None
+
+        myshopify_domain = meta_data.get("myshopify_domain")
+        if not myshopify_domain and final_url.host.endswith(".myshopify.com"):
+            myshopify_domain = final_url.host
+
+        is_shopify = (
+            first_page is not None
+            or bool(myshopify_domain)
+            or any(is_shopify_response(response) for response in responses)
+        )
+        if website_url.rstrip("/") != origin:
+            logger.info(f"{origin} redirects to {website_url}")
+
+        return StoreIdentity(
+            website_url=website_url,
+            is_shopify=is_shopify,
+            myshopify_domain=myshopify_domain,
+            first_page=first_page,
+            conclusive=any(response.is_success for response in responses),
+        )
+
+    async def _get(self, url: str) -> httpx.Response:
+        """GET a URL, retrying it according to the rate limiter and the retry policy"""
+        return await get_with_retries(
+            lambda: guarded_get(
+                self.client, url, self.rate_limiter, self.circuit_breaker, self.policy, follow_redirects=True
+            ),
+            url,
+            self.policy,
+        )
+
+
+# Shared by every request, so the cache is too
+store_resolver = StoreResolver()
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+# The sync wrappers (ShopifyService, CompetitorService) used to be plain blocking
+# code. They now delegate to the async services, so they need an event loop to
+# run on. Rather than spinning up a fresh loop per call with asyncio.run(), which
+# would throw away the pooled connections every time, all sync callers share one
+# background loop living in a daemon thread.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="async-bridge", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the shared background loop and wait for its result"""
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from inside the background loop; await the coroutine instead")
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
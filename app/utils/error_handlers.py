@@ -2,6 +2,7 @@ from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from http import HTTPStatus
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +25,8 @@ SHOPIFY_SPECIFIC_ERRORS = {
     "products_not_found": "Couldn't find any products. This might not be a Shopify store, or it could be using a custom storefront API.",
     "access_denied": "The store seems to be blocking our requests. Some Shopify stores have stricter security settings.",
     "rate_limited": "We've been rate limited by the store. This happens when we make too many requests too quickly.",
-    "invalid_store": "This doesn't appear to be a valid Shopify store. Double-check the URL and try again."
+    "invalid_store": "This doesn't appear to be a valid Shopify store. Double-check the URL and try again.",
+    "unavailable": "The store has been failing or blocking our requests, so we're giving it a break. Try again in a little while."
 }
 
 
@@ -48,14 +50,26 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+def is_default_detail(exc: StarletteHTTPException) -> bool:
+    try:
+        return exc.detail == HTTPStatus(exc.status_code).phrase
+    except ValueError:
+        return False
+
+
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """Handle HTTP exceptions with friendly messages"""
     status_code = exc.status_code
-    error_msg = FRIENDLY_ERROR_MESSAGES.get(status_code, str(exc.detail))
+    error_msg = str(exc.detail)
     
-    # Add more context for specific errors
-    if status_code == 404 and "shopify" in str(request.url).lower():
-        error_msg += " If you're looking for a Shopify store, make sure the URL is correct."
+    # Only replace Starlette's bare status phrase; a detail the route gave
+    # (e.g. "Job not found") says more than the generic message
+    if is_default_detail(exc) and status_code in FRIENDLY_ERROR_MESSAGES:
+        error_msg = FRIENDLY_ERROR_MESSAGES[status_code]
+        
+        # Add more context for specific errors
+        if status_code == 404 and "shopify" in str(request.url).lower():
+            error_msg += " If you're looking for a Shopify store, make sure the URL is correct."
     
     logger.error(f"HTTP error {status_code}: {str(exc.detail)}")
     return JSONResponse(
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def utcnow() -> datetime:
+    """Current time as a naive UTC datetime, the form we store in the database"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp from Shopify into a naive UTC datetime
+
+    Shopify returns timestamps with the store's UTC offset (e.g. 2024-01-15T10:20:30-05:00),
+    so they have to be normalised before they can be compared or stored.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,80 @@
+"""Analyze many Shopify stores from the command line.
+
+Store URLs come from the arguments and/or a file with one URL per line ("-" reads
+stdin). Results are written to stdout as NDJSON, one line per store as it
+finishes, and saved to the database (DATABASE_URL) in batches.
+
+    python batch.py --file stores.txt --concurrency 32 > results.ndjson
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.database.database import SessionLocal
+from app.database.migrations import migrate_database
+from app.database.repository import InsightsRepository
+from app.services.batch import (
+    BatchAnalyzer, batch_item, resolve_shopify_store, save_in_batches,
+    BATCH_CONCURRENCY, BATCH_PER_HOST_CONCURRENCY, BATCH_SAVE_SIZE
+)
+from app.services.http_client import close_async_client
+
+
+def read_urls(args) -> list:
+    urls = list(args.urls)
+    if args.file:
+        handle = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        with handle:
+            urls.extend(line.strip() for line in handle if line.strip() and not line.startswith("#"))
+    return urls
+
+
+async def run(args) -> int:
+    analyzer = BatchAnalyzer(concurrency=args.concurrency, per_host=args.per_host, resolve=resolve_shopify_store)
+    results = analyzer.run(read_urls(args))
+
+    db = None
+    if not args.no_save:
+        db = SessionLocal()
+        results = save_in_batches(results, InsightsRepository(db), batch_size=args.save_size)
+
+    failed = 0
+    try:
+        async for result in results:
+            failed += result.error is not None
+            sys.stdout.write(batch_item(result).model_dump_json() + "\n")
+            sys.stdout.flush()
+    finally:
+        await results.aclose()
+        if db is not None:
+            db.close()
+        await close_async_client()
+
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Analyze many Shopify stores and print NDJSON results")
+    parser.add_argument("urls", nargs="*", help="Store URLs")
+    parser.add_argument("-f", "--file", help="File with one store URL per line, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Stores analyzed at the same time")
+    parser.add_argument("--per-host", type=int, default=BATCH_PER_HOST_CONCURRENCY, help="Stores per host analyzed at the same time")
+    parser.add_argument("--save-size", type=int, default=BATCH_SAVE_SIZE, help="Stores saved per database transaction")
+    parser.add_argument("--no-save", action="store_true", help="Don't save the results to the database")
+    args = parser.parse_args()
+
+    if not args.urls and not args.file:
+        parser.error("give at least one store URL or --file")
+
+    # Logs go to stderr so stdout stays valid NDJSON
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    if not args.no_save:
+        migrate_database()
+
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
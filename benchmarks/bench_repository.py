@@ -0,0 +1,99 @@
+"""Benchmark for persisting a large store through InsightsRepository.
+
+Compares the old one-ORM-object-per-row path with the bulk Core insert path and
+prints rows per second for each. Runs against a throwaway SQLite file by default;
+point BENCH_DATABASE_URL at a scratch MySQL database to benchmark that instead
+(its tables are dropped, so never use the application's database).
+
+    python benchmarks/bench_repository.py --products 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import Base, Store, Product as ProductRow
+from app.database.repository import InsightsRepository
+from app.models.insights import Product, ShopifyInsights
+
+
+def make_insights(url: str, count: int) -> ShopifyInsights:
+    products = [
+        Product(
+            id=str(i),
+            title=f"Product {i}",
+            handle=f"product-{i}",
+            description="<p>Lorem ipsum dolor sit amet</p>",
+            price="19.99",
+            compare_at_price="29.99",
+            available=True,
+            tags=["tag-a", "tag-b"],
+            images=[f"https://cdn.example.com/{i}.jpg"],
+            variants=[{"id": i, "price": "19.99", "available": True}],
+            url=f"{url}products/product-{i}",
+        )
+        for i in range(count)
+    ]
+    return ShopifyInsights(store_url=url, store_name="Benchmark Store", products=products)
+
+
+def save_one_by_one(db, insights: ShopifyInsights) -> None:
+    """The previous implementation: one db.add() per product"""
+    store = Store(url=insights.store_url, name=insights.store_name)
+    db.add(store)
+    db.flush()
+    for product_data in insights.products:
+        db.add(ProductRow(
+            store_id=store.id,
+            product_id=product_data.id,
+            title=product_data.title,
+            handle=product_data.handle,
+            description=product_data.description,
+            price=product_data.price,
+            compare_at_price=product_data.compare_at_price,
+            available=product_data.available,
+            tags=product_data.tags,
+            images=product_data.images,
+            variants=product_data.variants,
+            url=product_data.url,
+        ))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        engine = create_engine(url)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        runs = [
+            ("one-by-one ORM", lambda db, insights: save_one_by_one(db, insights)),
+            ("bulk Core insert", lambda db, insights: InsightsRepository(db, batch_size=args.batch_size).create_store(insights)),
+        ]
+        for number, (name, save) in enumerate(runs):
+            insights = make_insights(f"https://store-{number}.example.com/", args.products)
+            db = Session()
+            start = time.perf_counter()
+            save(db, insights)
+            elapsed = time.perf_counter() - start
+            db.close()
+            print(f"{name:>18}: {args.products} rows in {elapsed:.2f}s ({args.products / elapsed:,.0f} rows/s)")
+
+        Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
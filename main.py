@@ -5,9 +5,11 @@ import os
 import logging
 
 from app.routers import insights
-from app.database.database import engine
-from app.database.models import Base
-from app.utils.error_handlers import setup_error_handlers
+from app.database.migrations import migrate_database
+from app.services.circuit_breaker import circuit_breaker
+from app.services.http_client import http_clients
+from app.services.jobs import job_queue
+from app.utils.error_handlers import http_exception_handler, setup_error_handlers
 
 # Configure logging
 logging.basicConfig(
@@ -19,8 +21,8 @@ logging.basicConfig(
     ]
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables, and bring ones from an older version up to date
+migrate_database()
 
 app = FastAPI(
     title="ShopInsight",
@@ -41,18 +43,47 @@ setup_error_handlers(app)
 # Include routers
 app.include_router(insights.router)
 
+@app.on_event("startup")
+async def open_http_client():
+    """Open the pooled HTTP client every service shares for the lifetime of the app"""
+    await http_clients.open()
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the background job workers, resuming jobs a previous run left unfinished"""
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Close the pooled HTTP client so connections are released cleanly"""
+    await http_clients.close()
+
 @app.get("/")
 async def root():
     return RedirectResponse(url="/static/index.html")
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for monitoring"""
-    return {"status": "healthy", "version": "1.0.0"}
+    """Health check endpoint for monitoring
+    
+    Also lists the stores whose circuit breaker isn't closed, i.e. stores we have
+    stopped sending requests to because they kept failing or blocking us.
+    """
+    return {"status": "healthy", "version": "1.0.0", "circuit_breakers": circuit_breaker.snapshot()}
 
 @app.exception_handler(404)
-async def custom_404_handler(request: Request, _):
-    """Custom 404 page handler"""
+async def custom_404_handler(request: Request, exc):
+    """Custom 404 page handler
+    
+    API clients get the same JSON as for every other error instead, so details
+    like "Job not found" reach them.
+    """
+    if request.url.path.startswith("/api/"):
+        return await http_exception_handler(request, exc)
     with open(os.path.join(static_dir, "404.html"), "r") as f:
         content = f.read()
     return HTMLResponse(content=content, status_code=404)
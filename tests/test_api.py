@@ -0,0 +1,267 @@
+import json
+import time
+import unittest
+import os
+import sys
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.database import get_db
+from app.database.models import Base, Product as ProductRow
+from app.database.repository import InsightsRepository, JobRepository
+from app.models.insights import FAQ, Product, ShopifyInsights
+from app.routers import insights as insights_router
+from app.services.batch import BatchAnalyzer, resolve_shopify_store
+from app.services.jobs import job_queue
+from app.services.similarity import SimilarityIndexCache
+from app.services.store_resolver import StoreIdentity, store_resolver
+
+# Importing main logs to shopify_insights.log and migrates the default database,
+# neither of which the tests should touch
+with patch("logging.basicConfig"), patch("app.database.migrations.migrate_database"):
+    from main import app
+
+
+def make_products(count, title="Shirt"):
+    return [
+        Product(
+            id=str(i), title=f"{title} {i}", handle=f"shirt-{i}", price=f"{10 + i}.00", available=i % 2 == 0,
+            tags=["cotton"], updated_at=f"2024-01-{i + 1:02d}T00:00:00Z"
+        )
+        for i in range(count)
+    ]
+
+
+async def resolve(website_url):
+    """Stands in for the store resolver; missing.com is down and blog.com isn't Shopify"""
+    host = urlparse(website_url if "://" in website_url else "https://" + website_url).netloc
+    if host == "missing.com":
+        raise httpx.ConnectError("connection refused")
+    return StoreIdentity(website_url=f"https://{host}/", is_shopify=host != "blog.com")
+
+
+class FakeShopifyService:
+    """Serves `pages` as the store's catalog, so no request leaves the test"""
+
+    pages = [make_products(3)]
+
+    def __init__(self, website_url, **kwargs):
+        self.website_url = website_url.rstrip("/") + "/"
+
+    async def get_all_insights(self):
+        return ShopifyInsights(
+            store_url=self.website_url,
+            store_name=urlparse(self.website_url).netloc,
+            products=[product for page in self.pages for product in page],
+            faqs=[FAQ(question="Do you ship?", answer="Yes")]
+        )
+
+    async def iter_product_pages(self):
+        for page in self.pages:
+            yield page
+
+    async def iter_updated_product_pages(self, since):
+        async for page in self.iter_product_pages():
+            yield page
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        # Requests, streams and jobs all use the database from other threads
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+
+        def get_test_db():
+            db = self.session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = get_test_db
+        self.addCleanup(app.dependency_overrides.clear)
+        for patcher in [
+            patch.object(store_resolver, "resolve", resolve),
+            patch.object(insights_router, "AsyncShopifyService", FakeShopifyService),
+            patch("app.services.batch.AsyncShopifyService", FakeShopifyService),
+            patch.object(insights_router, "SessionLocal", self.session_factory),
+            patch.object(insights_router, "similarity_index", SimilarityIndexCache(self.session_factory)),
+            patch.object(insights_router, "batch_analyzer", BatchAnalyzer(resolve=resolve_shopify_store)),
+            patch.object(job_queue, "session_factory", self.session_factory),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+        self.addCleanup(self.db.close)
+
+    def save_store(self, host, products):
+        return InsightsRepository(self.db).save_insights(
+            ShopifyInsights(store_url=f"https://{host}/", store_name=host, products=products)
+        )
+
+    def test_stream_products_writes_one_product_per_line(self):
+        with patch.object(FakeShopifyService, "pages", [make_products(3), make_products(2, "Hat")]):
+            response = self.client.post("/api/v1/insights/products/stream", json={"website_url": "https://store.com"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        self.assertTrue(response.text.endswith("\n"))
+        lines = response.text.splitlines()
+        self.assertEqual([Product(**json.loads(line)).title for line in lines], ["Shirt 0", "Shirt 1", "Shirt 2", "Hat 0", "Hat 1"])
+        # The second page's products replaced the first's with the same ids
+        self.assertEqual(self.db.query(ProductRow).count(), 3)
+
+    def test_stream_products_rejects_stores_before_streaming(self):
+        response = self.client.post("/api/v1/insights/products/stream", json={"website_url": "https://blog.com"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "The provided URL is not a Shopify store"})
+
+        response = self.client.post("/api/v1/insights/products/stream", json={"website_url": "not a url"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_refresh_counts_added_and_changed_products(self):
+        response = self.client.post("/api/v1/insights/products/refresh", json={"website_url": "https://store.com"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["added"], response.json()["changed"]), (3, 0))
+        self.assertEqual(response.json()["store_url"], "https://store.com/")
+
+        products = make_products(3)
+        products[1].price = "99.00"
+        with patch.object(FakeShopifyService, "pages", [products]):
+            response = self.client.post("/api/v1/insights/products/refresh", json={"website_url": "https://store.com"})
+        self.assertEqual((response.json()["added"], response.json()["changed"]), (0, 1))
+
+    def test_stored_insights_scrape_missing_stores_once(self):
+        response = self.client.get("/api/v1/stores/store.com/insights")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["store_url"], "https://store.com/")
+        self.assertEqual(len(response.json()["products"]), 3)
+
+        with patch.object(FakeShopifyService, "get_all_insights", side_effect=AssertionError("scraped again")):
+            for url in ["/api/v1/stores/store.com/insights", "/api/v1/stores/https://store.com/faqs"]:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get("/api/v1/stores/store.com/faqs").json(), [{"question": "Do you ship?", "answer": "Yes"}])
+            for url in ["social-handles", "contact-info", "important-links"]:
+                self.assertEqual(self.client.get(f"/api/v1/stores/store.com/{url}").status_code, 200)
+
+    def test_stored_routes_return_json_errors(self):
+        response = self.client.get("/api/v1/stores/missing.com/insights")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"detail": "Website not found or not accessible"})
+
+        response = self.client.get("/api/v1/stores/blog.com/faqs")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "The provided URL is not a Shopify store"})
+
+        self.assertEqual(self.client.get("/api/v1/stores/store.com/insights?max_age=-1").status_code, 422)
+
+    def test_list_products_pages_and_filters(self):
+        self.save_store("store.com", make_products(5))
+
+        response = self.client.get("/api/v1/stores/store.com/products?limit=2")
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual([product["id"] for product in first["products"]], ["0", "1"])
+
+        second = self.client.get(f"/api/v1/stores/store.com/products?limit=2&cursor={first['next_cursor']}").json()
+        self.assertEqual([product["id"] for product in second["products"]], ["2", "3"])
+
+        filtered = self.client.get("/api/v1/stores/store.com/products?available=true&min_price=11&tag=cotton").json()
+        self.assertEqual([product["id"] for product in filtered["products"]], ["2", "4"])
+        self.assertIsNone(filtered["next_cursor"])
+
+        self.assertEqual(self.client.get("/api/v1/stores/store.com/products?q=SHIRT 3").json()["products"][0]["id"], "3")
+
+    def test_list_products_validates_parameters(self):
+        self.save_store("store.com", make_products(1))
+
+        for query in ["limit=0", "limit=251", "min_price=-1", "available=maybe"]:
+            self.assertEqual(self.client.get(f"/api/v1/stores/store.com/products?{query}").status_code, 422, query)
+
+        response = self.client.get("/api/v1/stores/store.com/products?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+    def test_similar_stores(self):
+        self.save_store("store.com", make_products(5))
+        self.save_store("twin.com", make_products(5))
+        self.save_store("other.com", [Product(id="1", title="Garden hose", handle="hose", price="500.00")])
+
+        response = self.client.get("/api/v1/stores/store.com/similar?limit=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([store["store_url"] for store in response.json()], ["https://twin.com/"])
+
+        self.assertEqual(self.client.get("/api/v1/stores/store.com/similar?limit=0").status_code, 422)
+
+    def test_jobs_run_in_the_background(self):
+        response = self.client.post("/api/v1/jobs/insights", json={"website_url": "https://store.com"})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+
+        deadline = time.monotonic() + 5
+        status = response.json()["status"]
+        while status not in (JobRepository.SUCCEEDED, JobRepository.FAILED) and time.monotonic() < deadline:
+            time.sleep(0.01)
+            status = self.client.get(f"/api/v1/jobs/{job_id}").json()["status"]
+        self.assertEqual(status, JobRepository.SUCCEEDED)
+
+        result = self.client.get(f"/api/v1/jobs/{job_id}/result").json()
+        self.assertEqual([insights["store_url"] for insights in result["insights"]], ["https://store.com/"])
+
+    def test_unfinished_and_unknown_jobs(self):
+        job = JobRepository(self.db).create_job("insights", "https://store.com/")
+
+        response = self.client.get(f"/api/v1/jobs/{job.id}/result")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {"detail": "Job is queued"})
+
+        for url in ["/api/v1/jobs/nope", "/api/v1/jobs/nope/result"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {"detail": "Job not found"})
+
+        self.assertEqual(self.client.post("/api/v1/jobs/competitors?limit=6", json={"website_url": "https://store.com"}).status_code, 422)
+
+    def test_batch_streams_a_line_per_store(self):
+        response = self.client.post("/api/v1/insights/batch", json={"website_urls": ["store.com", "missing.com", "store.com"]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        items = {item["website_url"]: item for item in map(json.loads, response.text.splitlines())}
+        self.assertEqual(set(items), {"https://store.com/", "https://missing.com"})
+        self.assertEqual(items["https://store.com/"]["status"], "ok")
+        self.assertEqual(items["https://missing.com"], {
+            "website_url": "https://missing.com", "status": "error", "insights": None,
+            "error": "Website not found or not accessible"
+        })
+        self.assertIsNotNone(InsightsRepository(self.db).get_store_by_url("https://store.com/"))
+
+        self.assertEqual(self.client.post("/api/v1/insights/batch", json={"website_urls": []}).status_code, 422)
+
+    def test_unknown_pages_get_the_html_page_and_api_paths_json(self):
+        response = self.client.get("/no-such-page")
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(response.headers["content-type"].startswith("text/html"))
+
+        response = self.client.get("/api/v1/no-such-route")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("couldn't find", response.json()["detail"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+import os
+import sys
+from collections import Counter
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import Base, Store
+from app.models.insights import ShopifyInsights
+from app.database.repository import InsightsRepository
+from app.services.batch import BatchAnalyzer, BatchResult, save_in_batches
+from app.services.rate_limiter import RateLimiter
+from app.services.store_resolver import StoreIdentity
+
+
+def handler(request):
+    if request.url.path.endswith((".json", ".xml")) or "/pages/" in request.url.path:
+        return httpx.Response(404)
+    return httpx.Response(200, text=f"<title>{request.url.host}</title>")
+
+
+def make_session():
+    # Saves run in a worker thread, so every thread has to see the same in-memory database
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+class TestBatchAnalyzer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_limits_and_persistence(self):
+        in_flight = Counter()
+        peaks = Counter()
+
+        async def resolve(website_url):
+            # Runs while the store holds its global and per-host slots
+            host = urlparse(website_url).netloc
+            in_flight[host] += 1
+            in_flight["*"] += 1
+            peaks[host] = max(peaks[host], in_flight[host])
+            peaks["*"] = max(peaks["*"], in_flight["*"])
+            await asyncio.sleep(0.01)
+            in_flight[host] -= 1
+            in_flight["*"] -= 1
+            if host == "broken.com":
+                raise ValueError("not a store")
+            return StoreIdentity(website_url=website_url, is_shopify=True)
+
+        urls = [f"https://busy.com/{i}" for i in range(4)] + [f"store{i}.com" for i in range(8)]
+        urls += ["broken.com", "store0.com"]
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        # No response cache, so nothing is written to (or read from) ./response_cache.db
+        analyzer = BatchAnalyzer(concurrency=3, per_host=2, resolve=resolve, client=client, use_cache=False,
+                                 rate_limiter=RateLimiter(rate=0))
+
+        db = make_session()
+        repository = InsightsRepository(db, batch_size=7)
+
+        results = [result async for result in save_in_batches(analyzer.run(urls), repository, batch_size=4)]
+
+        self.assertEqual(len(results), 13)  # store0.com only once
+        self.assertEqual([r.website_url for r in results if r.error], ["https://broken.com"])
+        self.assertEqual(peaks["*"], 3)
+        self.assertEqual(peaks["busy.com"], 2)
+        self.assertEqual(db.query(Store).count(), 12)
+        self.assertEqual(analyzer._hosts._semaphores, {})
+        db.close()
+
+    async def test_a_store_that_cannot_be_saved_only_fails_itself(self):
+        class FlakyRepository(InsightsRepository):
+            def save_insights(self, insights, commit=True):
+                if insights.store_url == "https://bad.com/":
+                    raise ValueError("bad row")
+                return super().save_insights(insights, commit=commit)
+
+        async def analyzed():
+            for host in ("one.com", "bad.com", "two.com"):
+                url = f"https://{host}/"
+                yield BatchResult(website_url=url, insights=ShopifyInsights(store_url=url, store_name=host))
+            yield BatchResult(website_url="https://down.com/", error="not a store")
+
+        db = make_session()
+        results = [result async for result in save_in_batches(analyzed(), FlakyRepository(db), batch_size=3)]
+
+        self.assertEqual(
+            [(r.website_url, r.error is None) for r in results],
+            [("https://one.com/", True), ("https://bad.com/", False), ("https://two.com/", True), ("https://down.com/", False)]
+        )
+        self.assertEqual(sorted(store.url for store in db.query(Store)), ["https://one.com/", "https://two.com/"])
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import time
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.rate_limiter import RateLimiter
+from app.services.retry_policy import RetryPolicy
+from app.services.shopify_service import AsyncShopifyService
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        breaker.record_failure("store.com")
+        breaker.record_failure("store.com")
+        breaker.record_response("store.com", 200)  # a success starts the count again
+        breaker.record_failure("store.com")
+        breaker.record_response("store.com", 403)
+        self.assertEqual(breaker.state("store.com"), "closed")
+
+        breaker.record_response("store.com", 502)
+        self.assertEqual(breaker.state("store.com"), "open")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request("store.com")
+        breaker.before_request("other.com")
+        self.assertEqual(list(breaker.snapshot()), ["store.com"])
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure("store.com")
+        time.sleep(0.02)
+
+        # Only one request gets through to probe the host
+        breaker.before_request("store.com")
+        self.assertEqual(breaker.state("store.com"), "half-open")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request("store.com")
+
+        # A failed probe opens it again, a successful one closes it
+        breaker.record_failure("store.com")
+        self.assertEqual(breaker.state("store.com"), "open")
+        time.sleep(0.02)
+        breaker.before_request("store.com")
+        breaker.record_response("store.com", 200)
+        self.assertEqual(breaker.state("store.com"), "closed")
+        self.assertEqual(breaker.snapshot(), {})
+
+
+class TestServiceCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+
+    async def test_dead_store_fails_fast(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request.url.path)
+            raise httpx.ConnectError("connection refused", request=request)
+
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        service = AsyncShopifyService(
+            "https://store.com",
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            use_cache=False,
+            rate_limiter=RateLimiter(rate=0),
+            policy=RetryPolicy(attempts=5, backoff_base=0.001, hedge_after=0, time_budget=0),
+            circuit_breaker=breaker,
+        )
+
+        with self.assertRaises(CircuitOpenError):
+            await service.get_all_insights()
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(breaker.state("store.com"), "open")
+
+    async def test_sections_cut_off_by_the_breaker_are_incomplete(self):
+        def handler(request):
+            if request.url.path == "/":
+                return httpx.Response(200, text="<title>Store</title><p>hello@store.com</p>")
+            return httpx.Response(404)
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        service = AsyncShopifyService(
+            "https://store.com",
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            use_cache=False,
+            rate_limiter=RateLimiter(rate=0),
+            policy=RetryPolicy(attempts=0, hedge_after=0, time_budget=0),
+            circuit_breaker=breaker,
+        )
+        # The homepage made it, then the store started failing
+        await service.get_homepage_analysis()
+        breaker.record_failure("store.com")
+
+        insights = await service.get_all_insights()
+
+        self.assertEqual(insights.store_name, "Store")
+        for section in ["products", "privacy_policy", "return_refund_policy", "faqs", "contact_info", "about_brand"]:
+            self.assertIn(section, insights.incomplete)
+        self.assertNotIn("store_name", insights.incomplete)
+        self.assertNotIn("social_handles", insights.incomplete)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.competitor_service import AsyncCompetitorService
+from app.services.rate_limiter import RateLimiter
+from app.services.search import FixtureProvider
+from app.services.store_resolver import StoreResolver
+
+SHOPIFY_STORES = {"alpha.test", "beta.test", "gamma.test", "delta.test"}
+
+SEARCH_RESULTS = {
+    "brand competitors": [{"title": "Alpha vs Beta", "url": "reviews.test/alpha-vs-beta"}],
+    "brands like brand": [{"title": "Gamma alternative Delta", "url": "blog.test/gamma"}],
+}
+for name in ("alpha", "beta", "gamma", "delta"):
+    SEARCH_RESULTS[f"{name} official website"] = [
+        {"title": name.capitalize(), "url": f"{name}.test"},
+        {"title": f"{name.capitalize()} - Wikipedia", "url": "wikipedia.test/wiki/" + name},
+    ]
+
+
+class TestCompetitorPipeline(unittest.IsolatedAsyncioTestCase):
+
+    def make_service(self, broken=()):
+        self.analyzed = []
+
+        def handler(request):
+            host = request.url.host
+            if host not in SHOPIFY_STORES:
+                return httpx.Response(404)
+            if request.url.path == "/products.json":
+                return httpx.Response(200, json={"products": []})
+            if request.url.path == "/":
+                self.analyzed.append(host)
+                if host in broken:
+                    raise RuntimeError("store fell over")
+                return httpx.Response(200, text=f"<title>{host}</title>")
+            return httpx.Response(404)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+        limiter = RateLimiter(rate=0)
+        resolver = StoreResolver(client=client, rate_limiter=limiter, circuit_breaker=CircuitBreaker())
+        return AsyncCompetitorService(
+            "https://brand.com", client=client, resolver=resolver, rate_limiter=limiter, use_cache=False,
+            search=FixtureProvider(SEARCH_RESULTS)
+        )
+
+    async def test_stops_once_limit_stores_are_analyzed(self):
+        service = self.make_service()
+        insights = await service.get_competitors_insights(limit=2)
+
+        urls = [i.store_url for i in insights]
+        self.assertEqual(len(urls), 2)
+        self.assertEqual(len(set(urls)), 2)
+        self.assertTrue(all(urlparse_host(url) in SHOPIFY_STORES for url in urls))
+        self.assertLessEqual(len(self.analyzed), 2)
+
+    async def test_failed_competitor_frees_its_slot(self):
+        service = self.make_service(broken={"alpha.test"})
+        insights = await service.get_competitors_insights(limit=3)
+
+        self.assertEqual(len(insights), 3)
+        self.assertNotIn("https://alpha.test/", [i.store_url for i in insights])
+
+
+def urlparse_host(url):
+    return httpx.URL(url).host
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+
+from bs4 import BeautifulSoup
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.homepage import analyze_homepage
+
+HOMEPAGE = """
+<html><head><title>Acme | Official Site</title><meta property="og:site_name" content="Acme"></head>
+<body>
+  <a href="/pages/contact">Contact</a>
+  <a href="/pages/track">Where is my order?</a>
+  <a href="/products/red-shoe">Red shoe</a>
+  <a href="/collections/all/products/red-shoe">Red shoe again</a>
+  <p>Write to hello@acme.com</p>
+  <script>var ignored = "spam@script.com";</script>
+  <div class="address">123 Main Street, Springfield</div>
+  <a href="https://Instagram.com/acme">Instagram</a>
+  <a href="https://other.com/page">Elsewhere</a>
+</body></html>
+"""
+
+
+class TestHomepageAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        soup = BeautifulSoup(HOMEPAGE, "html.parser")
+        self.analysis = analyze_homepage(soup, "https://acme.com/")
+
+    def test_store_name_sources(self):
+        self.assertEqual(self.analysis.site_name, "Acme")
+        self.assertEqual(self.analysis.title, "Acme | Official Site")
+
+    def test_anchor_results(self):
+        self.assertEqual(self.analysis.product_handles, ["red-shoe"])
+        self.assertEqual(
+            [(s.platform, s.url) for s in self.analysis.social_handles],
+            [("instagram", "https://instagram.com/acme")],
+        )
+        self.assertEqual(
+            [(link.name, link.url) for link in self.analysis.important_links],
+            [
+                ("Contact Us", "https://acme.com/pages/contact"),
+                ("Order Tracking", "https://acme.com/pages/track"),
+                ("Red shoe", "https://acme.com/products/red-shoe"),
+                ("Red shoe again", "https://acme.com/collections/all/products/red-shoe"),
+            ],
+        )
+
+    def test_contact_sources(self):
+        self.assertIn("hello@acme.com", self.analysis.text)
+        self.assertNotIn("spam@script.com", self.analysis.text)
+        self.assertEqual(self.analysis.address, "123 Main Street, Springfield")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+import os
+import sys
+from collections import Counter
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.http_client import HostLimitedTransport, HttpClientManager
+
+
+class TestHttpClient(unittest.IsolatedAsyncioTestCase):
+
+    async def test_per_host_limit(self):
+        in_flight = Counter()
+        peaks = Counter()
+
+        async def handler(request):
+            host = request.url.host
+            in_flight[host] += 1
+            peaks[host] = max(peaks[host], in_flight[host])
+            await asyncio.sleep(0.01)
+            in_flight[host] -= 1
+            return httpx.Response(200, text="ok")
+
+        transport = HostLimitedTransport(httpx.MockTransport(handler), per_host=2)
+        async with httpx.AsyncClient(transport=transport) as client:
+            urls = [f"https://busy.com/{i}" for i in range(6)] + [f"https://other{i}.com/" for i in range(3)]
+            responses = await asyncio.gather(*(client.get(url) for url in urls))
+
+        self.assertTrue(all(response.text == "ok" for response in responses))
+        self.assertEqual(peaks["busy.com"], 2)
+        self.assertEqual(transport._semaphores, {})
+
+    async def test_slot_is_held_until_the_body_is_closed(self):
+        class Body(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield b"ok"
+
+        transport = HostLimitedTransport(httpx.MockTransport(lambda request: httpx.Response(200, stream=Body())), per_host=1)
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://store.com/") as response:
+                self.assertTrue(transport._semaphores["store.com"].locked())
+                self.assertEqual(await response.aread(), b"ok")
+            self.assertEqual(transport._semaphores, {})
+
+    async def test_manager_lifecycle(self):
+        manager = HttpClientManager(max_connections_per_host=4)
+        client = await manager.open()
+
+        self.assertIs(manager.get(), client)
+        self.assertIn("gzip", client.headers["accept-encoding"])
+
+        await manager.close()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(manager.get(), client)
+        await manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
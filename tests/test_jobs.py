@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+import os
+import sys
+from datetime import timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import Base
+from app.database.repository import JobRepository
+from app.services.jobs import JobQueue
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+
+        self.queue = JobQueue(self.session_factory, workers=2)
+
+        async def succeed(params, db):
+            return {"store_urls": [params["website_url"]], "limit": params["limit"]}
+
+        async def fail(params, db):
+            raise ValueError("store is down")
+
+        self.queue.register("ok", succeed)
+        self.queue.register("broken", fail)
+
+    async def asyncTearDown(self):
+        await self.queue.stop()
+        self.db.close()
+
+    async def test_jobs_run_in_the_background(self):
+        await self.queue.start()
+        ok = self.queue.submit(self.db, "ok", "https://store.com/", {"limit": 2})
+        broken = self.queue.submit(self.db, "broken", "https://other.com/")
+        self.assertEqual(ok.status, JobRepository.QUEUED)
+
+        await self.queue.join()
+
+        self.db.expire_all()
+        repository = JobRepository(self.db)
+        self.assertEqual(repository.get_job(ok.id).status, JobRepository.SUCCEEDED)
+        self.assertEqual(repository.get_job(ok.id).result, {"store_urls": ["https://store.com/"], "limit": 2})
+        self.assertEqual(repository.get_job(broken.id).status, JobRepository.FAILED)
+        self.assertEqual(repository.get_job(broken.id).error, "store is down")
+
+    async def test_abandoned_jobs_resume_on_start(self):
+        repository = JobRepository(self.db)
+        job = repository.create_job("ok", "https://store.com/", {"limit": 1})
+        repository.claim(job)
+        # Its process died: no heartbeat for longer than the lease
+        job.heartbeat_at -= timedelta(seconds=self.queue.lease_timeout + 1)
+        self.db.commit()
+
+        await self.queue.start()
+        await self.queue.join()
+
+        self.db.expire_all()
+        self.assertEqual(repository.get_job(job.id).status, JobRepository.SUCCEEDED)
+
+    async def test_jobs_of_live_workers_are_left_alone(self):
+        repository = JobRepository(self.db)
+        job = repository.create_job("ok", "https://store.com/", {"limit": 1})
+        # Another process is running it and sending heartbeats
+        repository.claim(job)
+
+        await self.queue.start()
+        await self.queue.join()
+
+        self.db.expire_all()
+        self.assertEqual(repository.get_job(job.id).status, JobRepository.RUNNING)
+
+    async def test_jobs_abandoned_while_running_are_taken_over(self):
+        self.queue.heartbeat_interval = 0.01
+        self.queue.lease_timeout = 0.02
+        await self.queue.start()
+
+        repository = JobRepository(self.db)
+        job = repository.create_job("ok", "https://store.com/", {"limit": 1})
+        repository.claim(job)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            self.db.expire_all()
+            if repository.get_job(job.id).status == JobRepository.SUCCEEDED:
+                break
+
+        self.assertEqual(repository.get_job(job.id).status, JobRepository.SUCCEEDED)
+
+    async def test_a_job_is_only_claimed_once(self):
+        repository = JobRepository(self.db)
+        job = repository.create_job("ok", "https://store.com/", {"limit": 1})
+
+        self.assertTrue(repository.claim(job))
+        self.assertFalse(repository.claim(job))
+        self.assertEqual(job.status, JobRepository.RUNNING)
+
+    async def test_only_jobs_without_a_recent_heartbeat_are_requeued(self):
+        repository = JobRepository(self.db)
+        live = repository.create_job("ok", "https://store.com/", {"limit": 1})
+        dead = repository.create_job("ok", "https://other.com/", {"limit": 1})
+        repository.claim(live)
+        repository.claim(dead)
+        dead.heartbeat_at -= timedelta(seconds=60)
+        self.db.commit()
+
+        self.assertEqual(repository.requeue_stale(30), [dead.id])
+        self.db.expire_all()
+        self.assertEqual(repository.get_job(dead.id).status, JobRepository.QUEUED)
+        self.assertEqual(repository.get_job(live.id).status, JobRepository.RUNNING)
+        # Back in the queue, so another worker can claim it
+        self.assertTrue(repository.claim(repository.get_job(dead.id)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import dataclasses
+import unittest
+import os
+import sys
+
+from bs4 import BeautifulSoup
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.insights import ContactInfo
+from app.services.homepage import analyze_homepage
+from app.services.parsers import available_parsers, resolve_parser
+from app.services.shopify_service import AsyncShopifyService, POLICY_CONTENT_SELECTORS
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+
+
+def _read(name):
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _extract(page, parser):
+    """Run the extractors that apply to a saved page and return plain data"""
+    soup = BeautifulSoup(_read(page), parser)
+    if page == "homepage.html":
+        analysis = analyze_homepage(soup, "https://acme.com/")
+        # Phone numbers and emails are matched against this exact text, so it is
+        # compared as it is. Only whitespace outside <html> (after the doctype) is
+        # dropped, which lxml doesn't keep and no pattern can match across.
+        contact_info = ContactInfo()
+        AsyncShopifyService._merge_contact_text(analysis.text, contact_info)
+        return {**dataclasses.asdict(analysis), "text": analysis.text.strip(), "contact_info": contact_info.model_dump()}
+    if page == "contact.html":
+        contact_info = ContactInfo()
+        AsyncShopifyService._extract_contact_info(soup, contact_info)
+        return contact_info.model_dump()
+    if page == "faq.html":
+        return [faq.model_dump() for faq in AsyncShopifyService._extract_faqs(soup)]
+    return AsyncShopifyService._extract_main_content(soup, POLICY_CONTENT_SELECTORS)
+
+
+class TestParserBackends(unittest.TestCase):
+    """Every installed backend must give the same results as html.parser on the golden pages"""
+
+    def test_html_parser_is_always_available(self):
+        self.assertIn("html.parser", available_parsers())
+
+    def test_unknown_parser_falls_back(self):
+        self.assertIn(resolve_parser("not-a-parser"), available_parsers())
+
+    def test_backends_agree_on_golden_pages(self):
+        for page in sorted(os.listdir(PAGES_DIR)):
+            expected = _extract(page, "html.parser")
+            self.assertTrue(expected, page)
+            for parser in available_parsers():
+                with self.subTest(page=page, parser=parser):
+                    self.assertEqual(_extract(page, parser), expected)
+
+    def test_contacts_on_golden_pages(self):
+        # Pins what the contact patterns find in theme markup (line breaks, &nbsp;,
+        # numbers split across tags), so a backend change that alters the text shows up
+        homepage = _extract("homepage.html", "html.parser")["contact_info"]
+        self.assertEqual(homepage["emails"], ["hello@acme.com"])
+        self.assertIn("555.987.6543", homepage["phone_numbers"])
+        self.assertIn("555 222 3333", homepage["phone_numbers"])
+
+        contact = _extract("contact.html", "html.parser")
+        self.assertEqual(contact["emails"], ["care@acme.com"])
+        self.assertIn("+44 20 7946 0018", contact["phone_numbers"])
+        self.assertTrue(contact["address"].startswith("Acme Goods Ltd."))
+
+
+if __name__ == '__main__':
+    unittest.main()
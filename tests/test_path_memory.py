@@ -0,0 +1,69 @@
+import threading
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.path_memory import PathMemory
+from app.services.rate_limiter import RateLimiter
+from app.services.shopify_service import AsyncShopifyService
+
+
+class TestPathMemory(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.memory = PathMemory(":memory:")
+        self.requested_paths = []
+
+        def handler(request):
+            self.requested_paths.append(request.url.path)
+            if request.url.path == "/pages/our-story":
+                return httpx.Response(200, text="<main>Our story</main>")
+            return httpx.Response(404)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def _service(self):
+        # A limiter of our own, so other tests' requests to store.com can't slow these down
+        service = AsyncShopifyService("https://store.com", client=self.client, use_cache=False, rate_limiter=RateLimiter())
+        service.path_memory = self.memory
+        return service
+
+    async def test_second_run_goes_straight_to_winning_path(self):
+        self.assertEqual(await self._service().get_about_brand(), "Our story")
+        self.assertEqual(self.memory.winning_path("store.com", "about_brand"), "pages/our-story")
+        self.assertIn("pages/about", self.memory.missing_paths("store.com"))
+
+        self.requested_paths.clear()
+        self.assertEqual(await self._service().get_about_brand(), "Our story")
+        self.assertEqual(self.requested_paths, ["/pages/our-story"])
+
+    async def test_missing_paths_are_not_probed_again(self):
+        self.assertIsNone(await self._service().get_privacy_policy())
+
+        self.requested_paths.clear()
+        self.assertIsNone(await self._service().get_privacy_policy())
+        self.assertEqual(self.requested_paths, [])
+
+    async def test_memory_is_used_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+        mark_missing = self.memory.mark_missing
+
+        def recording_mark_missing(domain, path):
+            threads.append(threading.get_ident())
+            mark_missing(domain, path)
+
+        self.memory.mark_missing = recording_mark_missing
+        self.assertIsNone(await self._service().get_privacy_policy())
+
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.rate_limiter import RateLimiter, parse_retry_after
+from app.services.shopify_service import AsyncShopifyService
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_then_paced(self):
+        limiter = RateLimiter(rate=10, burst=2)
+
+        self.assertEqual(limiter.reserve("a.com"), 0)
+        self.assertEqual(limiter.reserve("a.com"), 0)
+        self.assertAlmostEqual(limiter.reserve("a.com"), 0.1, places=2)
+        self.assertAlmostEqual(limiter.reserve("a.com"), 0.2, places=2)
+        # Hosts don't share buckets
+        self.assertEqual(limiter.reserve("b.com"), 0)
+
+    def test_aimd_and_retry_after(self):
+        limiter = RateLimiter(rate=4, burst=5, min_rate=1.5, max_rate=5, increase=0.5, decrease=0.5)
+
+        limiter.record("a.com", 200)
+        self.assertEqual(limiter.snapshot()["a.com"], 4.5)
+        limiter.record("a.com", 429)
+        self.assertEqual(limiter.snapshot()["a.com"], 2.25)
+        limiter.record("a.com", 503, retry_after="3")
+        self.assertEqual(limiter.snapshot()["a.com"], 1.5)
+        # Blocked for the Retry-After, plus one slot for this request
+        self.assertAlmostEqual(limiter.reserve("a.com"), 3 + 1 / 1.5, places=2)
+
+        for _ in range(10):
+            limiter.record("a.com", 200)
+        self.assertEqual(limiter.snapshot()["a.com"], 5)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class TestThrottledFetch(unittest.IsolatedAsyncioTestCase):
+
+    async def test_throttled_page_is_retried(self):
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"products": [{"id": 1, "title": "A", "handle": "a"}]}),
+            httpx.Response(200, json={"products": []}),
+        ]
+
+        def handler(request):
+            return responses.pop(0)
+
+        limiter = RateLimiter(rate=100, burst=10, min_rate=1)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = AsyncShopifyService("https://store.com", client=client, use_cache=False, rate_limiter=limiter)
+
+        products = await service.get_products()
+
+        self.assertEqual([p.handle for p in products], ["a"])
+        self.assertLess(limiter.snapshot()["store.com"], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
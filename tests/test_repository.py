@@ -0,0 +1,180 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import (
+    Base, Product as ProductRow, ProductTag as ProductTagRow, FAQ as FAQRow, ContactInfo as ContactInfoRow
+)
+from app.database.migrations import migrate_database
+from app.database.repository import InsightsRepository
+from app.models.insights import Product, FAQ, ContactInfo, ShopifyInsights
+
+
+def make_insights(product_count, **overrides):
+    products = [
+        Product(id=str(i), title=f"Product {i}", handle=f"product-{i}", price="9.99", available=True, tags=["a"], variants=[{"id": i}])
+        for i in range(product_count)
+    ]
+    fields = dict(
+        store_url="https://store.com/",
+        store_name="Store",
+        products=products,
+        hero_products=products[:2],
+        faqs=[FAQ(question="Q?", answer="A")],
+        contact_info=ContactInfo(emails=["hi@store.com"]),
+    )
+    fields.update(overrides)
+    return ShopifyInsights(**fields)
+
+
+class TestInsightsRepository(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+        # A small batch size makes sure batching across several executes works
+        self.repository = InsightsRepository(self.db, batch_size=7)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_create_store_bulk_inserts_related_rows(self):
+        store = self.repository.save_insights(make_insights(25))
+
+        self.assertEqual(self.db.query(ProductRow).filter_by(store_id=store.id).count(), 25)
+        self.assertEqual(self.db.query(FAQRow).filter_by(store_id=store.id).count(), 1)
+        product = self.db.query(ProductRow).filter_by(product_id="3").one()
+        self.assertEqual(product.tags, ["a"])
+        self.assertEqual(product.variants, [{"id": 3}])
+        self.assertEqual(self.db.query(ContactInfoRow).one().emails, ["hi@store.com"])
+
+    def test_update_store_replaces_related_rows(self):
+        self.repository.save_insights(make_insights(25))
+        store = self.repository.save_insights(make_insights(10, store_name="Renamed"))
+
+        self.assertEqual(store.name, "Renamed")
+        self.assertEqual(self.db.query(ProductRow).count(), 10)
+        self.assertEqual(self.db.query(ContactInfoRow).count(), 1)
+
+    def test_update_store_only_writes_changes(self):
+        self.repository.save_insights(make_insights(10))
+        untouched_id = self.db.query(ProductRow).filter_by(product_id="5").one().id
+
+        insights = make_insights(10)
+        insights.products[1].price = "12.00"
+        del insights.products[2]
+        insights.products.append(Product(id="new", title="New", handle="new"))
+        insights.faqs.append(FAQ(question="Another?", answer="Yes"))
+        self.repository.save_insights(insights)
+
+        stats = self.repository.last_sync_stats
+        self.assertEqual((stats["products"].added, stats["products"].changed, stats["products"].removed), (1, 1, 1))
+        self.assertEqual((stats["faqs"].added, stats["faqs"].removed), (1, 0))
+        self.assertEqual(stats["contact_info"].changed, 0)
+        self.assertEqual(self.db.query(ProductRow).filter_by(product_id="1").one().price, "12.00")
+        self.assertEqual(self.db.query(ProductRow).filter_by(product_id="5").one().id, untouched_id)
+        self.assertEqual(self.db.query(ProductRow).count(), 10)
+
+    def test_upsert_products_advances_watermark_without_removing(self):
+        store = self.repository.save_insights(make_insights(5))
+        self.assertIsNone(store.products_updated_at)
+
+        changed = Product(id="1", title="Product 1", handle="product-1", price="5.00",
+                          updated_at="2024-01-01T07:00:00-05:00")
+        added = Product(id="new", title="New", handle="new", updated_at="2024-01-01T11:00:00Z")
+        counts = self.repository.upsert_products(store, [changed, added])
+
+        self.assertEqual((counts.added, counts.changed, counts.removed), (1, 1, 0))
+        self.assertEqual(self.db.query(ProductRow).count(), 6)
+        self.assertEqual(store.products_updated_at, datetime(2024, 1, 1, 12))
+
+    def test_remove_products_except_drops_only_unlisted_products(self):
+        store = self.repository.save_insights(make_insights(10))
+
+        removed = self.repository.remove_products_except(store, {str(i) for i in range(4)}, datetime(2024, 1, 1))
+
+        self.assertEqual(removed, 6)
+        self.assertEqual(sorted(row.product_id for row in self.db.query(ProductRow)), ["0", "1", "2", "3"])
+        self.assertEqual(self.db.query(ProductTagRow).count(), 4)
+        self.assertEqual(store.products_updated_at, datetime(2024, 1, 1))
+
+    def test_get_insights_round_trips_stored_data(self):
+        insights = make_insights(5)
+        store = self.repository.save_insights(insights)
+
+        stored = self.repository.get_insights(store)
+
+        self.assertEqual(stored.model_dump(exclude={"scraped_at"}), insights.model_dump(exclude={"scraped_at"}))
+        self.assertIsNotNone(stored.scraped_at)
+        self.assertTrue(self.repository.is_fresh(store, 60))
+
+        store.scraped_at -= timedelta(seconds=120)
+        self.assertFalse(self.repository.is_fresh(store, 60))
+
+    def test_list_products_filters_and_paginates(self):
+        products = [
+            Product(id=str(i), title=f"Shoe {i}" if i % 2 else f"Hat {i}", handle=f"p-{i}",
+                    price=f"{i}.50", available=i % 3 != 0, tags=["sale"] if i < 10 else ["new"])
+            for i in range(30)
+        ]
+        store = self.repository.save_insights(make_insights(0, products=products, hero_products=[]))
+
+        seen = []
+        after_id = None
+        while True:
+            rows, after_id = self.repository.list_products(
+                store, 4, after_id=after_id, available=True, min_price=2, max_price=20, tag="sale", title="SHOE"
+            )
+            seen.extend(row.product_id for row in rows)
+            if after_id is None:
+                break
+
+        self.assertEqual(seen, ["5", "7"])
+
+    def test_update_store_rewrites_tags_of_changed_products(self):
+        store = self.repository.save_insights(make_insights(3))
+        insights = make_insights(3)
+        insights.products[0].tags = ["b"]
+        del insights.products[2]
+        self.repository.save_insights(insights)
+
+        tags = sorted((row.product_id, row.tag) for row in self.db.query(ProductTagRow).filter_by(store_id=store.id))
+        self.assertEqual(tags, [("0", "b"), ("1", "a")])
+
+    def test_backfill_products(self):
+        store = self.repository.save_insights(make_insights(10))
+        self.db.query(ProductTagRow).delete()
+        self.db.query(ProductRow).update({"price_amount": None})
+
+        self.assertEqual(self.repository.backfill_products(), 10)
+        self.assertEqual(self.db.query(ProductTagRow).count(), 10)
+        self.assertEqual(self.repository.list_products(store, 20, min_price=9.99)[0][0].product_id, "0")
+
+    def test_migration_backfills_products_an_earlier_run_skipped(self):
+        # The column was added (e.g. by an older batch CLI) but never backfilled
+        store = self.repository.save_insights(make_insights(10))
+        self.db.query(ProductRow).filter(ProductRow.product_id.in_(["0", "1"])).update({"price_amount": None})
+        self.db.query(ProductTagRow).filter(ProductTagRow.product_id == "0").delete()
+        self.db.commit()
+        self.assertTrue(self.repository.needs_backfill())
+
+        for _ in range(2):
+            migrate_database(self.db.get_bind(), self.session_factory)
+        self.db.expire_all()
+
+        self.assertFalse(self.repository.needs_backfill())
+        self.assertEqual(self.db.query(ProductTagRow).count(), 10)
+        self.assertEqual(len(self.repository.list_products(store, 20, min_price=9.99)[0]), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.response_cache import ResponseCache, resource_type_for
+from app.services.shopify_service import ShopifyService
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(":memory:")
+
+    def test_resource_types(self):
+        self.assertEqual(resource_type_for("https://store.com/"), "homepage")
+        self.assertEqual(resource_type_for("https://store.com/products.json?page=2"), "products")
+        self.assertEqual(resource_type_for("https://store.com/policies/refund-policy"), "policy")
+        self.assertEqual(resource_type_for("https://store.com/pages/faq"), "page")
+
+    def test_fresh_entries_skip_the_network(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(200, text="<title>Cached Store</title>")
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        for _ in range(2):
+            service = ShopifyService("https://store.com", client=client, use_cache=False)
+            service._service.cache = self.cache
+            self.assertEqual(service.get_store_name(), "Cached Store")
+
+        self.assertEqual(calls, ["/"])
+
+    def test_stale_entries_are_revalidated(self):
+        self.cache.ttls["homepage"] = -1
+        conditional_headers = []
+
+        def handler(request):
+            conditional_headers.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text="<title>Cached Store</title>", headers={"etag": '"v1"'})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        for _ in range(2):
+            service = ShopifyService("https://store.com", client=client, use_cache=False)
+            service._service.cache = self.cache
+            self.assertEqual(service.get_store_name(), "Cached Store")
+
+        self.assertEqual(conditional_headers, [None, '"v1"'])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_bytes = 10
+        request = httpx.Request("GET", "https://store.com/")
+        self.cache.put("https://store.com/a", httpx.Response(200, content=b"123456", request=request))
+        self.cache.put("https://store.com/b", httpx.Response(200, content=b"123456", request=request))
+
+        self.assertIsNone(self.cache.get("https://store.com/a"))
+        self.assertIsNotNone(self.cache.get("https://store.com/b"))
+
+    def test_recently_read_entries_survive_eviction(self):
+        self.cache.max_bytes = 12
+        request = httpx.Request("GET", "https://store.com/")
+        self.cache.put("https://store.com/a", httpx.Response(200, content=b"123456", request=request))
+        self.cache.put("https://store.com/b", httpx.Response(200, content=b"123456", request=request))
+        # Only noted in memory, but written out before the next put evicts anything
+        self.cache.get("https://store.com/a")
+        self.cache.put("https://store.com/c", httpx.Response(200, content=b"123456", request=request))
+
+        self.assertIsNotNone(self.cache.get("https://store.com/a"))
+        self.assertIsNone(self.cache.get("https://store.com/b"))
+        self.assertEqual(self.cache._total, 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
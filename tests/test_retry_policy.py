@@ -0,0 +1,168 @@
+import asyncio
+import unittest
+import os
+import sys
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import Base, HeroProduct, Product as ProductRow
+from app.database.repository import InsightsRepository
+from app.models.insights import Product, ShopifyInsights
+from app.services.rate_limiter import RateLimiter
+from app.services.retry_policy import RetryPolicy
+from app.services.shopify_service import PRODUCTS_PAGE_SIZE, AsyncShopifyService
+
+FAST_RETRIES = RetryPolicy(attempts=2, backoff_base=0.001, hedge_after=0, time_budget=0)
+
+
+def make_service(handler, policy=FAST_RETRIES):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncShopifyService(
+        "https://store.com", client=client, use_cache=False, rate_limiter=RateLimiter(rate=0), policy=policy
+    )
+
+
+class TestRetryPolicy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_transient_failures_are_retried(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request.url.path)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("connection reset", request=request)
+            if len(attempts) == 2:
+                return httpx.Response(502)
+            return httpx.Response(200, json={"products": [{"id": 1, "title": "A", "handle": "a"}]})
+
+        service = make_service(handler)
+
+        self.assertEqual([p.handle for p in await service.get_products()], ["a"])
+        self.assertEqual(len(attempts), 3)
+
+    async def test_failed_catalog_is_reported_incomplete(self):
+        def handler(request):
+            if request.url.path == "/products.json":
+                raise httpx.ReadTimeout("too slow", request=request)
+            if request.url.path == "/":
+                return httpx.Response(200, text="<title>Store</title>")
+            return httpx.Response(404)
+
+        insights = await make_service(handler).get_all_insights()
+
+        self.assertEqual(insights.products, [])
+        self.assertEqual(insights.incomplete, ["products", "hero_products"])
+
+    async def test_slow_request_is_hedged(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.path)
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+            return httpx.Response(200, json={"products": []})
+
+        service = make_service(handler, RetryPolicy(hedge_after=0.05, time_budget=0))
+
+        start = asyncio.get_running_loop().time()
+        await service.get_products()
+
+        self.assertLess(asyncio.get_running_loop().time() - start, 1)
+        self.assertEqual(len(calls), 2)
+
+    async def test_time_budget_cancels_remaining_extractors(self):
+        async def handler(request):
+            if request.url.path == "/products.json":
+                await asyncio.sleep(5)
+            if request.url.path == "/":
+                return httpx.Response(200, text="<title>Store</title>")
+            return httpx.Response(404)
+
+        service = make_service(handler, RetryPolicy(hedge_after=0, time_budget=0.2))
+        insights = await service.get_all_insights()
+
+        self.assertIn("products", insights.incomplete)
+        self.assertIn("hero_products", insights.incomplete)
+
+    async def test_time_budget_stops_the_catalog_crawl(self):
+        catalog_requests = []
+
+        async def handler(request):
+            if request.url.path == "/products.json":
+                catalog_requests.append(request.url.params["page"])
+                await asyncio.sleep(0.05)
+                page = int(request.url.params["page"])
+                return httpx.Response(200, json={"products": [
+                    {"id": page * PRODUCTS_PAGE_SIZE + i, "title": "P", "handle": f"p{page}-{i}"}
+                    for i in range(PRODUCTS_PAGE_SIZE)
+                ]})
+            if request.url.path == "/":
+                return httpx.Response(200, text="<title>Store</title>")
+            return httpx.Response(404)
+
+        service = make_service(handler, RetryPolicy(hedge_after=0, time_budget=0.2))
+        insights = await service.get_all_insights()
+        self.assertIn("products", insights.incomplete)
+
+        requested = len(catalog_requests)
+        await asyncio.sleep(0.3)
+        self.assertEqual(len(catalog_requests), requested)
+
+
+class TestIncompleteInsightsAreNotSaved(unittest.TestCase):
+
+    def test_incomplete_sections_keep_stored_data(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        repository = InsightsRepository(db)
+
+        products = [Product(id=str(i), title=f"P{i}", handle=f"p{i}") for i in range(3)]
+        store = repository.save_insights(ShopifyInsights(store_url="https://store.com/", store_name="Store", products=products))
+        scraped_at = store.scraped_at
+
+        partial = ShopifyInsights(store_url="https://store.com/", store_name="Renamed", incomplete=["products"])
+        store = repository.save_insights(partial)
+
+        self.assertEqual(store.name, "Renamed")
+        self.assertEqual(db.query(ProductRow).count(), 3)
+        self.assertEqual(store.scraped_at, scraped_at)
+        db.close()
+
+
+class TestFailedCatalogKeepsHeroProducts(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hero_products_survive_a_failed_catalog(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        repository = InsightsRepository(db)
+
+        hero = Product(id="1", title="Hero", handle="hero")
+        repository.save_insights(ShopifyInsights(
+            store_url="https://store.com/", store_name="Store", products=[hero], hero_products=[hero]
+        ))
+
+        def handler(request):
+            if request.url.path == "/products.json":
+                raise httpx.ReadTimeout("too slow", request=request)
+            if request.url.path == "/":
+                return httpx.Response(200, text='<title>Store</title><a href="/products/hero">Hero</a>')
+            return httpx.Response(404)
+
+        insights = await make_service(handler).get_all_insights()
+        repository.save_insights(insights)
+
+        self.assertEqual(insights.hero_products, [])
+        self.assertEqual(db.query(HeroProduct).count(), 1)
+        self.assertEqual(db.query(ProductRow).count(), 1)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
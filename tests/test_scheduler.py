@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.scheduler import ExtractionScheduler
+
+
+class TestExtractionScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_dependencies_receive_results(self):
+        scheduler = ExtractionScheduler()
+
+        async def products():
+            return ["a", "b"]
+
+        async def hero_products(products):
+            return products[:1]
+
+        scheduler.add("products", products)
+        scheduler.add("hero_products", hero_products, depends_on=["products"])
+
+        results = await scheduler.run()
+
+        self.assertEqual(results, {"products": ["a", "b"], "hero_products": ["a"]})
+
+    async def test_independent_extractors_run_concurrently(self):
+        scheduler = ExtractionScheduler()
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            return True
+
+        for name in ["one", "two", "three", "four"]:
+            scheduler.add(name, slow)
+
+        start = asyncio.get_running_loop().time()
+        await scheduler.run()
+        elapsed = asyncio.get_running_loop().time() - start
+
+        self.assertLess(elapsed, 0.3)
+
+    async def test_timeout_cancels_unfinished_extractors(self):
+        scheduler = ExtractionScheduler()
+
+        async def fast():
+            return 1
+
+        async def stuck():
+            await asyncio.sleep(10)
+
+        async def needs_stuck(stuck):
+            return stuck
+
+        scheduler.add("fast", fast)
+        scheduler.add("stuck", stuck)
+        scheduler.add("needs_stuck", needs_stuck, depends_on=["stuck"])
+
+        results = await scheduler.run(timeout=0.05)
+
+        self.assertEqual(results, {"fast": 1})
+
+    async def test_skipped_extractors_and_their_dependents_are_left_out(self):
+        scheduler = ExtractionScheduler()
+
+        async def fast():
+            return 1
+
+        async def blocked():
+            raise LookupError("store is down")
+
+        async def needs_blocked(blocked):
+            return blocked
+
+        scheduler.add("fast", fast)
+        scheduler.add("blocked", blocked)
+        scheduler.add("needs_blocked", needs_blocked, depends_on=["blocked"])
+
+        results = await scheduler.run(skip_on=(LookupError,))
+
+        self.assertEqual(results, {"fast": 1})
+        self.assertEqual(sorted(scheduler.skipped), ["blocked", "needs_blocked"])
+
+    def test_unknown_dependency_is_rejected(self):
+        scheduler = ExtractionScheduler()
+
+        async def hero_products(products):
+            return products
+
+        with self.assertRaises(ValueError):
+            scheduler.add("hero_products", hero_products, depends_on=["products"])
+
+
+if __name__ == '__main__':
+    unittest.main()
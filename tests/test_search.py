@@ -0,0 +1,77 @@
+import json
+import tempfile
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.rate_limiter import RateLimiter
+from app.services.retry_policy import RetryPolicy
+from app.services.search import CachedSearchProvider, DuckDuckGoProvider, FixtureProvider, SearchResult
+
+RESULTS_PAGE = """
+<div class="result results_links">
+  <h2 class="result__title"><a class="result__a" href="#">Alpha vs Beta</a></h2>
+  <a class="result__url" href="#">www.alpha.com</a>
+</div>
+<div class="result results_links">
+  <h2 class="result__title"><a class="result__a" href="#">Gamma</a></h2>
+</div>
+"""
+
+
+class TestSearchProviders(unittest.IsolatedAsyncioTestCase):
+
+    async def test_duckduckgo_results_are_cached(self):
+        queries = []
+
+        def handler(request):
+            queries.append(request.url.params["q"])
+            return httpx.Response(200, text=RESULTS_PAGE)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        provider = CachedSearchProvider(DuckDuckGoProvider(client=client, rate_limiter=RateLimiter(rate=0)), ttl=60)
+
+        expected = [SearchResult(title="Alpha vs Beta", url="www.alpha.com"), SearchResult(title="Gamma", url="")]
+        self.assertEqual(await provider.search("alpha competitors"), expected)
+        self.assertEqual(await provider.search("  Alpha   Competitors"), expected)
+        self.assertEqual(queries, ["alpha competitors"])
+
+    async def test_duckduckgo_retries_server_errors(self):
+        statuses = [502, 200]
+
+        def handler(request):
+            return httpx.Response(statuses.pop(0), text=RESULTS_PAGE)
+
+        breaker = CircuitBreaker()
+        provider = DuckDuckGoProvider(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            rate_limiter=RateLimiter(rate=0),
+            policy=RetryPolicy(attempts=1, backoff_base=0.001),
+            circuit_breaker=breaker,
+        )
+
+        self.assertEqual(len(await provider.search("alpha competitors")), 2)
+        self.assertEqual(statuses, [])
+        self.assertEqual(breaker.state("html.duckduckgo.com"), "closed")
+
+    async def test_fixture_provider(self):
+        fixtures = {"Alpha Competitors": [{"title": "Alpha vs Beta", "url": "beta.com"}]}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(fixtures, f)
+        try:
+            provider = FixtureProvider.from_file(f.name)
+        finally:
+            os.unlink(f.name)
+
+        self.assertEqual(await provider.search("alpha competitors"), [SearchResult(title="Alpha vs Beta", url="beta.com")])
+        self.assertEqual(await provider.search("unknown"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,26 +3,29 @@ from unittest.mock import patch, MagicMock
 import json
 import os
 import sys
+from datetime import datetime, timedelta
+
+import httpx
 
 # Add parent directory to path to import app modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.services.shopify_service import ShopifyService
+from app.services.shopify_service import AsyncShopifyService, ShopifyService
+from app.utils.async_bridge import run_sync
 from app.models.insights import Product, FAQ, SocialHandle
 
 
 class TestShopifyService(unittest.TestCase):
     
-    @patch('app.services.shopify_service.requests.Session')
-    def setUp(self, mock_session):
-        self.mock_session = MagicMock()
-        mock_session.return_value = self.mock_session
-        self.service = ShopifyService("https://example-store.myshopify.com")
+    def setUp(self):
+        # Every request goes through a mock transport, so no test touches the network
+        self.mock_response = httpx.Response(404)
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: self.mock_response))
+        self.service = ShopifyService("https://example-store.myshopify.com", client=self.client, use_cache=False)
     
     def test_get_products(self):
         # Mock the response for products.json
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
+        self.mock_response = httpx.Response(200, json={
             "products": [
                 {
                     "id": 123456789,
@@ -42,9 +45,7 @@ class TestShopifyService(unittest.TestCase):
                     "tags": ["test", "product"]
                 }
             ]
-        }
-        mock_response.raise_for_status = MagicMock()
-        self.mock_session.get.return_value = mock_response
+        })
         
         products = self.service.get_products()
         
@@ -56,6 +57,76 @@ class TestShopifyService(unittest.TestCase):
         self.assertEqual(products[0].images, ["https://example.com/image.jpg"])
         self.assertEqual(products[0].tags, ["test", "product"])
     
+    def test_get_products_paginates_in_order(self):
+        # 600 products -> two full pages and a short third page
+        requested_pages = []
+        
+        def handler(request):
+            page = int(request.url.params["page"])
+            requested_pages.append(page)
+            start = (page - 1) * 250
+            products = [
+                {"id": i, "title": f"Product {i}", "handle": f"product-{i}"}
+                for i in range(start, min(start + 250, 600))
+            ]
+            return httpx.Response(200, json={"products": products})
+        
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = ShopifyService("https://example-store.myshopify.com", client=client, use_cache=False)
+        
+        products = service.get_products()
+        
+        self.assertEqual([p.id for p in products], [str(i) for i in range(600)])
+        self.assertIn(3, requested_pages)
+    
+    def test_get_hero_products_uses_targeted_lookups(self):
+        requested_paths = []
+        
+        def handler(request):
+            requested_paths.append(request.url.path)
+            if request.url.path == "/":
+                return httpx.Response(200, text='<a href="/products/hero-one">Hero</a><a href="/products/hero-one">Again</a>')
+            if request.url.path == "/products/hero-one.json":
+                return httpx.Response(200, json={"product": {"id": 1, "title": "Hero One", "handle": "hero-one"}})
+            return httpx.Response(404)
+        
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = ShopifyService("https://example-store.myshopify.com", client=client, use_cache=False)
+        
+        hero_products = service.get_hero_products()
+        
+        self.assertEqual([p.handle for p in hero_products], ["hero-one"])
+        self.assertNotIn("/products.json", requested_paths)
+    
+    def test_iter_updated_product_pages_stops_at_watermark(self):
+        requested_pages = []
+        
+        def handler(request):
+            page = int(request.url.params["page"])
+            requested_pages.append(page)
+            self.assertEqual(request.url.params["order"], "updated_at-desc")
+            # 600 products, newest first: product i was updated i minutes before noon
+            start = (page - 1) * 250
+            products = [
+                {"id": i, "title": f"Product {i}", "handle": f"product-{i}",
+                 "updated_at": (datetime(2024, 1, 1, 12) - timedelta(minutes=i)).isoformat() + "-00:00"}
+                for i in range(start, min(start + 250, 600))
+            ]
+            return httpx.Response(200, json={"products": products})
+        
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = AsyncShopifyService("https://example-store.myshopify.com", client=client, use_cache=False)
+        
+        async def collect():
+            return [
+                product.id
+                async for page in service.iter_updated_product_pages(datetime(2024, 1, 1, 12) - timedelta(minutes=3))
+                for product in page
+            ]
+        
+        self.assertEqual(run_sync(collect()), ["0", "1", "2"])
+        self.assertEqual(requested_pages, [1])
+    
     @patch('app.services.shopify_service.BeautifulSoup')
     def test_get_faqs(self, mock_bs):
         # Mock BeautifulSoup to return FAQ elements
@@ -68,15 +139,14 @@ class TestShopifyService(unittest.TestCase):
         mock_dd.get_text.return_value = "Test Answer"
         
         mock_dt.find_next.return_value = mock_dd
-        mock_soup.find_all.return_value = [mock_dt]
+        # Only the dt/dd pattern matches; there are no question headers on the page
+        mock_soup.find_all.side_effect = lambda tag: [mock_dt] if tag == "dt" else []
+        mock_soup.select.return_value = []
         
         mock_bs.return_value = mock_soup
         
         # Mock response for FAQ page
-        mock_response = MagicMock()
-        mock_response.text = "<html><body><dt>Test Question?</dt><dd>Test Answer</dd></body></html>"
-        mock_response.raise_for_status = MagicMock()
-        self.mock_session.get.return_value = mock_response
+        self.mock_response = httpx.Response(200, text="<html><body><dt>Test Question?</dt><dd>Test Answer</dd></body></html>")
         
         faqs = self.service.get_faqs()
         
@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database.models import Base
+from app.database.repository import InsightsRepository
+from app.models.insights import Product, ShopifyInsights
+from app.services.similarity import SimilarityIndex, SimilarityIndexCache, tokenize
+
+CATALOGS = {
+    "https://runners.com/": [("Trail Running Shoes", ["running", "shoes"], "120"), ("Running Socks", ["running"], "15")],
+    "https://joggers.com/": [("Road Running Shoes", ["running", "shoes"], "110"), ("Running Shorts", ["running"], "40")],
+    "https://candles.com/": [("Lavender Soy Candle", ["candles", "home"], "25"), ("Vanilla Candle", ["candles"], "22")],
+    "https://empty.com/": [],
+}
+
+
+def save_catalogs(repository):
+    stores = {}
+    for url, catalog in CATALOGS.items():
+        products = [
+            Product(id=str(i), title=title, handle=f"p-{i}", price=price, tags=tags)
+            for i, (title, tags, price) in enumerate(catalog)
+        ]
+        stores[url] = repository.save_insights(ShopifyInsights(store_url=url, store_name=url, products=products))
+    return stores
+
+
+class TestSimilarityIndex(unittest.TestCase):
+
+    def setUp(self):
+        # One connection shared with the thread rebuilding in the background
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+        self.repository = InsightsRepository(self.db, batch_size=3)
+        self.stores = save_catalogs(self.repository)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The 2 Trail-Running Shoes", ["Sale", "Men's"]), [
+            "trail", "running", "shoes", "tag:sale", "tag:men's", "men"
+        ])
+
+    def test_nearest_stores(self):
+        index = SimilarityIndex.build(self.repository)
+        runners = self.stores["https://runners.com/"].id
+
+        self.assertEqual(len(index), 3)  # only stores with products
+        self.assertNotIn(self.stores["https://empty.com/"].id, index)
+
+        # The candle store has nothing in common with a running store, so it isn't listed at all
+        nearest = index.nearest(runners, limit=5)
+        self.assertEqual([store_id for store_id, _ in nearest], [self.stores["https://joggers.com/"].id])
+        self.assertGreater(nearest[0][1], 0.3)
+
+    def test_cache_refreshes_newer_stores_on_their_own(self):
+        cache = SimilarityIndexCache(self.session_factory, ttl=600)
+        index = cache.get()
+        self.assertIs(cache.get(), index)
+
+        # The candle store now sells running gear
+        store = self.stores["https://candles.com/"]
+        self.repository.save_insights(ShopifyInsights(store_url=store.url, store_name="Candles", products=[
+            Product(id="9", title="Trail Running Shoes", handle="shoes", price="115", tags=["running", "shoes"])
+        ]))
+        self.assertIs(cache.get(store.id, index.built_at), index)
+        refreshed = cache.get(store.id, store.scraped_at)
+        self.assertIsNot(refreshed, index)
+        self.assertEqual(refreshed.built_at, index.built_at)
+        self.assertIs(cache.get(store.id, store.scraped_at), refreshed)
+
+        runners = self.stores["https://runners.com/"].id
+        self.assertNotIn(store.id, [store_id for store_id, _ in index.nearest(runners)])
+        self.assertIn(store.id, [store_id for store_id, _ in refreshed.nearest(runners)])
+
+        # Same result as a full build, apart from the IDF weights
+        rebuilt = SimilarityIndex.build(self.repository)
+        self.assertEqual(
+            [store_id for store_id, _ in refreshed.nearest(runners)],
+            [store_id for store_id, _ in rebuilt.nearest(runners)],
+        )
+
+    def test_new_and_emptied_stores(self):
+        index = SimilarityIndex.build(self.repository)
+        empty = self.stores["https://empty.com/"]
+        self.repository.save_insights(ShopifyInsights(store_url=empty.url, store_name="Empty", products=[
+            Product(id="1", title="Running Socks", handle="socks", price="12", tags=["running"])
+        ]))
+        index = index.with_store(self.repository, empty.id)
+        self.assertIn(empty.id, index)
+        self.assertEqual(len(index), 4)
+
+        runners = self.stores["https://runners.com/"]
+        self.repository.save_insights(ShopifyInsights(store_url=runners.url, store_name="Runners", products=[]))
+        index = index.with_store(self.repository, runners.id)
+        self.assertNotIn(runners.id, index)
+        self.assertEqual(index.nearest(empty.id)[0][0], self.stores["https://joggers.com/"].id)
+
+    def test_old_index_is_served_while_rebuilding(self):
+        cache = SimilarityIndexCache(self.session_factory, ttl=0)
+        index = cache.get()
+
+        self.assertIs(cache.get(), index)
+        cache._rebuild.join()
+        self.assertIsNot(cache.get(), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
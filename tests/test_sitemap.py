@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.sitemap import SitemapIndex, pages_sitemaps, parse_sitemap
+from app.services.shopify_service import AsyncShopifyService
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://store.com/sitemap_products_1.xml?from=1&amp;to=99</loc></sitemap>
+  <sitemap><loc>https://store.com/sitemap_pages_1.xml</loc></sitemap>
+</sitemapindex>"""
+
+PAGES_SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://store.com/pages/about-us</loc></url>
+  <url><loc>https://store.com/pages/shipping-and-faq</loc></url>
+</urlset>"""
+
+
+class TestSitemap(unittest.TestCase):
+
+    def test_parse_index_and_pick_pages_sitemaps(self):
+        sitemaps, urls = parse_sitemap(SITEMAP_INDEX)
+
+        self.assertEqual(urls, [])
+        self.assertEqual(pages_sitemaps(sitemaps), ["https://store.com/sitemap_pages_1.xml"])
+
+    def test_resolve_drops_unlisted_pages(self):
+        _, urls = parse_sitemap(PAGES_SITEMAP)
+        index = SitemapIndex(urls)
+
+        candidates = index.resolve(["pages/faq", "pages/about-us", "contact"], ["faq"])
+
+        self.assertEqual(candidates, ["pages/about-us", "contact", "pages/shipping-and-faq"])
+
+    def test_rejects_documents_that_are_not_sitemaps(self):
+        with self.assertRaises(ValueError):
+            parse_sitemap(b"<html><body>Not found</body></html>")
+
+
+class TestSitemapDiscovery(unittest.IsolatedAsyncioTestCase):
+
+    async def test_faqs_found_on_non_standard_handle(self):
+        requested_paths = []
+
+        def handler(request):
+            requested_paths.append(request.url.path)
+            if request.url.path == "/sitemap.xml":
+                return httpx.Response(200, content=SITEMAP_INDEX)
+            if request.url.path == "/sitemap_pages_1.xml":
+                return httpx.Response(200, content=PAGES_SITEMAP)
+            if request.url.path == "/pages/shipping-and-faq":
+                return httpx.Response(200, text="<dl><dt>Do you ship?</dt><dd>Yes</dd></dl>")
+            return httpx.Response(404)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = AsyncShopifyService("https://store.com", client=client, use_cache=False)
+
+        faqs = await service.get_faqs()
+
+        self.assertEqual([faq.question for faq in faqs], ["Do you ship?"])
+        self.assertEqual(requested_paths, ["/sitemap.xml", "/sitemap_pages_1.xml", "/pages/shipping-and-faq"])
+
+    async def test_soft_404_sitemap_falls_back_to_guessed_paths(self):
+        def handler(request):
+            if request.url.path == "/sitemap.xml":
+                # A theme's "not found" page, served with a 200
+                return httpx.Response(200, text="<html><body>Not found</body></html>")
+            if request.url.path == "/pages/faq":
+                return httpx.Response(200, text="<dl><dt>Do you ship?</dt><dd>Yes</dd></dl>")
+            return httpx.Response(404)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = AsyncShopifyService("https://store.com", client=client, use_cache=False)
+
+        self.assertIsNone(await service.get_sitemap_index())
+        faqs = await service.get_faqs()
+
+        self.assertEqual([faq.question for faq in faqs], ["Do you ship?"])
+
+    async def test_empty_sitemap_falls_back_to_guessed_paths(self):
+        def handler(request):
+            if request.url.path == "/sitemap.xml":
+                return httpx.Response(200, content=b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>')
+            return httpx.Response(404)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = AsyncShopifyService("https://store.com", client=client, use_cache=False)
+
+        self.assertIsNone(await service.get_sitemap_index())
+
+
+if __name__ == '__main__':
+    unittest.main()
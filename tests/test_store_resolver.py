@@ -0,0 +1,131 @@
+import unittest
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.rate_limiter import RateLimiter
+from app.services.retry_policy import RetryPolicy
+from app.services.shopify_service import AsyncShopifyService
+from app.services.store_resolver import StoreResolver
+
+PAGE = {"products": [{"id": 1, "title": "A", "handle": "a"}]}
+
+
+def make_resolver(handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+    resolver = StoreResolver(
+        # Retried failures would open a breaker with the default threshold
+        client=client, rate_limiter=RateLimiter(rate=0), circuit_breaker=CircuitBreaker(failure_threshold=100),
+        policy=RetryPolicy(attempts=2, backoff_base=0.001)
+    )
+    return resolver, client
+
+
+class TestStoreResolver(unittest.IsolatedAsyncioTestCase):
+
+    async def test_resolves_redirect_and_hands_over_first_page(self):
+        requests = []
+
+        def handler(request):
+            requests.append(str(request.url))
+            if request.url.host == "store.com":
+                return httpx.Response(301, headers={"location": str(request.url.copy_with(host="www.store.com"))})
+            if request.url.path == "/products.json":
+                return httpx.Response(200, json=PAGE)
+            if request.url.path == "/meta.json":
+                return httpx.Response(200, json={"myshopify_domain": "store.myshopify.com"})
+            return httpx.Response(404)
+
+        resolver, client = make_resolver(handler)
+        identity = await resolver.resolve("store.com")
+
+        self.assertTrue(identity.is_shopify)
+        self.assertEqual(identity.website_url, "https://www.store.com/")
+        self.assertEqual(identity.myshopify_domain, "store.myshopify.com")
+        self.assertEqual(identity.first_page, PAGE)
+
+        # Cached under both hosts, without the page
+        requests.clear()
+        for url in ("https://store.com/", "https://www.store.com/some/page"):
+            cached = await resolver.resolve(url)
+            self.assertEqual(cached.website_url, "https://www.store.com/")
+            self.assertIsNone(cached.first_page)
+        self.assertEqual(requests, [])
+
+        # The product fetcher uses the page instead of downloading it again
+        service = AsyncShopifyService(
+            identity.website_url, client=client, use_cache=False,
+            rate_limiter=RateLimiter(rate=0), first_page=identity.first_page
+        )
+        self.assertEqual([p.handle for p in await service.get_products()], ["a"])
+        self.assertEqual(requests, [])
+
+    async def test_not_a_store(self):
+        def handler(request):
+            return httpx.Response(404, text="Not found")
+
+        resolver, _ = make_resolver(handler)
+        identity = await resolver.resolve("https://blog.example.com")
+
+        self.assertFalse(identity.is_shopify)
+        self.assertIsNone(identity.first_page)
+
+    async def test_password_protected_store_is_detected_by_headers(self):
+        def handler(request):
+            return httpx.Response(401, headers={"x-shopid": "123"})
+
+        resolver, _ = make_resolver(handler)
+        self.assertTrue((await resolver.resolve("https://locked.com")).is_shopify)
+
+    async def test_unreachable_host_is_not_cached(self):
+        def handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        resolver, _ = make_resolver(handler)
+        with self.assertRaises(httpx.ConnectError):
+            await resolver.resolve("https://gone.com")
+        self.assertIsNone(resolver.peek("https://gone.com"))
+
+    async def test_server_errors_are_retried(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request.url.path)
+            if request.url.path == "/products.json" and attempts.count("/products.json") == 1:
+                return httpx.Response(502)
+            if request.url.path == "/products.json":
+                return httpx.Response(200, json=PAGE)
+            return httpx.Response(404)
+
+        resolver, _ = make_resolver(handler)
+        identity = await resolver.resolve("https://store.com")
+
+        self.assertTrue(identity.is_shopify)
+        self.assertEqual(attempts.count("/products.json"), 2)
+        self.assertIsNotNone(resolver.peek("https://store.com"))
+
+    async def test_failed_probes_are_not_cached(self):
+        down = True
+
+        def handler(request):
+            if down:
+                return httpx.Response(502)
+            if request.url.path == "/products.json":
+                return httpx.Response(200, json=PAGE)
+            return httpx.Response(404)
+
+        resolver, _ = make_resolver(handler)
+        self.assertFalse((await resolver.resolve("https://store.com")).is_shopify)
+        self.assertIsNone(resolver.peek("https://store.com"))
+
+        down = False
+        self.assertTrue((await resolver.resolve("https://store.com")).is_shopify)
+
+
+if __name__ == '__main__':
+    unittest.main()